@@ -0,0 +1,211 @@
+import asyncio
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Optional
+from starlette.responses import JSONResponse
+from starlette.types import ASGIApp, Receive, Scope, Send
+from app import metrics, tenants
+
+logger = logging.getLogger(__name__)
+
+# Token bucket per client (tenant of a valid API key, else client address);
+# 0 disables. Off by default: set it per deployment, and behind a proxy run
+# uvicorn with --proxy-headers so clients don't share the proxy's address
+RATE_LIMIT_PER_SECOND = float(os.getenv("RATE_LIMIT_PER_SECOND", "0"))
+RATE_LIMIT_BURST = float(os.getenv("RATE_LIMIT_BURST", "200"))
+API_KEY_HEADER = "x-api-key"
+
+# Seconds a request may wait for a concurrency slot before being shed
+ADMISSION_QUEUE_TIMEOUT = float(os.getenv("ADMISSION_QUEUE_TIMEOUT", "2"))
+
+# Route classes: (exact paths, path prefixes, max concurrent, max queued per worker).
+# Exact paths are checked first, then prefixes in order.
+ROUTE_CLASSES = {
+    "light": (
+        ("/api/converter/convert", "/api/converter/factors", "/api/converter/units"),
+        (),
+        int(os.getenv("LIGHT_MAX_CONCURRENT", "64")),
+        int(os.getenv("LIGHT_MAX_QUEUE", "256")),
+    ),
+    # Only rate limited here: their work runs on the bounded heavy worker
+    # pool (app.executors), which sheds excess load itself
+    "heavy": (
+        ("/api/converter/convert/batch",),
+        ("/api/export", "/api/import"),
+        0,
+        0,
+    ),
+    # Long-lived SSE connections hold their slot for the whole stream
+    "stream": (
+        (),
+        ("/api/events",),
+        int(os.getenv("STREAM_MAX_CONCURRENT", "1000")),
+        0,
+    ),
+    "default": (
+        (),
+        ("/api/",),
+        int(os.getenv("DEFAULT_MAX_CONCURRENT", "32")),
+        int(os.getenv("DEFAULT_MAX_QUEUE", "128")),
+    ),
+}
+_CLASS_OF_PATH = {path: name for name, (paths, _, _, _) in ROUTE_CLASSES.items() for path in paths}
+
+
+def classify(path: str) -> Optional[str]:
+    """
+    Get the route class of a path (None for health, metrics and static files)
+    """
+    route_class = _CLASS_OF_PATH.get(path.rstrip("/") or "/")
+    if route_class is not None:
+        return route_class
+    for route_class, (_, prefixes, _, _) in ROUTE_CLASSES.items():
+        if prefixes and path.startswith(prefixes):
+            return route_class
+    return None
+
+
+class InMemoryBucketStore:
+    """
+    Token buckets kept in this process (bounded LRU of clients)
+
+    A shared store (e.g. Redis) only needs the same `take` method.
+    """
+
+    def __init__(self, max_clients: int = 100_000):
+        self.max_clients = max_clients
+        self._buckets: OrderedDict = OrderedDict()
+        self._lock = threading.Lock()
+
+    def take(self, key: str, rate: float, burst: float) -> float:
+        """
+        Take one token; returns 0 if allowed, else seconds until a token is available
+        """
+        now = time.monotonic()
+        with self._lock:
+            tokens, last = self._buckets.pop(key, (burst, now))
+            tokens = min(burst, tokens + (now - last) * rate)
+            if tokens >= 1:
+                tokens -= 1
+                retry_after = 0.0
+            else:
+                retry_after = (1 - tokens) / rate
+            self._buckets[key] = (tokens, now)
+            if len(self._buckets) > self.max_clients:
+                self._buckets.popitem(last=False)
+        return retry_after
+
+
+class ConcurrencyLimiter:
+    """
+    Caps in-flight requests of a route class with a bounded wait queue
+    """
+
+    def __init__(self, name: str, max_concurrent: int, max_queue: int):
+        self.name = name
+        self.max_concurrent = max_concurrent
+        self.max_queue = max_queue
+        self.in_flight = 0
+        self.waiting = 0
+        self._semaphore = asyncio.Semaphore(max_concurrent)
+
+    async def acquire(self) -> Optional[str]:
+        """
+        Get a slot; returns None on success or the reason the request was shed
+        """
+        if not self._semaphore.locked():
+            # Free slot: acquire() returns without suspending
+            await self._semaphore.acquire()
+        else:
+            if self.waiting >= self.max_queue:
+                return "queue_full"
+            self.waiting += 1
+            try:
+                await asyncio.wait_for(self._semaphore.acquire(), ADMISSION_QUEUE_TIMEOUT)
+            except asyncio.TimeoutError:
+                return "queue_timeout"
+            finally:
+                self.waiting -= 1
+        self.in_flight += 1
+        return None
+
+    def release(self) -> None:
+        self.in_flight -= 1
+        self._semaphore.release()
+
+
+bucket_store = InMemoryBucketStore()
+# Classes without a concurrency limit (0) have no limiter
+limiters = {
+    name: ConcurrencyLimiter(name, max_concurrent, max_queue)
+    for name, (_, _, max_concurrent, max_queue) in ROUTE_CLASSES.items()
+    if max_concurrent > 0
+}
+metrics.register_gauge("admission", lambda: {
+    name: {"in_flight": limiter.in_flight, "waiting": limiter.waiting, "max_concurrent": limiter.max_concurrent}
+    for name, limiter in limiters.items()
+})
+
+
+def client_key(scope: Scope) -> str:
+    """
+    Rate limit bucket of a request: its tenant for a valid API key, else its address
+
+    Unknown keys fall back to the address, so sending random keys can't
+    get a client a fresh bucket (those requests get 401 anyway).
+    """
+    for name, value in scope.get("headers", []):
+        if name == API_KEY_HEADER.encode():
+            tenant = tenants.TENANT_API_KEYS.get(value.decode("latin-1"))
+            if tenant is not None:
+                return "tenant:" + tenant
+            break
+    client = scope.get("client")
+    return "addr:" + (client[0] if client else "unknown")
+
+
+class AdmissionControlMiddleware:
+    """
+    Per-client rate limiting and per-route-class concurrency limits;
+    excess load is rejected fast (429/503) instead of queueing without bound
+    """
+
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        route_class = classify(scope["path"]) if scope["type"] == "http" else None
+        if route_class is None:
+            await self.app(scope, receive, send)
+            return
+
+        if RATE_LIMIT_PER_SECOND > 0:
+            retry_after = bucket_store.take(client_key(scope), RATE_LIMIT_PER_SECOND, RATE_LIMIT_BURST)
+            if retry_after > 0:
+                await self._shed(scope, receive, send, 429, "rate_limited", route_class, retry_after)
+                return
+
+        limiter = limiters.get(route_class)
+        if limiter is None:
+            await self.app(scope, receive, send)
+            return
+        reason = await limiter.acquire()
+        if reason is not None:
+            await self._shed(scope, receive, send, 503, reason, route_class, 1)
+            return
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            limiter.release()
+
+    async def _shed(self, scope, receive, send, status_code, reason, route_class, retry_after):
+        metrics.increment("requests_shed", reason=reason, route_class=route_class)
+        response = JSONResponse(
+            status_code=status_code,
+            content={"detail": "Too many requests" if status_code == 429 else "Server is busy, please retry"},
+            headers={"Retry-After": str(max(1, round(retry_after)))}
+        )
+        await response(scope, receive, send)
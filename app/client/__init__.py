@@ -0,0 +1,18 @@
+"""
+Async Python client for the To-Do App API
+
+Needs httpx (msgpack optional); no FastAPI or database imports:
+
+    from app.client import AsyncApiClient
+
+    async with AsyncApiClient("http://localhost:8000", api_key="...") as api:
+        miles = await api.convert(100, "kilometer", "mile", "length")
+        await api.download_export("exports/", kind="conversions")
+"""
+from app.client.client import ApiError, AsyncApiClient, ExportDownload
+
+__all__ = [
+    "ApiError",
+    "AsyncApiClient",
+    "ExportDownload",
+]
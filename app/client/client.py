@@ -0,0 +1,397 @@
+"""
+Async HTTP client for the To-Do App API
+"""
+import asyncio
+import email.message
+import sys
+from array import array
+from datetime import date
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple, Union
+
+import anyio
+import httpx
+
+try:
+    import msgpack
+except ImportError:  # JSON only
+    msgpack = None
+
+MSGPACK_MEDIA_TYPE = "application/msgpack"
+WATERMARK_HEADERS = ("X-Next-Since-Id", "X-Next-Since-Timestamp", "X-Next-Deleted-Since-Id")
+EXPORTS = {
+    "all": "/api/export/excel",
+    "todos": "/api/export/excel/todos",
+    "conversions": "/api/export/excel/conversions",
+    "rollups": "/api/export/excel/rollups",
+    "sharded": "/api/export/excel/sharded",
+}
+
+# (from_unit, to_unit, unit_type)
+_UnitPair = Tuple[str, str, str]
+
+
+class ApiError(Exception):
+    """
+    The API answered with an error status
+    """
+
+    def __init__(self, status_code: int, detail: Any):
+        super().__init__(f"{status_code}: {detail}")
+        self.status_code = status_code
+        self.detail = detail
+
+
+class ExportDownload:
+    """
+    A downloaded export file and the watermarks of the next delta export
+    """
+
+    def __init__(self, path: Path, watermarks: Dict[str, str]):
+        self.path = path
+        self.watermarks = watermarks
+
+    def __repr__(self) -> str:
+        return f"ExportDownload(path={str(self.path)!r}, watermarks={self.watermarks!r})"
+
+
+def _pack_floats(values: List[float]) -> bytes:
+    packed = array("d", values)
+    if sys.byteorder == "big":
+        packed.byteswap()
+    return packed.tobytes()
+
+
+def _unpack_floats(data: bytes) -> List[float]:
+    values = array("d")
+    values.frombytes(data)
+    if sys.byteorder == "big":
+        values.byteswap()
+    return values.tolist()
+
+
+class _ConvertBatcher:
+    """
+    Collects convert() calls per unit pair for `window` seconds (or until
+    `max_size` values) and sends each group as one batch request
+    """
+
+    def __init__(self, client: "AsyncApiClient", window: float, max_size: int):
+        self.client = client
+        self.window = window
+        self.max_size = max_size
+        self._pending: Dict[_UnitPair, List[Tuple[float, asyncio.Future]]] = {}
+        self._timers: Dict[_UnitPair, asyncio.TimerHandle] = {}
+        self._sending: set = set()
+
+    def submit(self, value: float, pair: _UnitPair) -> asyncio.Future:
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        items = self._pending.setdefault(pair, [])
+        items.append((value, future))
+        if len(items) >= self.max_size:
+            self._flush(pair)
+        elif len(items) == 1:
+            self._timers[pair] = loop.call_later(self.window, self._flush, pair)
+        return future
+
+    def _flush(self, pair: _UnitPair) -> None:
+        timer = self._timers.pop(pair, None)
+        if timer is not None:
+            timer.cancel()
+        items = self._pending.pop(pair, None)
+        if items:
+            task = asyncio.get_running_loop().create_task(self._send(pair, items))
+            self._sending.add(task)
+            task.add_done_callback(self._sending.discard)
+
+    async def _send(self, pair: _UnitPair, items: List[Tuple[float, asyncio.Future]]) -> None:
+        try:
+            results = await self.client.convert_many([value for value, _ in items], *pair)
+        except ApiError as e:
+            if e.status_code == 400 and len(items) > 1:
+                # One invalid value rejects the whole batch: retry one by one
+                # so only the callers with invalid values get the error
+                await asyncio.gather(*(self._send_one(pair, value, future) for value, future in items))
+                return
+            self._fail(items, e)
+            return
+        except Exception as e:
+            self._fail(items, e)
+            return
+        for (_, future), result in zip(items, results):
+            if not future.done():
+                future.set_result(result)
+
+    async def _send_one(self, pair: _UnitPair, value: float, future: asyncio.Future) -> None:
+        try:
+            result = await self.client.convert_one(value, *pair)
+        except Exception as e:
+            self._fail([(value, future)], e)
+        else:
+            if not future.done():
+                future.set_result(result)
+
+    @staticmethod
+    def _fail(items: List[Tuple[float, asyncio.Future]], error: Exception) -> None:
+        for _, future in items:
+            if not future.done():
+                future.set_exception(error)
+
+    async def drain(self) -> None:
+        """
+        Send everything collected so far and wait for the answers
+        """
+        for pair in list(self._pending):
+            self._flush(pair)
+        if self._sending:
+            await asyncio.gather(*self._sending, return_exceptions=True)
+
+
+class AsyncApiClient:
+    """
+    Async client for the converter, history, todos and export endpoints
+
+    One instance keeps a pool of keep-alive connections; share it across
+    tasks and close it (or use `async with`) when done. convert() calls
+    made within `batch_window` seconds of each other are sent as one
+    /convert/batch request per unit pair (msgpack when installed).
+    Requests rejected with 429/503 are retried after Retry-After.
+
+    Pass `transport=httpx.ASGITransport(app=app)` to call an in-process
+    app instance without a server.
+    """
+
+    def __init__(
+        self,
+        base_url: str = "http://localhost:8000",
+        *,
+        api_key: Optional[str] = None,
+        timeout: float = 30.0,
+        max_connections: int = 20,
+        batch_window: float = 0.005,
+        max_batch_size: int = 1000,
+        use_msgpack: Optional[bool] = None,
+        retries: int = 2,
+        transport: Optional[httpx.AsyncBaseTransport] = None,
+    ):
+        headers = {"X-API-Key": api_key} if api_key else {}
+        self._http = httpx.AsyncClient(
+            base_url=base_url,
+            headers=headers,
+            timeout=timeout,
+            limits=httpx.Limits(max_connections=max_connections, max_keepalive_connections=max_connections),
+            transport=transport,
+        )
+        self.use_msgpack = msgpack is not None if use_msgpack is None else use_msgpack
+        if self.use_msgpack and msgpack is None:
+            raise ImportError("use_msgpack=True needs the msgpack package")
+        self.retries = retries
+        self._batcher = _ConvertBatcher(self, batch_window, max_batch_size) if batch_window > 0 else None
+        self._units: Optional[Dict[str, List[str]]] = None
+
+    async def __aenter__(self) -> "AsyncApiClient":
+        return self
+
+    async def __aexit__(self, *exc) -> None:
+        await self.aclose()
+
+    async def aclose(self) -> None:
+        """
+        Send pending conversions and close the connections
+        """
+        if self._batcher is not None:
+            await self._batcher.drain()
+        await self._http.aclose()
+
+    async def _request(self, method: str, path: str, **kwargs) -> httpx.Response:
+        for attempt in range(self.retries + 1):
+            response = await self._http.request(method, path, **kwargs)
+            if response.status_code in (429, 503) and attempt < self.retries:
+                await asyncio.sleep(min(float(response.headers.get("Retry-After", "1")), 5.0))
+                continue
+            break
+        if response.status_code >= 400:
+            raise _api_error(response)
+        return response
+
+    # Converter
+    async def convert(self, value: float, from_unit: str, to_unit: str, unit_type: str) -> float:
+        """
+        Convert one value (batched with concurrent calls for the same units)
+        """
+        if self._batcher is None:
+            return await self.convert_one(value, from_unit, to_unit, unit_type)
+        return await self._batcher.submit(value, (from_unit, to_unit, unit_type))
+
+    async def convert_one(self, value: float, from_unit: str, to_unit: str, unit_type: str) -> float:
+        """
+        Convert one value with its own /convert request
+        """
+        response = await self._request("POST", "/api/converter/convert", json={
+            "value": value, "from_unit": from_unit, "to_unit": to_unit, "unit_type": unit_type
+        })
+        return response.json()["result"]
+
+    async def convert_many(self, values: List[float], from_unit: str, to_unit: str, unit_type: str) -> List[float]:
+        """
+        Convert values with one /convert/batch request (all fail if one is invalid)
+        """
+        payload = {"from_unit": from_unit, "to_unit": to_unit, "unit_type": unit_type}
+        if not self.use_msgpack:
+            response = await self._request("POST", "/api/converter/convert/batch", json={"values": values, **payload})
+            return response.json()["results"]
+        response = await self._request(
+            "POST",
+            "/api/converter/convert/batch",
+            content=msgpack.packb({"values": _pack_floats(values), **payload}, use_bin_type=True),
+            headers={"Content-Type": MSGPACK_MEDIA_TYPE, "Accept": MSGPACK_MEDIA_TYPE},
+        )
+        return _unpack_floats(msgpack.unpackb(response.content, raw=False)["results"])
+
+    async def units(self, refresh: bool = False) -> Dict[str, List[str]]:
+        """
+        Get the units per unit type (fetched once per client)
+        """
+        if self._units is None or refresh:
+            self._units = (await self._request("GET", "/api/converter/units")).json()
+        return self._units
+
+    # Conversion history
+    async def save_history(
+        self,
+        value: float,
+        from_unit: str,
+        to_unit: str,
+        result: float,
+        unit_type: str,
+        idempotency_key: Optional[str] = None,
+    ) -> dict:
+        """
+        Save a conversion to the history (retry-safe with an idempotency key)
+        """
+        headers = {"Idempotency-Key": idempotency_key} if idempotency_key else None
+        response = await self._request("POST", "/api/converter/history", headers=headers, json={
+            "value": value, "from_unit": from_unit, "to_unit": to_unit, "result": result, "unit_type": unit_type
+        })
+        return response.json()
+
+    async def history(self, page: int = 1, page_size: int = 20, unit_type: Optional[str] = None) -> List[dict]:
+        params = {"page": page, "page_size": page_size}
+        if unit_type is not None:
+            params["unit_type"] = unit_type
+        return (await self._request("GET", "/api/converter/history", params=params)).json()
+
+    async def history_usage(self) -> dict:
+        return (await self._request("GET", "/api/converter/history/usage")).json()
+
+    async def history_stats(
+        self, unit_type: Optional[str] = None, start_day: Optional[date] = None, end_day: Optional[date] = None
+    ) -> List[dict]:
+        params = {
+            name: str(value) for name, value in
+            (("unit_type", unit_type), ("start_day", start_day), ("end_day", end_day)) if value is not None
+        }
+        return (await self._request("GET", "/api/converter/history/stats", params=params)).json()
+
+    async def delete_history(self, history_id: int) -> None:
+        await self._request("DELETE", f"/api/converter/history/{history_id}")
+
+    async def clear_history(self, older_than_days: Optional[float] = None) -> dict:
+        """
+        Clear the history (with older_than_days: returns the background job)
+        """
+        params = {"older_than_days": older_than_days} if older_than_days is not None else None
+        return (await self._request("DELETE", "/api/converter/history", params=params)).json()
+
+    # Todos
+    async def create_todo(
+        self, title: str, description: Optional[str] = None, completed: bool = False,
+        idempotency_key: Optional[str] = None
+    ) -> dict:
+        headers = {"Idempotency-Key": idempotency_key} if idempotency_key else None
+        response = await self._request("POST", "/api/todos", headers=headers, json={
+            "title": title, "description": description, "completed": completed
+        })
+        return response.json()
+
+    async def list_todos(
+        self, page: int = 1, page_size: int = 10, completed: Optional[bool] = None, q: Optional[str] = None
+    ) -> dict:
+        """
+        Get a page of todos ({"items", "total", "page", ...})
+        """
+        params = {"page": page, "page_size": page_size}
+        if completed is not None:
+            params["completed"] = str(completed).lower()
+        if q:
+            params["q"] = q
+        return (await self._request("GET", "/api/todos", params=params)).json()
+
+    async def get_todo(self, todo_id: int) -> dict:
+        return (await self._request("GET", f"/api/todos/{todo_id}")).json()
+
+    async def update_todo(self, todo_id: int, **fields) -> dict:
+        """
+        Change some fields of a todo (title, description, completed)
+        """
+        return (await self._request("PATCH", f"/api/todos/{todo_id}", json=fields)).json()
+
+    async def delete_todo(self, todo_id: int) -> None:
+        await self._request("DELETE", f"/api/todos/{todo_id}")
+
+    # Exports
+    async def download_export(
+        self,
+        destination: Union[str, Path] = ".",
+        kind: str = "all",
+        chunk_size: int = 1 << 16,
+        **params,
+    ) -> ExportDownload:
+        """
+        Stream an Excel export (or the sharded zip) to disk
+
+        kind is one of all, todos, conversions, rollups, sharded; params are
+        the endpoint's query parameters (since_id, since_timestamp,
+        deleted_since_id, tables). destination is a file or a directory
+        (then the server's file name is used).
+        """
+        if kind not in EXPORTS:
+            raise ValueError(f"kind must be one of {', '.join(EXPORTS)}, got {kind!r}")
+        params = {name: str(value) for name, value in params.items() if value is not None}
+        destination = Path(destination)
+        async with self._http.stream("GET", EXPORTS[kind], params=params) as response:
+            if response.status_code >= 400:
+                await response.aread()
+                raise _api_error(response)
+            if destination.is_dir():
+                destination = destination / _attachment_name(response, kind)
+            partial = destination.with_name(destination.name + ".part")
+            try:
+                # Writes go to a worker thread, keeping the event loop free
+                async with await anyio.open_file(partial, "wb") as f:
+                    async for chunk in response.aiter_bytes(chunk_size):
+                        await f.write(chunk)
+                partial.replace(destination)
+            except BaseException:
+                partial.unlink(missing_ok=True)
+                raise
+        watermarks = {name: response.headers[name] for name in WATERMARK_HEADERS if name in response.headers}
+        return ExportDownload(destination, watermarks)
+
+
+def _api_error(response: httpx.Response) -> ApiError:
+    try:
+        body = response.json()
+    except ValueError:
+        return ApiError(response.status_code, response.text)
+    return ApiError(response.status_code, body.get("detail", body) if isinstance(body, dict) else body)
+
+
+def _attachment_name(response: httpx.Response, kind: str) -> str:
+    message = email.message.Message()
+    message["content-disposition"] = response.headers.get("content-disposition", "")
+    filename = message.get_filename()
+    if filename:
+        return Path(filename).name
+    return f"export_{kind}.zip" if kind == "sharded" else f"export_{kind}.xlsx"
@@ -0,0 +1,235 @@
+"""
+Row counters maintained by database triggers
+
+Every insert, delete and filter-column update on todos and
+conversion_history adjusts rows of row_counters in the same transaction,
+so list totals are a small primary-key range read instead of COUNT(*).
+Counters:
+
+    todos, todos.completed.true, todos.completed.false
+    conversion_history, conversion_history.unit_type.<unit_type_id>,
+    conversion_history.tenant.<tenant_id>
+
+On PostgreSQL each counter is spread over ROW_COUNTER_SLOTS rows (the
+writing backend picks one) and its value is their sum, so concurrent
+writers don't all queue on the table-total row. SQLite has a single
+writer and uses one slot.
+
+Triggers also cover bulk paths (imports, retention, rollup compaction,
+TRUNCATE on PostgreSQL). reconcile() repairs drift (e.g. rows changed
+while triggers were not installed) without locking the tables: it
+compares the counts with the counters in one statement's snapshot and
+adds the difference.
+"""
+import logging
+import os
+from typing import Optional
+from sqlalchemy import func, select, text
+from sqlalchemy.engine import Engine
+from sqlalchemy.orm import Session
+from app.database import engine as default_engine
+from app import models
+
+logger = logging.getLogger(__name__)
+
+# Periodic recount interval (0 disables; counters are also reconciled when the schema is installed)
+ROW_COUNTER_RECONCILE_SECONDS = float(os.getenv("ROW_COUNTER_RECONCILE_SECONDS", "0"))
+# Rows per counter on PostgreSQL
+ROW_COUNTER_SLOTS = max(1, int(os.getenv("ROW_COUNTER_SLOTS", "16")))
+
+TODOS = "todos"
+HISTORY = "conversion_history"
+
+
+def todos_completed(completed: bool) -> str:
+    return f"{TODOS}.completed.{'true' if completed else 'false'}"
+
+
+def history_unit_type(unit_type_id: int) -> str:
+    return f"{HISTORY}.unit_type.{unit_type_id}"
+
+
+def history_tenant(tenant_id: str) -> str:
+    return f"{HISTORY}.tenant.{tenant_id}"
+
+
+# Counter name of a row's filter values, as SQL over a row alias (NEW/OLD or the table)
+FILTER_COUNTERS = {
+    TODOS: [
+        ("completed", lambda row: f"'{TODOS}.completed.' || CASE WHEN {row}.completed THEN 'true' ELSE 'false' END"),
+    ],
+    HISTORY: [
+        ("unit_type_id", lambda row: f"'{HISTORY}.unit_type.' || CAST({row}.unit_type_id AS TEXT)"),
+        ("tenant_id", lambda row: f"'{HISTORY}.tenant.' || {row}.tenant_id"),
+    ],
+}
+
+
+def _sqlite_triggers(table: str) -> list:
+    filters = FILTER_COUNTERS[table]
+
+    def add(name_sql: str, delta: int) -> str:
+        return (
+            f"INSERT INTO row_counters (name, slot, value) VALUES ({name_sql}, 0, {delta}) "
+            "ON CONFLICT (name, slot) DO UPDATE SET value = value + excluded.value;"
+        )
+
+    table_name = f"'{table}'"
+    # Dropped first so a new schema version replaces older trigger bodies
+    statements = [
+        f"DROP TRIGGER IF EXISTS {table}_count_insert",
+        f"CREATE TRIGGER {table}_count_insert AFTER INSERT ON {table} BEGIN "
+        f"{add(table_name, 1)} {' '.join(add(key('NEW'), 1) for _, key in filters)} END",
+        f"DROP TRIGGER IF EXISTS {table}_count_delete",
+        f"CREATE TRIGGER {table}_count_delete AFTER DELETE ON {table} BEGIN "
+        f"{add(table_name, -1)} {' '.join(add(key('OLD'), -1) for _, key in filters)} END",
+        # Trigger of the single-filter schema
+        f"DROP TRIGGER IF EXISTS {table}_count_update",
+    ]
+    for column, key in filters:
+        statements += [
+            f"DROP TRIGGER IF EXISTS {table}_count_update_{column}",
+            f"CREATE TRIGGER {table}_count_update_{column} AFTER UPDATE OF {column} ON {table} "
+            f"WHEN OLD.{column} IS NOT NEW.{column} BEGIN {add(key('OLD'), -1)} {add(key('NEW'), 1)} END",
+        ]
+    return statements
+
+
+def _postgresql_triggers(table: str) -> list:
+    filters = FILTER_COUNTERS[table]
+    columns = ", ".join(column for column, _ in filters)
+    indent = "\n" + " " * 16
+    inserted = indent.join(f"PERFORM row_counter_add({key('NEW')}, 1);" for _, key in filters)
+    deleted = indent.join(f"PERFORM row_counter_add({key('OLD')}, -1);" for _, key in filters)
+    updated = indent.join(
+        f"IF OLD.{column} IS DISTINCT FROM NEW.{column} THEN "
+        f"PERFORM row_counter_add({key('OLD')}, -1); PERFORM row_counter_add({key('NEW')}, 1); END IF;"
+        for column, key in filters
+    )
+    return [
+        f"""
+        CREATE OR REPLACE FUNCTION {table}_count_row() RETURNS trigger AS $$
+        BEGIN
+            IF TG_OP = 'INSERT' THEN
+                PERFORM row_counter_add('{table}', 1);
+                {inserted}
+            ELSIF TG_OP = 'DELETE' THEN
+                PERFORM row_counter_add('{table}', -1);
+                {deleted}
+            ELSE
+                {updated}
+            END IF;
+            RETURN NULL;
+        END
+        $$ LANGUAGE plpgsql
+        """,
+        # TRUNCATE fires no row triggers: reset this table's counters instead
+        f"""
+        CREATE OR REPLACE FUNCTION {table}_count_truncate() RETURNS trigger AS $$
+        BEGIN
+            UPDATE row_counters SET value = 0 WHERE name = '{table}' OR name LIKE '{table}.%';
+            RETURN NULL;
+        END
+        $$ LANGUAGE plpgsql
+        """,
+        f"DROP TRIGGER IF EXISTS {table}_count ON {table}",
+        f"CREATE TRIGGER {table}_count AFTER INSERT OR DELETE OR UPDATE OF {columns} ON {table} "
+        f"FOR EACH ROW EXECUTE FUNCTION {table}_count_row()",
+        f"DROP TRIGGER IF EXISTS {table}_count_truncate ON {table}",
+        f"CREATE TRIGGER {table}_count_truncate AFTER TRUNCATE ON {table} "
+        f"FOR EACH STATEMENT EXECUTE FUNCTION {table}_count_truncate()",
+    ]
+
+
+def install(engine: Engine = default_engine) -> None:
+    """
+    Create (or replace) the counter triggers and load the current counts
+    """
+    dialect = engine.dialect.name
+    with engine.begin() as conn:
+        if dialect == "postgresql":
+            # All of a backend's updates go to one slot: transactions on
+            # different slots never wait for each other, and on the same slot
+            # they lock the counters in the same order
+            conn.execute(text(f"""
+                CREATE OR REPLACE FUNCTION row_counter_add(counter TEXT, delta BIGINT) RETURNS void AS $$
+                    INSERT INTO row_counters (name, slot, value)
+                    VALUES (counter, pg_backend_pid() % {ROW_COUNTER_SLOTS}, delta)
+                    ON CONFLICT (name, slot) DO UPDATE SET value = row_counters.value + EXCLUDED.value
+                $$ LANGUAGE sql
+            """))
+        for table in FILTER_COUNTERS:
+            statements = _postgresql_triggers(table) if dialect == "postgresql" else _sqlite_triggers(table)
+            for statement in statements:
+                conn.execute(text(statement))
+    reconcile(engine)
+
+
+def _drift_query(table: str, filters: list) -> str:
+    # Actual count minus stored counter, per counter, read in one statement
+    # (one snapshot: triggers keep rows and counters in step, so the difference
+    # stays right however many writes commit after it)
+    actual = [f"SELECT '{table}' AS name, count(*) AS n FROM {table}"] + [
+        f"SELECT {key(table)}, count(*) FROM {table} GROUP BY {column}" for column, key in filters
+    ]
+    stored = (
+        f"SELECT name, -sum(value) FROM row_counters WHERE name = '{table}' OR name LIKE '{table}.%' GROUP BY name"
+    )
+    return (
+        f"SELECT name, sum(n) AS drift FROM ({' UNION ALL '.join(actual + [stored])}) counts "
+        "GROUP BY name HAVING sum(n) <> 0"
+    )
+
+
+def reconcile(engine: Engine = default_engine) -> int:
+    """
+    Recount every counter from the tables and add any drift
+
+    Takes no table lock: writers keep going while the tables are counted.
+    Returns:
+        int: Number of counters that were wrong
+    """
+    drifted = {}
+    for table, filters in FILTER_COUNTERS.items():
+        with engine.connect() as conn:
+            drifted.update((name, int(drift)) for name, drift in conn.execute(text(_drift_query(table, filters))))
+    if drifted:
+        with engine.begin() as conn:
+            for name, drift in drifted.items():
+                conn.execute(text(
+                    "INSERT INTO row_counters (name, slot, value) VALUES (:name, 0, :drift) "
+                    "ON CONFLICT (name, slot) DO UPDATE SET value = row_counters.value + excluded.value"
+                ), {"name": name, "drift": drift})
+        logger.warning(f"Row counters reconciled ({len(drifted)} corrected): {drifted}")
+    return len(drifted)
+
+
+def run_scheduled_reconcile() -> None:
+    """
+    Scheduled task: recount the row counters
+    """
+    reconcile()
+
+
+def totals(db: Session, names: Optional[list] = None) -> dict:
+    """
+    Get counter values (summed over their slots), of all counters or of `names`
+    """
+    counter = models.RowCounter
+    query = select(counter.name, func.sum(counter.value)).group_by(counter.name)
+    if names is not None:
+        query = query.where(counter.name.in_(names))
+    return {name: int(value) for name, value in db.execute(query).all()}
+
+
+def count(db: Session, table: str, name: Optional[str] = None) -> Optional[int]:
+    """
+    Get a maintained row count (of the table, or of counter `name`)
+
+    Returns None when the counters are not installed, so callers can fall
+    back to COUNT(*).
+    """
+    values = totals(db, [table] if name is None else [table, name])
+    if table not in values:
+        return None
+    return values.get(name or table, 0)
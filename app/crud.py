@@ -1,12 +1,41 @@
 from sqlalchemy.orm import Session
-from sqlalchemy import desc
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy import desc, update, delete, text, func, select
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
 from typing import List, Optional
-from app import models, schemas
+from app import models, schemas, search, idempotency, events, counters, units, page_cache, tenants, rollups
 
 
-def create_todo(db: Session, todo: schemas.TodoCreate) -> models.Todo:
+def _publish_todo(type: str, db_todo: models.Todo) -> None:
+    page_cache.bump(page_cache.TODOS)
+    events.publish(events.TOPIC_TODOS, type, schemas.TodoResponse.model_validate(db_todo).model_dump(mode="json"))
+
+
+def _publish_history(type: str, db_conversion: models.ConversionHistory) -> None:
+    page_cache.bump(page_cache.HISTORY)
+    events.publish(
+        events.TOPIC_HISTORY,
+        type,
+        {
+            **schemas.ConversionHistoryResponse.model_validate(db_conversion).model_dump(mode="json"),
+            "tenant_id": db_conversion.tenant_id,
+        }
+    )
+
+
+def create_todo(
+    db: Session,
+    todo: schemas.TodoCreate,
+    idempotency_key: Optional[str] = None
+) -> models.Todo:
     """
     Create a new Todo
+    
+    With an idempotency key, the key and a hash of the body are stored in
+    the same transaction.
+    Raises:
+        idempotency.Replayed: A concurrent request with the key created its Todo first
     """
     db_todo = models.Todo(
         title=todo.title,
@@ -14,8 +43,25 @@ def create_todo(db: Session, todo: schemas.TodoCreate) -> models.Todo:
         completed=todo.completed if todo.completed is not None else False
     )
     db.add(db_todo)
-    db.commit()
+    db.flush()
+    search.index_todo(db, db_todo.id, db_todo.title, db_todo.description)
+    body_hash = idempotency.request_hash(todo) if idempotency_key else None
+    if idempotency_key:
+        idempotency.record(db, idempotency.SCOPE_TODOS, idempotency_key, db_todo.id, body_hash)
+    try:
+        db.commit()
+    except IntegrityError:
+        db.rollback()
+        if not idempotency_key:
+            raise
+        todo_id = idempotency.lookup(db, idempotency.SCOPE_TODOS, idempotency_key, body_hash)
+        if todo_id is None:
+            raise
+        raise idempotency.Replayed(get_todo(db, todo_id))
+    if idempotency_key:
+        idempotency.remember(idempotency.SCOPE_TODOS, idempotency_key, db_todo.id, body_hash)
     db.refresh(db_todo)
+    _publish_todo("todo.created", db_todo)
     return db_todo
 
 
@@ -44,8 +90,11 @@ def get_todos(
     if completed is not None:
         query = query.filter(models.Todo.completed == completed)
     
-    # Get total count
-    total = query.count()
+    # Get total count (maintained counter; COUNT(*) if counters are not installed)
+    counter = None if completed is None else counters.todos_completed(completed)
+    total = counters.count(db, counters.TODOS, counter)
+    if total is None:
+        total = query.count()
     
     # Sort by created_at (newest first)
     # Pagination
@@ -54,6 +103,22 @@ def get_todos(
     return todos, total
 
 
+def search_todos(
+    db: Session,
+    q: str,
+    skip: int = 0,
+    limit: int = 100,
+    completed: Optional[bool] = None
+) -> tuple[List[models.Todo], int, bool]:
+    """
+    Search Todos by title and description (ranked, best match first)
+    
+    Returns:
+        tuple: (list of todos, match count, whether the count was capped at search.SEARCH_MAX_CANDIDATES)
+    """
+    return search.search_todos(db, q, skip=skip, limit=limit, completed=completed)
+
+
 def update_todo(
     db: Session,
     todo_id: int,
@@ -61,101 +126,300 @@ def update_todo(
 ) -> Optional[models.Todo]:
     """
     Update a Todo
+
+    Issues a single UPDATE ... RETURNING statement instead of
+    SELECT + UPDATE + refresh (PostgreSQL and SQLite 3.35+).
     """
-    db_todo = get_todo(db, todo_id)
-    if not db_todo:
-        return None
-    
     # Update fields that were sent
     update_data = todo_update.model_dump(exclude_unset=True)
-    for field, value in update_data.items():
-        setattr(db_todo, field, value)
+    if not update_data:
+        return get_todo(db, todo_id)
     
+    stmt = (
+        update(models.Todo)
+        .where(models.Todo.id == todo_id)
+        .values(**update_data)
+        .returning(models.Todo)
+        .execution_options(synchronize_session=False)
+    )
+    db_todo = db.scalars(stmt).first()
+    if db_todo is None:
+        db.rollback()
+        return None
+    
+    if "title" in update_data or "description" in update_data:
+        search.index_todo(db, db_todo.id, db_todo.title, db_todo.description)
+    
+    # Detach so commit does not expire the RETURNING values (no refresh SELECT)
+    db.expunge(db_todo)
     db.commit()
-    db.refresh(db_todo)
+    _publish_todo("todo.updated", db_todo)
     return db_todo
 
 
 def delete_todo(db: Session, todo_id: int) -> bool:
     """
-    Delete a Todo
+    Delete a Todo with a single DELETE ... RETURNING statement
     Returns:
         bool: True if deleted, False if Todo not found
     """
-    db_todo = get_todo(db, todo_id)
-    if not db_todo:
+    stmt = delete(models.Todo).where(models.Todo.id == todo_id).returning(models.Todo.id)
+    deleted_id = db.execute(stmt).scalar()
+    if deleted_id is None:
+        db.rollback()
         return False
     
-    db.delete(db_todo)
+    search.unindex_todo(db, deleted_id)
     db.commit()
+    page_cache.bump(page_cache.TODOS)
+    events.publish(events.TOPIC_TODOS, "todo.deleted", {"id": deleted_id})
     return True
 
 
+def _bulk_insert(db: Session, model, rows: List[dict], *returning):
+    # Rows carrying an existing id are skipped instead of failing the batch
+    # (no conflict target: the partitioned history table's key is (tenant_id, id))
+    insert = pg_insert if db.get_bind().dialect.name == "postgresql" else sqlite_insert
+    stmt = insert(model).on_conflict_do_nothing().returning(*returning)
+    return db.execute(stmt, rows).all()
+
+
+def bulk_create_todos(db: Session, rows: List[dict]) -> List[int]:
+    """
+    Insert many validated todo rows with one multi-row INSERT and index them for search
+
+    All rows must have the same keys. Rows whose `id` already exists are skipped.
+    Returns:
+        List[int]: ids of the inserted todos
+    """
+    if not rows:
+        return []
+    inserted = _bulk_insert(db, models.Todo, rows, models.Todo.id, models.Todo.title, models.Todo.description)
+    search.index_todos(db, [tuple(row) for row in inserted])
+    db.commit()
+    ids = [row.id for row in inserted]
+    if ids:
+        page_cache.bump(page_cache.TODOS)
+        events.publish(events.TOPIC_TODOS, "todo.imported", {"count": len(ids), "first_id": min(ids), "last_id": max(ids)})
+    return ids
+
+
 # Conversion History CRUD operations
-def create_conversion_history(db: Session, conversion: schemas.ConversionHistoryCreate) -> models.ConversionHistory:
+def create_conversion_history(
+    db: Session,
+    conversion: schemas.ConversionHistoryCreate,
+    idempotency_key: Optional[str] = None,
+    tenant_id: str = tenants.DEFAULT_TENANT
+) -> models.ConversionHistory:
     """
-    Create a new conversion history record
+    Create a new conversion history record for a tenant
+    
+    With an idempotency key, the key and a hash of the body are stored in
+    the same transaction.
+    Raises:
+        idempotency.Replayed: A concurrent request with the key created its record first
     """
     db_conversion = models.ConversionHistory(
         value=conversion.value,
         from_unit=conversion.from_unit,
         to_unit=conversion.to_unit,
         result=conversion.result,
-        unit_type=conversion.unit_type
+        unit_type=conversion.unit_type,
+        tenant_id=tenant_id
     )
     db.add(db_conversion)
-    db.commit()
+    scope = idempotency.history_scope(tenant_id)
+    body_hash = idempotency.request_hash(conversion) if idempotency_key else None
+    if idempotency_key:
+        db.flush()
+        idempotency.record(db, scope, idempotency_key, db_conversion.id, body_hash)
+    try:
+        db.commit()
+    except IntegrityError:
+        db.rollback()
+        if not idempotency_key:
+            raise
+        history_id = idempotency.lookup(db, scope, idempotency_key, body_hash)
+        if history_id is None:
+            raise
+        raise idempotency.Replayed(get_conversion_history_item(db, history_id, tenant_id))
+    if idempotency_key:
+        idempotency.remember(scope, idempotency_key, db_conversion.id, body_hash)
     db.refresh(db_conversion)
+    _publish_history("history.created", db_conversion)
+    return db_conversion
+
+
+def bulk_create_conversion_history(db: Session, rows: List[dict]) -> List[int]:
+    """
+    Insert many validated conversion history rows (unit ids, not names)
+    with one multi-row INSERT
+
+    All rows must have the same keys (and tenant). Rows whose `id` already exists are skipped.
+    Returns:
+        List[int]: ids of the inserted records
+    """
+    if not rows:
+        return []
+    ids = [row.id for row in _bulk_insert(db, models.ConversionHistory, rows, models.ConversionHistory.id)]
+    db.commit()
+    if ids:
+        page_cache.bump(page_cache.HISTORY)
+        events.publish(events.TOPIC_HISTORY, "history.imported", {
+            "count": len(ids), "first_id": min(ids), "last_id": max(ids),
+            "tenant_id": rows[0].get("tenant_id", tenants.DEFAULT_TENANT)
+        })
+    return ids
+
+
+def reset_id_sequence(db: Session, model) -> None:
+    """
+    Move a PostgreSQL id sequence past the largest id (after inserting explicit ids)
+    """
+    if db.get_bind().dialect.name != "postgresql":
+        return
+    table = model.__tablename__
+    db.execute(text(
+        f"SELECT setval(pg_get_serial_sequence('{table}', 'id'), coalesce(max(id), 0) + 1, false) FROM {table}"
+    ))
+    db.commit()
+
+
+def get_conversion_history_item(
+    db: Session,
+    history_id: int,
+    tenant_id: Optional[str] = None
+) -> Optional[models.ConversionHistory]:
+    """
+    Get a conversion history record by ID (only within tenant_id, if given)
+    """
+    db_conversion = db.get(models.ConversionHistory, history_id)
+    if db_conversion is not None and tenant_id is not None and db_conversion.tenant_id != tenant_id:
+        return None
     return db_conversion
 
 
 def get_conversion_history(
     db: Session,
     skip: int = 0,
-    limit: int = 50
+    limit: int = 50,
+    unit_type: Optional[str] = None,
+    tenant_id: Optional[str] = None
 ) -> tuple[List[models.ConversionHistory], int]:
     """
-    Get conversion history with pagination
+    Get conversion history with pagination, optionally for one unit type
+    and one tenant (the tenant filter prunes PostgreSQL to one partition)
     Returns:
         tuple: (list of conversions, total count)
     """
     query = db.query(models.ConversionHistory)
-    total = query.count()
+    counter = None
+    if unit_type is not None:
+        unit_type_id = units.unit_type_id(unit_type)
+        query = query.filter(models.ConversionHistory.unit_type_id == unit_type_id)
+        counter = counters.history_unit_type(unit_type_id)
+    if tenant_id is not None:
+        query = query.filter(models.ConversionHistory.tenant_id == tenant_id)
+        counter = counters.history_tenant(tenant_id)
+    if tenant_id is not None and unit_type is not None:
+        # No counter per (tenant, unit type): count within the tenant's partition
+        total = query.count()
+    else:
+        total = counters.count(db, counters.HISTORY, counter)
+        if total is None:
+            total = query.count()
     conversions = query.order_by(desc(models.ConversionHistory.created_at)).offset(skip).limit(limit).all()
     return conversions, total
 
 
-def delete_conversion_history(db: Session, history_id: int) -> bool:
+def delete_conversion_history(db: Session, history_id: int, tenant_id: Optional[str] = None) -> bool:
     """
-    Delete a conversion history record
+    Delete a conversion history record (only within tenant_id, if given)
+    with a single DELETE ... RETURNING statement
+
+    A record already folded into the daily rollups is taken out of them in
+    the same transaction.
     """
-    db_history = db.query(models.ConversionHistory).filter(models.ConversionHistory.id == history_id).first()
-    if not db_history:
+    watermark = rollups.lock_watermark(db)
+    stmt = (
+        delete(models.ConversionHistory)
+        .where(models.ConversionHistory.id == history_id)
+        .returning(*rollups.UNFOLD_COLUMNS)
+    )
+    if tenant_id is not None:
+        stmt = stmt.where(models.ConversionHistory.tenant_id == tenant_id)
+    deleted = db.execute(stmt).first()
+    if deleted is None:
+        db.rollback()
         return False
     
-    db.delete(db_history)
+    deleted_id = deleted.id
+    rollups.unfold(db, [deleted], watermark)
     db.commit()
+    page_cache.bump(page_cache.HISTORY)
+    events.publish(events.TOPIC_HISTORY, "history.deleted", {"ids": [deleted_id], "tenant_id": tenant_id})
     return True
 
 
-def clear_conversion_history(db: Session) -> int:
+def _truncate_partition(db: Session, partition: str, tenant_id: str) -> int:
     """
-    Clear all conversion history
+    Empty a tenant's partition with TRUNCATE (no per-row WAL or row locks)
+
+    TRUNCATE of a partition fires none of conversion_history's triggers, so
+    the row counters and the tombstone are written here, in the same transaction.
+    """
+    history = models.ConversionHistory
+    # Block writers to the partition so the counts match what is truncated
+    db.execute(text(f"LOCK TABLE {partition} IN ACCESS EXCLUSIVE MODE"))
+    per_type = db.execute(
+        select(history.unit_type_id, func.count())
+        .where(history.tenant_id == tenant_id)
+        .group_by(history.unit_type_id)
+    ).all()
+    db.execute(text(f"TRUNCATE TABLE {partition}"))
+    count = sum(n for _, n in per_type)
+    adjustments = [(counters.HISTORY, count), (counters.history_tenant(tenant_id), count)]
+    adjustments += [(counters.history_unit_type(unit_type_id), n) for unit_type_id, n in per_type]
+    for name, n in adjustments:
+        if n:
+            db.execute(text("SELECT row_counter_add(:name, :delta)"), {"name": name, "delta": -n})
+    db.add(models.ExportTombstone(table_name=history.__tablename__, row_id=None, tenant_id=tenant_id))
+    return count
+
+
+def clear_conversion_history(db: Session, tenant_id: str) -> int:
+    """
+    Clear all conversion history of a tenant
+    
+    On PostgreSQL a tenant with its own partition has it truncated; other
+    tenants' rows are deleted (from the DEFAULT partition on PostgreSQL).
+    The tenant's daily rollups are deleted with them.
     Returns:
         int: Number of deleted records
     """
-    count = db.query(models.ConversionHistory).delete()
+    rollups.lock_watermark(db)
+    rollups.drop_tenant(db, tenant_id)
+    partition = tenants.own_partition(db, tenant_id)
+    if partition is not None:
+        count = _truncate_partition(db, partition, tenant_id)
+    else:
+        count = db.query(models.ConversionHistory).filter(models.ConversionHistory.tenant_id == tenant_id).delete()
     db.commit()
+    page_cache.bump(page_cache.HISTORY)
+    events.publish(events.TOPIC_HISTORY, "history.cleared", {"count": count, "tenant_id": tenant_id})
     return count
 
 
-def get_all_conversion_history(db: Session) -> List[models.ConversionHistory]:
+def get_all_conversion_history(db: Session, tenant_id: Optional[str] = None) -> List[models.ConversionHistory]:
     """
-    Get all conversion history records without pagination
+    Get all conversion history records without pagination (only of tenant_id, if given)
     Returns:
         List[models.ConversionHistory]: All conversion history records
     """
-    return db.query(models.ConversionHistory).order_by(desc(models.ConversionHistory.created_at)).all()
+    query = db.query(models.ConversionHistory)
+    if tenant_id is not None:
+        query = query.filter(models.ConversionHistory.tenant_id == tenant_id)
+    return query.order_by(desc(models.ConversionHistory.created_at)).all()
 
 
 def get_all_todos(db: Session, completed: Optional[bool] = None) -> List[models.Todo]:
@@ -1,11 +1,19 @@
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, event, text, exc
+from sqlalchemy.sql import Insert, Update, Delete
 from sqlalchemy.ext.declarative import declarative_base
-from sqlalchemy.orm import sessionmaker
+from sqlalchemy.orm import sessionmaker, Session
+import itertools
+import logging
+import math
+import threading
+import time
 import os
 from dotenv import load_dotenv
 
 load_dotenv()
 
+logger = logging.getLogger(__name__)
+
 # Get connection information from environment variables
 # Default to SQLite for local development (no PostgreSQL setup required)
 DATABASE_URL = os.getenv(
@@ -13,24 +21,156 @@ DATABASE_URL = os.getenv(
     "sqlite:///./tododb.db"  # SQLite database file
 )
 
-# Create engine with appropriate settings
-if DATABASE_URL.startswith("sqlite"):
-    # SQLite specific settings
-    engine = create_engine(
-        DATABASE_URL,
-        connect_args={"check_same_thread": False},  # Needed for SQLite
-        echo=True
-    )
-else:
+# Optional comma-separated read replica URLs (e.g. a second SQLite file or a Postgres standby)
+READ_REPLICA_URLS = [url.strip() for url in os.getenv("READ_REPLICA_URLS", "").split(",") if url.strip()]
+# Replicas lagging more than this are skipped
+REPLICA_MAX_LAG_SECONDS = float(os.getenv("REPLICA_MAX_LAG_SECONDS", "5"))
+# How long a replica health check result is reused
+REPLICA_HEALTH_TTL_SECONDS = float(os.getenv("REPLICA_HEALTH_TTL_SECONDS", "5"))
+# Connect (and health check query) timeout for replicas, so a dead one fails fast
+REPLICA_CONNECT_TIMEOUT = float(os.getenv("REPLICA_CONNECT_TIMEOUT", "2"))
+
+
+def _create_engine(url: str, connect_timeout: float = None):
+    # Create engine with appropriate settings
+    if url.startswith("sqlite"):
+        # SQLite specific settings
+        connect_args = {"check_same_thread": False}  # Needed for SQLite
+        if connect_timeout is not None:
+            connect_args["timeout"] = connect_timeout
+        return create_engine(url, connect_args=connect_args, echo=True)
     # PostgreSQL or other databases
-    engine = create_engine(DATABASE_URL, echo=True)
+    if connect_timeout is not None and url.startswith("postgresql"):
+        # libpq takes whole seconds
+        return create_engine(url, connect_args={"connect_timeout": max(1, math.ceil(connect_timeout))}, echo=True)
+    return create_engine(url, echo=True)
+
+
+engine = _create_engine(DATABASE_URL)
+
+
+class _Replica:
+    """
+    A read replica engine with a cached health/lag check
+
+    The check runs on a background thread, one at a time per replica, so a
+    replica that is down never blocks the request that picks it. Until its
+    first check answers, a replica gets no reads.
+    """
+
+    def __init__(self, url: str):
+        self.engine = _create_engine(url, connect_timeout=REPLICA_CONNECT_TIMEOUT)
+        self.healthy = False
+        self.checked_at = 0.0
+        self._probe_lock = threading.Lock()
+        event.listen(self.engine, "handle_error", self._on_error)
+
+    def _on_error(self, context):
+        # Connection or schema problems: stop routing reads here until the next check
+        if isinstance(context.sqlalchemy_exception, exc.OperationalError):
+            self.healthy = False
+            self.checked_at = time.monotonic()
+
+    def _probe(self) -> None:
+        try:
+            with self.engine.connect() as conn:
+                if self.engine.dialect.name == "postgresql":
+                    conn.execute(text(f"SET LOCAL statement_timeout = {int(REPLICA_CONNECT_TIMEOUT * 1000)}"))
+                    lag = conn.scalar(text(
+                        "SELECT CASE WHEN pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0 "
+                        "ELSE COALESCE(EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp()), 0) END"
+                    ))
+                    self.healthy = (lag or 0) <= REPLICA_MAX_LAG_SECONDS
+                else:
+                    conn.execute(text("SELECT 1"))
+                    self.healthy = True
+        except Exception as e:
+            if self.healthy:
+                logger.warning(f"Read replica {self.engine.url!r} is unavailable: {str(e).splitlines()[0]}")
+            self.healthy = False
+        finally:
+            self.checked_at = time.monotonic()
+            self._probe_lock.release()
+
+    def is_available(self) -> bool:
+        """
+        Last known health; starts a re-check in the background once it is stale
+        """
+        stale = time.monotonic() - self.checked_at >= REPLICA_HEALTH_TTL_SECONDS
+        # A check already running is not started again
+        if stale and self._probe_lock.acquire(blocking=False):
+            try:
+                threading.Thread(target=self._probe, name="replica-probe", daemon=True).start()
+            except Exception:
+                self._probe_lock.release()
+                raise
+        return self.healthy
+
+
+replicas = [_Replica(url) for url in READ_REPLICA_URLS]
+_replica_cycle = itertools.cycle(replicas) if replicas else None
+_replica_lock = threading.Lock()
+
+
+def choose_replica():
+    """
+    Pick the next available replica engine (round-robin), or None to use the primary
+    """
+    for _ in range(len(replicas)):
+        with _replica_lock:
+            replica = next(_replica_cycle)
+        if replica.is_available():
+            return replica.engine
+    return None
+
+
+class RoutingSession(Session):
+    """
+    Session that sends reads to a replica when one is assigned, and
+    every write (flush, INSERT/UPDATE/DELETE) to the primary
+
+    A read that fails on the replica (OperationalError) is retried once on
+    the primary, and the session stays on the primary from then on.
+    """
+
+    def get_bind(self, mapper=None, clause=None, **kw):
+        replica = self.info.get("replica")
+        if replica is None or self._flushing or isinstance(clause, (Insert, Update, Delete)):
+            return engine
+        return replica
+
+    def _read(self, method, statement, *args, **kw):
+        # A read failing on the replica mid-request is retried on the primary,
+        # which serves the rest of the session
+        if self.info.get("replica") is None or isinstance(statement, (Insert, Update, Delete)):
+            return method(statement, *args, **kw)
+        try:
+            return method(statement, *args, **kw)
+        except exc.OperationalError as e:
+            logger.warning(f"Read replica failed, retrying on the primary: {str(e).splitlines()[0]}")
+            self.rollback()
+            self.info.pop("replica", None)
+            return method(statement, *args, **kw)
+
+    def execute(self, statement, *args, **kw):
+        return self._read(super().execute, statement, *args, **kw)
+
+    def scalar(self, statement, *args, **kw):
+        return self._read(super().scalar, statement, *args, **kw)
+
+    def scalars(self, statement, *args, **kw):
+        return self._read(super().scalars, statement, *args, **kw)
+
 
 # Create SessionLocal
-SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+SessionLocal = sessionmaker(class_=RoutingSession, autocommit=False, autoflush=False, bind=engine)
 
 # Base class for models
 Base = declarative_base()
 
+# Version of the schema created by init_db (see init_db)
+SCHEMA_VERSION = 15
+
 
 def get_db():
     """
@@ -43,9 +183,38 @@ def get_db():
         db.close()
 
 
-def init_db():
+def get_schema_version():
     """
-    Create database tables
+    Get the schema version recorded in the database (None if never initialized)
     """
-    Base.metadata.create_all(bind=engine)
+    try:
+        with engine.connect() as conn:
+            return conn.scalar(text("SELECT version FROM schema_version"))
+    except exc.DBAPIError:
+        return None
+
 
+def init_db() -> bool:
+    """
+    Create database tables and the todo full-text index
+
+    Skipped when the database already records SCHEMA_VERSION, so worker
+    start-up costs a single query. Bump SCHEMA_VERSION when the schema changes.
+    Returns:
+        bool: True if the schema was (re)created
+    """
+    if get_schema_version() == SCHEMA_VERSION:
+        return False
+
+    from app import search, migrations, counters, deltas
+    
+    Base.metadata.create_all(bind=engine)
+    migrations.run_migrations(engine)
+    search.init_search_index(engine)
+    counters.install(engine)
+    deltas.install(engine)
+    with engine.begin() as conn:
+        conn.execute(text("CREATE TABLE IF NOT EXISTS schema_version (version INTEGER NOT NULL)"))
+        conn.execute(text("DELETE FROM schema_version"))
+        conn.execute(text("INSERT INTO schema_version (version) VALUES (:version)"), {"version": SCHEMA_VERSION})
+    return True
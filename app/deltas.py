@@ -0,0 +1,289 @@
+"""
+Delta exports: watermarks and the deleted-rows (tombstone) log
+
+Exports report where they stopped in response headers; passing those
+values back returns only rows added or changed since then, plus the rows
+deleted since then (from export_tombstones, filled by AFTER DELETE
+triggers). Watermarks:
+
+    since_id           rows with a larger id (new rows of one table)
+    since_timestamp    rows created (conversion history) or updated (todos)
+                       at or after it; boundary rows may be repeated
+    deleted_since_id   tombstones with a larger id
+
+Conversion history rows and their tombstones are filtered by tenant;
+tombstones without one (truncates, deletes recorded before tombstones
+carried the tenant) are reported to every tenant.
+
+Tombstones older than TOMBSTONE_TTL_DAYS are purged; a watermark older
+than the purged range gets WatermarkExpired (do a full export instead).
+
+On PostgreSQL ids and now() are taken before commit, so a row can become
+visible after rows with a higher id or later timestamp. The next
+watermarks therefore stop at a safe horizon (see safe_horizon); rows
+after it are exported again by the next delta.
+"""
+import logging
+import os
+from datetime import datetime, timedelta, timezone
+from typing import Dict, List, Optional
+from sqlalchemy import String, delete, func, literal, or_, select, text
+from sqlalchemy.engine import Engine
+from sqlalchemy.orm import Session
+from app.database import SessionLocal, engine as default_engine
+from app import models
+
+logger = logging.getLogger(__name__)
+
+# How long deleted rows stay in the tombstone log (0 keeps them forever)
+TOMBSTONE_TTL_DAYS = float(os.getenv("TOMBSTONE_TTL_DAYS", "30"))
+TOMBSTONE_PURGE_INTERVAL_SECONDS = float(os.getenv("TOMBSTONE_PURGE_INTERVAL_SECONDS", "3600"))
+# PostgreSQL: longest transaction writing exported tables; newer rows are exported again
+DELTA_SAFETY_LAG_SECONDS = float(os.getenv("DELTA_SAFETY_LAG_SECONDS", "60"))
+
+# Highest purged tombstone id, stored in rollup_watermarks
+PURGE_WATERMARK_NAME = "export_tombstones_purged"
+
+HEADER_SINCE_ID = "X-Next-Since-Id"
+HEADER_SINCE_TIMESTAMP = "X-Next-Since-Timestamp"
+HEADER_DELETED_SINCE_ID = "X-Next-Deleted-Since-Id"
+
+TABLES = {"todos": models.Todo, "conversion_history": models.ConversionHistory}
+# Column compared with since_timestamp: todos change in place, history rows never do
+CHANGED_AT = {"todos": models.Todo.updated_at, "conversion_history": models.ConversionHistory.created_at}
+# Column compared with the safe horizon for since_id: when the row (and its id) was created
+CREATED_AT = {"todos": models.Todo.created_at, "conversion_history": models.ConversionHistory.created_at}
+# Tenant column of tables with tenants, as SQL over a row alias (todos have none)
+TENANT_OF = {"todos": lambda row: "NULL", "conversion_history": lambda row: f"{row}.tenant_id"}
+
+
+class WatermarkExpired(Exception):
+    pass
+
+
+def _sqlite_triggers(table: str) -> list:
+    return [
+        f"DROP TRIGGER IF EXISTS {table}_tombstone",
+        f"CREATE TRIGGER {table}_tombstone AFTER DELETE ON {table} BEGIN "
+        f"INSERT INTO export_tombstones (table_name, row_id, tenant_id) "
+        f"VALUES ('{table}', OLD.id, {TENANT_OF[table]('OLD')}); END",
+    ]
+
+
+def _postgresql_triggers(table: str) -> list:
+    return [
+        # Statement-level with a transition table: one set-based insert per DELETE
+        f"""
+        CREATE OR REPLACE FUNCTION {table}_tombstone() RETURNS trigger AS $$
+        BEGIN
+            INSERT INTO export_tombstones (table_name, row_id, tenant_id)
+            SELECT '{table}', id, {TENANT_OF[table]('deleted_rows')} FROM deleted_rows;
+            RETURN NULL;
+        END
+        $$ LANGUAGE plpgsql
+        """,
+        f"""
+        CREATE OR REPLACE FUNCTION {table}_tombstone_truncate() RETURNS trigger AS $$
+        BEGIN
+            INSERT INTO export_tombstones (table_name, row_id) VALUES ('{table}', NULL);
+            RETURN NULL;
+        END
+        $$ LANGUAGE plpgsql
+        """,
+        f"DROP TRIGGER IF EXISTS {table}_tombstone ON {table}",
+        f"CREATE TRIGGER {table}_tombstone AFTER DELETE ON {table} REFERENCING OLD TABLE AS deleted_rows "
+        f"FOR EACH STATEMENT EXECUTE FUNCTION {table}_tombstone()",
+        f"DROP TRIGGER IF EXISTS {table}_tombstone_truncate ON {table}",
+        f"CREATE TRIGGER {table}_tombstone_truncate AFTER TRUNCATE ON {table} "
+        f"FOR EACH STATEMENT EXECUTE FUNCTION {table}_tombstone_truncate()",
+    ]
+
+
+def install(engine: Engine = default_engine) -> None:
+    """
+    Create (or replace) the tombstone triggers
+    """
+    dialect = engine.dialect.name
+    with engine.begin() as conn:
+        # create_all does not add indexes to existing tables
+        conn.execute(text("CREATE INDEX IF NOT EXISTS ix_todos_updated_at ON todos (updated_at)"))
+        for table in TABLES:
+            statements = _postgresql_triggers(table) if dialect == "postgresql" else _sqlite_triggers(table)
+            for statement in statements:
+                conn.execute(text(statement))
+
+
+def _aware(value: datetime) -> datetime:
+    # Naive timestamps (SQLite, or a client watermark without offset) are UTC
+    return value if value.tzinfo else value.replace(tzinfo=timezone.utc)
+
+
+def _as_db_timestamp(db: Session, value: datetime):
+    value = _aware(value).astimezone(timezone.utc)
+    if db.get_bind().dialect.name != "sqlite":
+        return value
+    # SQLite compares the stored text: match CURRENT_TIMESTAMP's format, which
+    # has no fractional part, so rows from the same second still compare >=
+    stamp = value.strftime("%Y-%m-%d %H:%M:%S")
+    if value.microsecond:
+        stamp += f".{value.microsecond:06d}"
+    return literal(stamp, String)
+
+
+def safe_horizon(db: Session) -> Optional[datetime]:
+    """
+    Time before which every write to the exported tables is committed
+    (None when rows become visible in id order, i.e. on SQLite)
+
+    On PostgreSQL: the start of the oldest transaction that is writing, and
+    at most DELTA_SAFETY_LAG_SECONDS ago (a replica does not see the
+    primary's transactions, and ids drawn by a transaction that started
+    earlier may still be in flight); read it before the exported rows.
+    """
+    if db.get_bind().dialect.name != "postgresql":
+        return None
+    horizon = db.scalar(
+        text(
+            "SELECT least(clock_timestamp() - make_interval(secs => :lag), min(xact_start)) "
+            "FROM pg_stat_activity WHERE backend_xid IS NOT NULL AND pid <> pg_backend_pid()"
+        ),
+        {"lag": DELTA_SAFETY_LAG_SECONDS}
+    )
+    return _aware(horizon)
+
+
+def tombstone_watermark(db: Session, horizon: Optional[datetime] = None) -> int:
+    """
+    Get the newest tombstone id (read it before the exported rows, so a
+    delete in between is reported by the next delta rather than lost),
+    only of deletes before the safe horizon, if given
+    """
+    tombstone = models.ExportTombstone
+    query = select(func.max(tombstone.id))
+    if horizon is not None:
+        query = query.where(tombstone.deleted_at < _as_db_timestamp(db, horizon))
+    return db.scalar(query) or 0
+
+
+def changed_rows(
+    db: Session,
+    table: str,
+    since_id: Optional[int] = None,
+    since_timestamp: Optional[datetime] = None,
+    tenant_id: Optional[str] = None
+) -> list:
+    """
+    Get the rows of a table newer than the watermarks, in id order
+    (conversion history only of tenant_id, if given)
+    """
+    model = TABLES[table]
+    query = select(model).order_by(model.id)
+    if tenant_id is not None and table == "conversion_history":
+        query = query.where(model.tenant_id == tenant_id)
+    if since_id is not None:
+        query = query.where(model.id > since_id)
+    if since_timestamp is not None:
+        query = query.where(CHANGED_AT[table] >= _as_db_timestamp(db, since_timestamp))
+    return list(db.scalars(query))
+
+
+def deleted_rows(
+    db: Session,
+    tables: List[str],
+    up_to_id: int,
+    deleted_since_id: Optional[int] = None,
+    since_timestamp: Optional[datetime] = None,
+    tenant_id: Optional[str] = None
+) -> List[models.ExportTombstone]:
+    """
+    Get the tombstones of rows deleted since the watermark (deleted_since_id,
+    else since_timestamp, else every retained tombstone), leaving out other
+    tenants' conversion history when tenant_id is given
+    Raises:
+        WatermarkExpired: Tombstones after the watermark were already purged
+    """
+    tombstone = models.ExportTombstone
+    query = (
+        select(tombstone)
+        .where(tombstone.table_name.in_(tables), tombstone.id <= up_to_id)
+        .order_by(tombstone.id)
+    )
+    if tenant_id is not None:
+        query = query.where(or_(
+            tombstone.table_name != "conversion_history",
+            tombstone.tenant_id == tenant_id,
+            tombstone.tenant_id.is_(None),
+        ))
+    if deleted_since_id is not None:
+        purged = db.get(models.RollupWatermark, PURGE_WATERMARK_NAME)
+        if purged is not None and deleted_since_id < purged.last_id:
+            raise WatermarkExpired(
+                f"Deleted rows after id {deleted_since_id} were purged (kept {TOMBSTONE_TTL_DAYS:g} days)"
+            )
+        query = query.where(tombstone.id > deleted_since_id)
+    elif since_timestamp is not None:
+        oldest = datetime.now(timezone.utc) - timedelta(days=TOMBSTONE_TTL_DAYS)
+        if TOMBSTONE_TTL_DAYS > 0 and _aware(since_timestamp) < oldest:
+            raise WatermarkExpired(f"since_timestamp is older than the {TOMBSTONE_TTL_DAYS:g}-day tombstone log")
+        query = query.where(tombstone.deleted_at >= _as_db_timestamp(db, since_timestamp))
+    return list(db.scalars(query))
+
+
+def next_watermark(
+    rows: Dict[str, list],
+    deleted_up_to: int,
+    since_id: Optional[int] = None,
+    since_timestamp: Optional[datetime] = None,
+    horizon: Optional[datetime] = None
+) -> Dict[str, str]:
+    """
+    Build the next-watermark response headers for exported rows
+    (since_id only when a single table was exported); with a safe horizon,
+    rows created or changed after it don't advance the watermarks
+    """
+    def before_horizon(row, column) -> bool:
+        return horizon is None or _aware(getattr(row, column.key)) < horizon
+
+    headers = {HEADER_DELETED_SINCE_ID: str(deleted_up_to)}
+    if len(rows) == 1:
+        ((table, table_rows),) = rows.items()
+        last_id = max(
+            (row.id for row in table_rows if before_horizon(row, CREATED_AT[table])),
+            default=since_id or 0
+        )
+        headers[HEADER_SINCE_ID] = str(max(last_id, since_id or 0))
+
+    stamps = [
+        _aware(getattr(row, CHANGED_AT[table].key))
+        for table, table_rows in rows.items()
+        for row in table_rows
+    ]
+    if stamps and horizon is not None:
+        stamps = [min(max(stamps), horizon)]
+    if since_timestamp is not None:
+        stamps.append(_aware(since_timestamp))
+    if stamps:
+        headers[HEADER_SINCE_TIMESTAMP] = max(stamps).isoformat()
+    return headers
+
+
+def purge_expired() -> None:
+    """
+    Scheduled task: delete tombstones older than the TTL
+    """
+    if TOMBSTONE_TTL_DAYS <= 0:
+        return
+    tombstone = models.ExportTombstone
+    cutoff = datetime.now(timezone.utc) - timedelta(days=TOMBSTONE_TTL_DAYS)
+    with SessionLocal() as db:
+        last_id = db.scalar(select(func.max(tombstone.id)).where(tombstone.deleted_at < _as_db_timestamp(db, cutoff)))
+        if last_id is None:
+            return
+        result = db.execute(delete(tombstone).where(tombstone.id <= last_id))
+        watermark = db.get(models.RollupWatermark, PURGE_WATERMARK_NAME)
+        if watermark is None:
+            db.add(models.RollupWatermark(name=PURGE_WATERMARK_NAME, last_id=last_id))
+        else:
+            watermark.last_id = last_id
+        db.commit()
+    logger.info(f"Purged {result.rowcount} export tombstones (up to id {last_id})")
@@ -0,0 +1,56 @@
+"""
+Request-scoped database dependencies: replica routing and read-your-writes
+
+The client that wrote recently carries a cookie that pins its reads to the
+primary; other read-only handlers get a session on a healthy replica.
+"""
+import os
+import time
+from fastapi import Request, Response
+from app.database import SessionLocal, choose_replica, replicas
+
+# After a write, the same client reads from the primary for this long
+READ_AFTER_WRITE_SECONDS = float(os.getenv("READ_AFTER_WRITE_SECONDS", "5"))
+READ_PRIMARY_COOKIE = "read_primary_until"
+
+
+def reads_pinned_to_primary(request: Request) -> bool:
+    """
+    True if this client wrote recently and must read its own writes
+    """
+    try:
+        return float(request.cookies.get(READ_PRIMARY_COOKIE, 0)) > time.time()
+    except ValueError:
+        return False
+
+
+def pin_reads_to_primary(response: Response) -> None:
+    """
+    Send this client's reads to the primary for READ_AFTER_WRITE_SECONDS
+    """
+    until = time.time() + READ_AFTER_WRITE_SECONDS
+    response.set_cookie(
+        READ_PRIMARY_COOKIE,
+        f"{until:.3f}",
+        max_age=int(READ_AFTER_WRITE_SECONDS) + 1,
+        httponly=True,
+        samesite="lax"
+    )
+
+
+def get_read_db(request: Request):
+    """
+    Dependency to get a database session for read-only handlers
+
+    Reads go to a healthy replica unless none is configured/available or
+    the client wrote recently (read-your-writes); then the primary is used.
+    """
+    db = SessionLocal()
+    if replicas and not reads_pinned_to_primary(request):
+        replica = choose_replica()
+        if replica is not None:
+            db.info["replica"] = replica
+    try:
+        yield db
+    finally:
+        db.close()
@@ -0,0 +1,213 @@
+"""
+Bounded data inventory for the debug endpoint
+
+Counts come from the trigger-maintained row counters (or the planner's
+estimates when they are not installed), sizes from the catalog, and
+sample rows from LIMIT queries on the primary key, so the cost does not
+grow with the table sizes. Each section gets a share of
+DIAGNOSTICS_TIMEOUT_SECONDS, enforced by statement_timeout on PostgreSQL
+and a progress handler on SQLite; a section that runs out reports an
+error instead of its data. Given a tenant, conversion history rows and
+counters of other tenants are left out; unless the tenant is an admin,
+database-wide numbers (history totals, per unit type counters and sizes)
+are left out too and the history count is the tenant's own.
+"""
+import logging
+import os
+import time
+from contextlib import contextmanager
+from typing import Callable, Optional
+from sqlalchemy import exc, select, text
+from sqlalchemy.orm import Session
+from app import counters, models, units
+
+logger = logging.getLogger(__name__)
+
+# Time budget of one inventory (all sections)
+DIAGNOSTICS_TIMEOUT_SECONDS = float(os.getenv("DIAGNOSTICS_TIMEOUT_SECONDS", "2"))
+# Upper bound of the recent rows returned per table
+DIAGNOSTICS_MAX_RECENT = int(os.getenv("DIAGNOSTICS_MAX_RECENT", "50"))
+# Longer text values are cut in the sample rows
+MAX_TEXT_LENGTH = 200
+
+TABLES = (models.Todo.__tablename__, models.ConversionHistory.__tablename__)
+
+
+class _Deadline(Exception):
+    pass
+
+
+@contextmanager
+def _bounded(db: Session, seconds: float):
+    """
+    Abort the statements run inside after `seconds`
+    """
+    if seconds <= 0:
+        raise _Deadline()
+    conn = db.connection()
+    if conn.dialect.name == "postgresql":
+        conn.execute(text(f"SET LOCAL statement_timeout = {max(1, int(seconds * 1000))}"))
+        yield
+        return
+    if conn.dialect.name != "sqlite":
+        yield
+        return
+    raw = conn.connection.dbapi_connection
+    deadline = time.monotonic() + seconds
+    # A non-zero return interrupts the running statement
+    raw.set_progress_handler(lambda: int(time.monotonic() > deadline), 1000)
+    try:
+        yield
+    finally:
+        raw.set_progress_handler(None, 0)
+
+
+def _counts(db: Session, tenant_id: Optional[str] = None, admin: bool = True) -> dict:
+    values = counters.totals(db)
+    if tenant_id is not None:
+        own, prefix = counters.history_tenant(tenant_id), counters.history_tenant("")
+        values = {name: value for name, value in values.items() if name == own or not name.startswith(prefix)}
+    if all(table in values for table in TABLES):
+        tables = {table: values.pop(table) for table in TABLES}
+        if tenant_id is not None and not admin:
+            # Only the tenant's own history count; the other history counters span tenants
+            tables[counters.HISTORY] = values.get(counters.history_tenant(tenant_id), 0)
+            values = {name: value for name, value in values.items() if not name.startswith(counters.HISTORY + ".")}
+        return {"source": "row_counters", "tables": tables, "filters": values}
+
+    # Not installed: the planner's estimates, never a COUNT(*)
+    dialect = db.get_bind().dialect.name
+    if dialect == "postgresql":
+        rows = db.execute(text(
+            "SELECT relname, GREATEST(reltuples, 0)::bigint FROM pg_class "
+            "WHERE relname = ANY(:tables) AND relkind IN ('r', 'p')"
+        ), {"tables": list(TABLES)}).all()
+    elif dialect == "sqlite" and db.scalar(text("SELECT 1 FROM sqlite_master WHERE name = 'sqlite_stat1'")):
+        # Left by ANALYZE: the first number of each stat is the row count
+        rows = db.execute(text(
+            "SELECT tbl, MAX(CAST(stat AS INTEGER)) FROM sqlite_stat1 GROUP BY tbl"
+        )).all()
+    else:
+        rows = []
+    tables = {table: dict(rows).get(table) for table in TABLES}
+    if tenant_id is not None and not admin:
+        # The estimate covers every tenant
+        tables[counters.HISTORY] = None
+    return {"source": "estimate", "tables": tables, "filters": {}}
+
+
+def _sizes(db: Session) -> dict:
+    dialect = db.get_bind().dialect.name
+    if dialect == "postgresql":
+        tables = {
+            name: {"table_bytes": table_bytes, "index_bytes": index_bytes}
+            for name, table_bytes, index_bytes in db.execute(text(
+                "SELECT c.relname, pg_table_size(c.oid), pg_indexes_size(c.oid) FROM pg_class c "
+                "JOIN pg_namespace n ON n.oid = c.relnamespace "
+                "WHERE n.nspname = current_schema() AND c.relkind IN ('r', 'p')"
+            )).all()
+        }
+        indexes = dict(db.execute(text(
+            "SELECT indexrelname, pg_relation_size(indexrelid) FROM pg_stat_user_indexes"
+        )).all())
+        return {"database_bytes": db.scalar(text("SELECT pg_database_size(current_database())")),
+                "tables": tables, "indexes": indexes}
+    if dialect == "sqlite":
+        page_size = db.scalar(text("PRAGMA page_size"))
+        database_bytes = db.scalar(text("PRAGMA page_count")) * page_size
+        objects = dict(db.execute(text("SELECT name, type FROM sqlite_master WHERE type IN ('table', 'index')")).all())
+        tables, indexes = {}, {}
+        try:
+            # dbstat reads every page; the progress handler keeps it within the budget
+            for name, size in db.execute(text("SELECT name, pgsize FROM dbstat WHERE aggregate = TRUE")).all():
+                (indexes if objects.get(name) == "index" else tables)[name] = size
+        except exc.OperationalError as e:
+            # Interrupted, or SQLite built without dbstat: the file size is still known
+            logger.warning(f"Per-table sizes unavailable: {e.orig}")
+            tables = indexes = None
+        return {"database_bytes": database_bytes, "tables": tables, "indexes": indexes}
+    return {}
+
+
+def _cut(value):
+    if isinstance(value, str) and len(value) > MAX_TEXT_LENGTH:
+        return value[:MAX_TEXT_LENGTH] + "…"
+    return value
+
+
+def _recent(db: Session, limit: int, tenant_id: Optional[str] = None) -> dict:
+    todo, history = models.Todo, models.ConversionHistory
+    todos = db.execute(
+        select(todo.id, todo.title, todo.completed, todo.updated_at).order_by(todo.id.desc()).limit(limit)
+    ).all()
+    conversions = select(
+        history.id, history.tenant_id, history.value, history.from_unit_id, history.to_unit_id,
+        history.result, history.unit_type_id, history.created_at,
+        history.legacy_unit_type, history.legacy_from_unit, history.legacy_to_unit
+    )
+    if tenant_id is not None:
+        conversions = conversions.where(history.tenant_id == tenant_id)
+    conversions = db.execute(conversions.order_by(history.id.desc()).limit(limit)).all()
+    return {
+        "todos": [
+            {"id": row.id, "title": _cut(row.title), "completed": row.completed, "updated_at": str(row.updated_at)}
+            for row in todos
+        ],
+        "conversions": [
+            {
+                "id": row.id,
+                "tenant_id": row.tenant_id,
+                "value": row.value,
+                "from_unit": units.unit_name(row.from_unit_id, row.legacy_from_unit),
+                "to_unit": units.unit_name(row.to_unit_id, row.legacy_to_unit),
+                "result": row.result,
+                "unit_type": units.unit_type_name(row.unit_type_id, row.legacy_unit_type),
+                "created_at": str(row.created_at),
+            }
+            for row in conversions
+        ],
+    }
+
+
+def inventory(
+    db: Session, recent: int = 5, timeout: Optional[float] = None, tenant_id: Optional[str] = None, admin: bool = False
+) -> dict:
+    """
+    Get row counts, table/index sizes and the newest rows of each table
+    (conversion history rows and tenant counters of tenant_id only, if given)
+
+    A tenant that is not an admin gets its own history count and no sizes
+    ("sizes" is None, "scope" is "tenant"). recent is capped at
+    DIAGNOSTICS_MAX_RECENT. Sections that fail or run past the budget are
+    None and listed in "errors".
+    """
+    recent = max(0, min(recent, DIAGNOSTICS_MAX_RECENT))
+    deadline = time.monotonic() + (DIAGNOSTICS_TIMEOUT_SECONDS if timeout is None else timeout)
+    database_wide = tenant_id is None or admin
+    sections = {"counts": lambda db: _counts(db, tenant_id, admin)}
+    if database_wide:
+        sections["sizes"] = _sizes
+    sections["recent"] = lambda db: _recent(db, recent, tenant_id)
+    result = {"scope": "database" if database_wide else "tenant", "errors": {}, "sizes": None}
+    started = time.perf_counter()
+    for position, (name, build) in enumerate(sections.items()):
+        # Each section may use an even share of what is left
+        share = (deadline - time.monotonic()) / (len(sections) - position)
+        result[name] = _run_section(db, name, build, share, result["errors"])
+    result["elapsed_ms"] = round((time.perf_counter() - started) * 1000, 1)
+    return result
+
+
+def _run_section(db: Session, name: str, build: Callable[[Session], dict], seconds: float, errors: dict):
+    try:
+        with _bounded(db, seconds):
+            return build(db)
+    except _Deadline:
+        errors[name] = "time budget exhausted"
+    except exc.DBAPIError as e:
+        errors[name] = str(e.orig).splitlines()[0] if e.orig else str(e)
+        logger.warning(f"Inventory section {name} failed: {errors[name]}")
+    finally:
+        # Ends the transaction: SET LOCAL expires, and an aborted one is cleared
+        db.rollback()
+    return None
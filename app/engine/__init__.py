@@ -0,0 +1,38 @@
+"""
+Unit conversion engine
+
+Importable without FastAPI or a database, e.g. from batch jobs:
+
+    from app.engine import convert, convert_many
+    convert(100, "kilometer", "mile", "length")            # 62.1371
+    convert_many([0, 100], "celsius", "fahrenheit", "temperature")
+
+Bulk files: `python -m app.engine --help`.
+"""
+from app.engine.conversions import (
+    ConversionError,
+    validate_value,
+    validate_unit_pair,
+    convert_length,
+    convert_weight,
+    convert_temperature,
+    convert,
+    make_converter,
+    convert_many,
+)
+from app.engine.factors import VALID_UNITS, MAX_ABS_VALUE, RESULT_DECIMALS
+
+__all__ = [
+    "ConversionError",
+    "validate_value",
+    "validate_unit_pair",
+    "convert_length",
+    "convert_weight",
+    "convert_temperature",
+    "convert",
+    "make_converter",
+    "convert_many",
+    "VALID_UNITS",
+    "MAX_ABS_VALUE",
+    "RESULT_DECIMALS",
+]
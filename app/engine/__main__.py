@@ -0,0 +1,4 @@
+import sys
+from app.engine.cli import main
+
+sys.exit(main())
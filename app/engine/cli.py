@@ -0,0 +1,209 @@
+"""
+Bulk file conversion through the engine, without the HTTP API
+
+Streams a CSV or NDJSON file in blocks of lines through a process pool.
+Workers parse, convert and serialize each block, so the parent only moves
+text; memory stays bounded by block size x blocks in flight, and output
+keeps the input order. Each output row is the input row plus `result` and
+`error` fields (invalid rows are reported, not fatal).
+
+Usage:
+    python -m app.engine readings.csv -o converted.csv
+    python -m app.engine readings.ndjson --unit-type length --from-unit kilometer --to-unit mile
+    cat readings.csv | python -m app.engine - --format csv > converted.csv
+
+Without --unit-type/--from-unit/--to-unit, every row must have `unit_type`,
+`from_unit` and `to_unit` columns.
+"""
+import argparse
+import csv
+import io
+import itertools
+import json
+import os
+import sys
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from functools import lru_cache
+from typing import Iterator, List, Optional
+
+from app.engine.conversions import ConversionError, convert, make_converter, validate_unit_pair
+
+NDJSON_EXTENSIONS = (".ndjson", ".jsonl")
+
+
+@lru_cache(maxsize=64)
+def _converter(unit_type: str, from_unit: str, to_unit: str):
+    return make_converter(unit_type, from_unit, to_unit)
+
+
+def convert_rows(rows: List[dict], value_column: str, result_column: str, units: Optional[tuple]) -> tuple[List[dict], int]:
+    """
+    Convert rows in place, recording per-row errors
+    Returns:
+        tuple: (rows, number of rows with an error)
+    """
+    errors = 0
+    convert_one = _converter(*units) if units else None
+    for row in rows:
+        try:
+            value = float(row[value_column])
+            if convert_one is not None:
+                row[result_column] = convert_one(value)
+            else:
+                row[result_column] = convert(
+                    value, str(row["from_unit"]).strip().lower(), str(row["to_unit"]).strip().lower(),
+                    str(row["unit_type"]).strip().lower()
+                )
+            row["error"] = None
+        except (ConversionError, ValueError, TypeError) as e:
+            row[result_column] = None
+            row["error"] = str(e)
+            errors += 1
+        except KeyError as e:
+            row[result_column] = None
+            row["error"] = f"Missing column: {e.args[0]}"
+            errors += 1
+    return rows, errors
+
+
+def convert_block(
+    lines: List[str],
+    in_format: str,
+    out_format: str,
+    fieldnames: List[str],
+    value_column: str,
+    result_column: str,
+    units: Optional[tuple]
+) -> tuple[str, int, int]:
+    """
+    Parse, convert and serialize a block of raw input lines (runs in the workers)
+    Returns:
+        tuple: (output text, rows, rows with an error)
+    """
+    if in_format == "csv":
+        rows = list(csv.DictReader(lines, fieldnames=fieldnames))
+    else:
+        rows = [json.loads(line) for line in lines if line.strip()]
+    rows, errors = convert_rows(rows, value_column, result_column, units)
+
+    if out_format == "ndjson":
+        text = "".join(json.dumps(row, separators=(",", ":")) + "\n" for row in rows)
+    else:
+        buffer = io.StringIO()
+        csv.DictWriter(buffer, fieldnames=fieldnames + [result_column, "error"], extrasaction="ignore").writerows(rows)
+        text = buffer.getvalue()
+    return text, len(rows), errors
+
+
+def _blocks(lines: Iterator[str], size: int) -> Iterator[List[str]]:
+    """
+    Group lines into blocks of about `size` without splitting a quoted CSV field
+    """
+    block = []
+    quotes = 0
+    for line in lines:
+        block.append(line)
+        quotes += line.count('"')
+        # An odd quote count means a quoted field continues on the next line
+        if len(block) >= size and quotes % 2 == 0:
+            yield block
+            block = []
+            quotes = 0
+    if block:
+        yield block
+
+
+def _detect_format(path: str) -> str:
+    return "ndjson" if path.lower().endswith(NDJSON_EXTENSIONS) else "csv"
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(
+        prog="python -m app.engine", description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter
+    )
+    parser.add_argument("input", help="Input file, or - for stdin")
+    parser.add_argument("-o", "--output", default="-", help="Output file (default: stdout)")
+    parser.add_argument("--format", choices=("csv", "ndjson"), help="Input format (default: from the file extension)")
+    parser.add_argument("--output-format", choices=("csv", "ndjson"), help="Output format (default: input format)")
+    parser.add_argument("--value-column", default="value")
+    parser.add_argument("--result-column", default="result")
+    parser.add_argument("--unit-type", help="Convert every row with this unit type")
+    parser.add_argument("--from-unit", help="Convert every row from this unit")
+    parser.add_argument("--to-unit", help="Convert every row to this unit")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1, help="Worker processes (1 = no pool)")
+    parser.add_argument("--chunk-size", type=int, default=10_000, help="Lines per block sent to a worker")
+    parser.add_argument("--quiet", action="store_true", help="No progress output on stderr")
+    args = parser.parse_args(argv)
+
+    units = None
+    fixed = (args.unit_type, args.from_unit, args.to_unit)
+    if any(fixed):
+        if not all(fixed):
+            parser.error("--unit-type, --from-unit and --to-unit must be given together")
+        units = tuple(u.strip().lower() for u in fixed)
+        try:
+            validate_unit_pair(*units)
+        except ConversionError as e:
+            parser.error(str(e))
+
+    in_format = args.format or ("csv" if args.input == "-" else _detect_format(args.input))
+    out_format = args.output_format or in_format
+    source = sys.stdin if args.input == "-" else open(args.input, newline="", encoding="utf-8")
+    target = sys.stdout if args.output == "-" else open(args.output, "w", newline="", encoding="utf-8")
+
+    total = errors = 0
+    started = last_report = time.monotonic()
+
+    def report(final: bool = False) -> None:
+        elapsed = max(time.monotonic() - started, 1e-9)
+        line = f"\r{total:,} rows  {total / elapsed:,.0f} rows/s  {errors:,} errors"
+        print(f"{line}  ({elapsed:.1f}s)" if final else line, end="\n" if final else "", file=sys.stderr)
+
+    def consume(result) -> None:
+        nonlocal total, errors, last_report
+        text, rows, block_errors = result
+        target.write(text)
+        total += rows
+        errors += block_errors
+        if not args.quiet and time.monotonic() - last_report >= 1:
+            last_report = time.monotonic()
+            report()
+
+    try:
+        # Column names: the CSV header, or the keys of the first NDJSON row
+        first_line = source.readline()
+        if in_format == "csv":
+            fieldnames = next(csv.reader([first_line]), [])
+            blocks = _blocks(source, args.chunk_size)
+        else:
+            fieldnames = list(json.loads(first_line).keys()) if first_line.strip() else []
+            blocks = _blocks(itertools.chain([first_line], source), args.chunk_size)
+        if out_format == "csv":
+            csv.writer(target).writerow(fieldnames + [args.result_column, "error"])
+
+        options = (in_format, out_format, fieldnames, args.value_column, args.result_column, units)
+        if args.workers <= 1:
+            for block in blocks:
+                consume(convert_block(block, *options))
+        else:
+            # At most two blocks per worker in flight: constant memory, ordered output
+            max_in_flight = args.workers * 2
+            pending = deque()
+            with ProcessPoolExecutor(max_workers=args.workers) as pool:
+                for block in blocks:
+                    pending.append(pool.submit(convert_block, block, *options))
+                    if len(pending) >= max_in_flight:
+                        consume(pending.popleft().result())
+                while pending:
+                    consume(pending.popleft().result())
+    finally:
+        if source is not sys.stdin:
+            source.close()
+        if target is not sys.stdout:
+            target.close()
+
+    if not args.quiet:
+        report(final=True)
+    return 0
@@ -0,0 +1,244 @@
+"""
+Conversion functions: pure Python, no web framework or database imports
+"""
+from math import isnan, isinf
+from typing import Callable, Iterable, List
+from app.engine.factors import (
+    VALID_LENGTH_UNITS, VALID_WEIGHT_UNITS, VALID_TEMPERATURE_UNITS,
+    LENGTH_TO_METER, LENGTH_FROM_METER, WEIGHT_TO_KILOGRAM, WEIGHT_FROM_KILOGRAM,
+    TEMPERATURE_TO_CELSIUS, TEMPERATURE_FROM_CELSIUS, ABSOLUTE_ZERO_TOLERANCE, MAX_ABS_VALUE, RESULT_DECIMALS
+)
+
+
+class ConversionError(ValueError):
+    """
+    Invalid input for a conversion (bad unit, out-of-range or non-finite value)
+    """
+
+
+def validate_value(value: float) -> float:
+    """Validate that value is a finite number within range"""
+    if isnan(value):
+        raise ConversionError("Value cannot be NaN (Not a Number)")
+    if isinf(value):
+        raise ConversionError("Value cannot be Infinity")
+    if abs(value) > MAX_ABS_VALUE:
+        raise ConversionError(f"Value {value} is too large. Maximum allowed value is 1e15")
+    return value
+
+
+def validate_unit_pair(unit_type: str, from_unit: str, to_unit: str) -> None:
+    """Validate that both units belong to unit_type and differ"""
+    from_unit_lower = from_unit.lower()
+    to_unit_lower = to_unit.lower()
+    
+    if unit_type == "length":
+        valid_units = VALID_LENGTH_UNITS
+        unit_type_name = "length"
+    elif unit_type == "weight":
+        valid_units = VALID_WEIGHT_UNITS
+        unit_type_name = "weight"
+    elif unit_type == "temperature":
+        valid_units = VALID_TEMPERATURE_UNITS
+        unit_type_name = "temperature"
+    else:
+        raise ConversionError(f"Invalid unit_type: {unit_type}")
+    
+    if from_unit_lower not in valid_units:
+        raise ConversionError(
+            f"Invalid source unit '{from_unit}' for {unit_type_name}. "
+            f"Valid units: {', '.join(sorted(valid_units))}"
+        )
+    
+    if to_unit_lower not in valid_units:
+        raise ConversionError(
+            f"Invalid target unit '{to_unit}' for {unit_type_name}. "
+            f"Valid units: {', '.join(sorted(valid_units))}"
+        )
+    
+    if from_unit_lower == to_unit_lower:
+        raise ConversionError(f"Source and target units cannot be the same: {from_unit}")
+
+
+def convert_length(value: float, from_unit: str, to_unit: str) -> float:
+    """Convert length units with validation"""
+    from_unit_lower = from_unit.lower()
+    to_unit_lower = to_unit.lower()
+    
+    # Validate units
+    if from_unit_lower not in VALID_LENGTH_UNITS:
+        raise ConversionError(f"Invalid source unit for length: '{from_unit}'. Valid units: {', '.join(sorted(VALID_LENGTH_UNITS))}")
+    if to_unit_lower not in VALID_LENGTH_UNITS:
+        raise ConversionError(f"Invalid target unit for length: '{to_unit}'. Valid units: {', '.join(sorted(VALID_LENGTH_UNITS))}")
+    
+    # Convert from source unit to meters
+    conversion_factor = LENGTH_TO_METER[from_unit_lower]
+    value_in_meters = value * conversion_factor
+    
+    # Check for overflow
+    if isinf(value_in_meters) or isnan(value_in_meters):
+        raise ConversionError(f"Calculation overflow: {value} {from_unit} results in invalid value")
+    
+    # Convert from meters to target unit
+    result = value_in_meters * LENGTH_FROM_METER[to_unit_lower]
+    
+    # Validate result
+    if isinf(result) or isnan(result):
+        raise ConversionError(f"Calculation result is invalid: {result}")
+    
+    return result
+
+
+def convert_weight(value: float, from_unit: str, to_unit: str) -> float:
+    """Convert weight units with validation"""
+    from_unit_lower = from_unit.lower()
+    to_unit_lower = to_unit.lower()
+    
+    # Validate units
+    if from_unit_lower not in VALID_WEIGHT_UNITS:
+        raise ConversionError(f"Invalid source unit for weight: '{from_unit}'. Valid units: {', '.join(sorted(VALID_WEIGHT_UNITS))}")
+    if to_unit_lower not in VALID_WEIGHT_UNITS:
+        raise ConversionError(f"Invalid target unit for weight: '{to_unit}'. Valid units: {', '.join(sorted(VALID_WEIGHT_UNITS))}")
+    
+    # Convert from source unit to kilograms
+    conversion_factor = WEIGHT_TO_KILOGRAM[from_unit_lower]
+    value_in_kg = value * conversion_factor
+    
+    # Check for overflow
+    if isinf(value_in_kg) or isnan(value_in_kg):
+        raise ConversionError(f"Calculation overflow: {value} {from_unit} results in invalid value")
+    
+    # Convert from kilograms to target unit
+    result = value_in_kg * WEIGHT_FROM_KILOGRAM[to_unit_lower]
+    
+    # Validate result
+    if isinf(result) or isnan(result):
+        raise ConversionError(f"Calculation result is invalid: {result}")
+    
+    return result
+
+
+def _check_kelvin(result: float) -> float:
+    """Reject a Kelvin result below absolute zero, clamping rounding error to 0 K"""
+    if result < 0:
+        if result < -ABSOLUTE_ZERO_TOLERANCE:
+            raise ConversionError(f"Conversion result is invalid: {result} K (below absolute zero)")
+        return 0.0
+    return result
+
+
+def convert_temperature(value: float, from_unit: str, to_unit: str) -> float:
+    """Convert temperature units with validation"""
+    from_unit_lower = from_unit.lower()
+    to_unit_lower = to_unit.lower()
+    
+    # Validate units
+    if from_unit_lower not in VALID_TEMPERATURE_UNITS:
+        raise ConversionError(f"Invalid source unit for temperature: '{from_unit}'. Valid units: {', '.join(sorted(VALID_TEMPERATURE_UNITS))}")
+    if to_unit_lower not in VALID_TEMPERATURE_UNITS:
+        raise ConversionError(f"Invalid target unit for temperature: '{to_unit}'. Valid units: {', '.join(sorted(VALID_TEMPERATURE_UNITS))}")
+    
+    # Convert to Celsius first
+    try:
+        # Absolute zero check for Kelvin
+        if from_unit_lower == "kelvin" and value < 0:
+            raise ConversionError(f"Invalid temperature: Kelvin cannot be negative. Received: {value} K")
+        scale, offset = TEMPERATURE_TO_CELSIUS[from_unit_lower]
+        celsius = value * scale + offset
+        
+        # Validate intermediate result
+        if isinf(celsius) or isnan(celsius):
+            raise ConversionError(f"Calculation error: {value} {from_unit} results in invalid Celsius value")
+        
+        # Convert from Celsius to target unit
+        scale, offset = TEMPERATURE_FROM_CELSIUS[to_unit_lower]
+        result = celsius * scale + offset
+        # Validate Kelvin result (cannot be negative)
+        if to_unit_lower == "kelvin":
+            result = _check_kelvin(result)
+        
+        # Validate final result
+        if isinf(result) or isnan(result):
+            raise ConversionError(f"Calculation result is invalid: {result}")
+        
+        return result
+    except ZeroDivisionError:
+        raise ConversionError("Division by zero error in temperature conversion")
+    except OverflowError:
+        raise ConversionError(f"Temperature conversion overflow for value: {value} {from_unit}")
+
+
+CONVERTERS = {
+    "length": convert_length,
+    "weight": convert_weight,
+    "temperature": convert_temperature,
+}
+
+
+def convert(value: float, from_unit: str, to_unit: str, unit_type: str) -> float:
+    """
+    Convert one value and round to RESULT_DECIMALS
+
+    Raises:
+        ConversionError: invalid unit type, units or value
+    """
+    validate_value(value)
+    converter = CONVERTERS.get(unit_type)
+    if converter is None:
+        raise ConversionError(
+            f"Unsupported unit type: {unit_type}. Supported types: length, weight, temperature"
+        )
+    return round(converter(value, from_unit, to_unit), RESULT_DECIMALS)
+
+
+def make_converter(unit_type: str, from_unit: str, to_unit: str) -> Callable[[float], float]:
+    """
+    Validate a unit pair once and return a fast single-value converter
+
+    Computes (value * s1 + o1) * s2 + o2, the same arithmetic as the
+    per-type functions, rounded to RESULT_DECIMALS.
+    """
+    validate_unit_pair(unit_type, from_unit, to_unit)
+    from_unit = from_unit.lower()
+    to_unit = to_unit.lower()
+    if unit_type == "length":
+        to_scale, to_offset, from_scale, from_offset = LENGTH_TO_METER[from_unit], 0.0, LENGTH_FROM_METER[to_unit], 0.0
+    elif unit_type == "weight":
+        to_scale, to_offset = WEIGHT_TO_KILOGRAM[from_unit], 0.0
+        from_scale, from_offset = WEIGHT_FROM_KILOGRAM[to_unit], 0.0
+    else:
+        to_scale, to_offset = TEMPERATURE_TO_CELSIUS[from_unit]
+        from_scale, from_offset = TEMPERATURE_FROM_CELSIUS[to_unit]
+    min_value = 0.0 if from_unit == "kelvin" else None
+    check_kelvin_result = to_unit == "kelvin"
+
+    def convert_one(value: float) -> float:
+        validate_value(value)
+        if min_value is not None and value < min_value:
+            raise ConversionError(f"Invalid temperature: Kelvin cannot be negative. Received: {value} K")
+        result = (value * to_scale + to_offset) * from_scale + from_offset
+        if isinf(result) or isnan(result):
+            raise ConversionError(f"Calculation result is invalid: {result}")
+        if check_kelvin_result:
+            result = _check_kelvin(result)
+        return round(result, RESULT_DECIMALS)
+
+    return convert_one
+
+
+def convert_many(values: Iterable[float], from_unit: str, to_unit: str, unit_type: str) -> List[float]:
+    """
+    Convert many values for one unit pair
+
+    Raises:
+        ConversionError: on the first invalid value (message includes its index)
+    """
+    convert_one = make_converter(unit_type, from_unit, to_unit)
+    results = []
+    append = results.append
+    for index, value in enumerate(values):
+        try:
+            append(convert_one(value))
+        except ConversionError as e:
+            raise ConversionError(f"Invalid input at index {index}: {e}") from e
+    return results
@@ -0,0 +1,65 @@
+"""
+Unit tables for the conversion engine (single source of truth for the
+API, the /factors snapshot and the CLI)
+"""
+
+VALID_LENGTH_UNITS = {"meter", "kilometer", "centimeter", "millimeter", "mile", "foot", "inch", "yard"}
+VALID_WEIGHT_UNITS = {"kilogram", "gram", "pound", "ounce", "ton"}
+VALID_TEMPERATURE_UNITS = {"celsius", "fahrenheit", "kelvin"}
+
+VALID_UNITS = {
+    "length": VALID_LENGTH_UNITS,
+    "weight": VALID_WEIGHT_UNITS,
+    "temperature": VALID_TEMPERATURE_UNITS,
+}
+
+LENGTH_TO_METER = {
+    "meter": 1.0,
+    "kilometer": 1000.0,
+    "centimeter": 0.01,
+    "millimeter": 0.001,
+    "mile": 1609.34,
+    "foot": 0.3048,
+    "inch": 0.0254,
+    "yard": 0.9144
+}
+LENGTH_FROM_METER = {
+    "meter": 1.0,
+    "kilometer": 0.001,
+    "centimeter": 100.0,
+    "millimeter": 1000.0,
+    "mile": 0.000621371,
+    "foot": 3.28084,
+    "inch": 39.3701,
+    "yard": 1.09361
+}
+WEIGHT_TO_KILOGRAM = {
+    "kilogram": 1.0,
+    "gram": 0.001,
+    "pound": 0.453592,
+    "ounce": 0.0283495,
+    "ton": 1000.0
+}
+WEIGHT_FROM_KILOGRAM = {
+    "kilogram": 1.0,
+    "gram": 1000.0,
+    "pound": 2.20462,
+    "ounce": 35.274,
+    "ton": 0.001
+}
+# Temperature is affine: target = value * scale + offset, via Celsius
+TEMPERATURE_TO_CELSIUS = {
+    "celsius": (1.0, 0.0),
+    "fahrenheit": (5 / 9, -32 * 5 / 9),
+    "kelvin": (1.0, -273.15)
+}
+TEMPERATURE_FROM_CELSIUS = {
+    "celsius": (1.0, 0.0),
+    "fahrenheit": (9 / 5, 32.0),
+    "kelvin": (1.0, 273.15)
+}
+# Kelvin results this far below 0 are float rounding of absolute zero
+# (e.g. -459.67 °F) and are returned as 0 K
+ABSOLUTE_ZERO_TOLERANCE = 1e-9
+MAX_ABS_VALUE = 1e15
+RESULT_DECIMALS = 6
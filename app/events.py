@@ -0,0 +1,130 @@
+import asyncio
+import json
+import os
+import threading
+from collections import deque
+from typing import Iterable, Optional
+from app import metrics
+
+# Recent events kept for resuming subscribers (Last-Event-ID)
+EVENT_BUFFER_SIZE = int(os.getenv("EVENT_BUFFER_SIZE", "10000"))
+# Events queued for one slow subscriber before it is told to resync
+SUBSCRIBER_QUEUE_SIZE = int(os.getenv("EVENT_SUBSCRIBER_QUEUE_SIZE", "1000"))
+
+TOPIC_HISTORY = "history"
+TOPIC_TODOS = "todos"
+
+
+class Event:
+    __slots__ = ("id", "topic", "type", "data")
+
+    def __init__(self, id: int, topic: str, type: str, data: dict):
+        self.id = id
+        self.topic = topic
+        self.type = type
+        self.data = data
+
+    def to_sse(self) -> str:
+        return f"id: {self.id}\nevent: {self.type}\ndata: {json.dumps(self.data, separators=(',', ':'))}\n\n"
+
+
+class Subscription:
+    """
+    An asyncio queue receiving events published from any thread
+    """
+
+    def __init__(self, bus: "EventBus", topics: Optional[set], loop: asyncio.AbstractEventLoop):
+        self.bus = bus
+        self.topics = topics
+        self.loop = loop
+        self.queue: asyncio.Queue = asyncio.Queue()
+        self.overflowed = False
+        # Buffered events the subscriber missed, and whether the gap was too big to replay
+        self.backlog: list = []
+        self.reset = False
+
+    def wants(self, event: Event) -> bool:
+        return self.topics is None or event.topic in self.topics
+
+    def _deliver(self, event: Event) -> None:
+        # Runs on the subscriber's event loop
+        if self.overflowed:
+            return
+        if self.queue.qsize() >= SUBSCRIBER_QUEUE_SIZE:
+            self.overflowed = True
+            self.queue.put_nowait(None)
+            return
+        self.queue.put_nowait(event)
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        self.bus.unsubscribe(self)
+
+
+class EventBus:
+    """
+    In-process pub/sub with a ring buffer of recent events
+
+    publish() is thread-safe (crud runs in the threadpool); delivery is
+    scheduled onto each subscriber's event loop.
+    """
+
+    def __init__(self, buffer_size: int = EVENT_BUFFER_SIZE):
+        self._buffer: deque = deque(maxlen=buffer_size)
+        self._last_id = 0
+        self._subscribers: set = set()
+        self._lock = threading.Lock()
+
+    @property
+    def last_id(self) -> int:
+        return self._last_id
+
+    def publish(self, topic: str, type: str, data: dict) -> None:
+        with self._lock:
+            self._last_id += 1
+            event = Event(self._last_id, topic, type, data)
+            self._buffer.append(event)
+            subscribers = [s for s in self._subscribers if s.wants(event)]
+        for subscription in subscribers:
+            try:
+                subscription.loop.call_soon_threadsafe(subscription._deliver, event)
+            except RuntimeError:  # Subscriber's loop already closed
+                self.unsubscribe(subscription)
+
+    def subscribe(self, topics: Optional[Iterable[str]] = None, last_id: Optional[int] = None) -> Subscription:
+        """
+        Subscribe to new events; with last_id, events after it are replayed
+        from the buffer (or `reset` is set if they are no longer available)
+        """
+        subscription = Subscription(self, set(topics) if topics else None, asyncio.get_running_loop())
+        with self._lock:
+            if last_id is not None:
+                oldest_id = self._buffer[0].id if self._buffer else self._last_id + 1
+                if last_id > self._last_id or last_id < oldest_id - 1:
+                    # Unknown cursor (restart) or gap larger than the buffer
+                    subscription.reset = True
+                else:
+                    subscription.backlog = [e for e in self._buffer if e.id > last_id and subscription.wants(e)]
+            self._subscribers.add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription: Subscription) -> None:
+        with self._lock:
+            self._subscribers.discard(subscription)
+
+    @property
+    def subscriber_count(self) -> int:
+        return len(self._subscribers)
+
+
+bus = EventBus()
+metrics.register_gauge("events", lambda: {"subscribers": bus.subscriber_count, "last_id": bus.last_id})
+
+
+def publish(topic: str, type: str, data: dict) -> None:
+    """
+    Publish a change event to all subscribers of this process
+    """
+    bus.publish(topic, type, data)
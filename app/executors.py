@@ -0,0 +1,142 @@
+"""
+Separate worker pools for heavy and latency-sensitive routes
+
+Sync handlers normally share Starlette's threadpool, so a few exports
+building workbooks can hold it while /convert requests queue behind
+them. Heavy work (exports, upload spooling, bulk conversion) runs on the
+`heavy` pool, the conversion endpoints on the `light` pool, and other
+sync handlers stay on Starlette's threadpool.
+
+Each pool has a queue limit. When a pool is full, run() raises PoolBusy
+right away (503 with Retry-After) instead of queueing without bound.
+The light pool may use processes (EXECUTOR_LIGHT_KIND=process), which
+keeps conversions off the GIL the heavy threads hold; the function and
+arguments must then be picklable. The heavy pool is always threads,
+because its jobs use the request's database session.
+"""
+import asyncio
+import contextvars
+import functools
+import logging
+import multiprocessing
+import os
+import threading
+from concurrent.futures import Executor, Future, ProcessPoolExecutor, ThreadPoolExecutor
+from typing import Any, Callable, Dict, Optional
+from app import metrics
+
+logger = logging.getLogger(__name__)
+
+# Heavy routes: exports, import uploads, bulk conversions
+EXECUTOR_HEAVY_WORKERS = int(os.getenv("EXECUTOR_HEAVY_WORKERS", "2"))
+EXECUTOR_HEAVY_QUEUE = int(os.getenv("EXECUTOR_HEAVY_QUEUE", "8"))
+# Latency-sensitive routes: /convert and the unit listings
+EXECUTOR_LIGHT_KIND = os.getenv("EXECUTOR_LIGHT_KIND", "thread")
+EXECUTOR_LIGHT_WORKERS = int(os.getenv("EXECUTOR_LIGHT_WORKERS", "8"))
+EXECUTOR_LIGHT_QUEUE = int(os.getenv("EXECUTOR_LIGHT_QUEUE", "512"))
+
+KINDS = ("thread", "process")
+
+
+class PoolBusy(Exception):
+    """
+    The pool's queue is full
+    """
+
+    def __init__(self, pool: str):
+        super().__init__(f"The {pool} worker pool is busy, please retry")
+        self.pool = pool
+
+
+class WorkerPool:
+    """
+    A bounded thread or process pool awaited from async handlers
+    """
+
+    def __init__(self, name: str, kind: str, max_workers: int, max_queue: int):
+        if kind not in KINDS:
+            raise ValueError(f"Executor kind for {name} must be one of {', '.join(KINDS)}, got {kind!r}")
+        self.name = name
+        self.kind = kind
+        self.max_workers = max(1, max_workers)
+        self.max_queue = max(0, max_queue)
+        # Submitted and not finished (running + queued)
+        self.pending = 0
+        self._lock = threading.Lock()
+        self._executor: Optional[Executor] = None
+
+    @property
+    def executor(self) -> Executor:
+        # Created on first use so importing the app starts no threads or processes
+        if self._executor is None:
+            if self.kind == "process":
+                self._executor = ProcessPoolExecutor(self.max_workers, mp_context=multiprocessing.get_context("spawn"))
+            else:
+                self._executor = ThreadPoolExecutor(self.max_workers, thread_name_prefix=f"{self.name}-pool")
+        return self._executor
+
+    def submit(self, func: Callable[..., Any], *args, **kwargs) -> Future:
+        """
+        Submit func(*args, **kwargs) to the pool
+        Raises:
+            PoolBusy: max_workers jobs are running and max_queue are waiting
+        """
+        call = functools.partial(func, *args, **kwargs)
+        if self.kind == "thread":
+            # Like Starlette's threadpool: the job sees the request's context variables
+            call = functools.partial(contextvars.copy_context().run, call)
+        with self._lock:
+            if self.pending >= self.max_workers + self.max_queue:
+                metrics.increment("executor_rejections", pool=self.name)
+                raise PoolBusy(self.name)
+            self.pending += 1
+        try:
+            future = self.executor.submit(call)
+        except BaseException:
+            self._job_done(None)
+            raise
+        # Released when the job ends, not when the awaiting request goes away
+        # (a cancelled request leaves a started job running)
+        future.add_done_callback(self._job_done)
+        return future
+
+    async def run(self, func: Callable[..., Any], *args, **kwargs) -> Any:
+        """
+        Run func(*args, **kwargs) on the pool and await its result
+        Raises:
+            PoolBusy: max_workers jobs are running and max_queue are waiting
+        """
+        return await asyncio.wrap_future(self.submit(func, *args, **kwargs))
+
+    def _job_done(self, future: Optional[Future]) -> None:
+        with self._lock:
+            self.pending -= 1
+
+    def stats(self) -> dict:
+        return {
+            "kind": self.kind,
+            "workers": self.max_workers,
+            "running": min(self.pending, self.max_workers),
+            "queued": max(0, self.pending - self.max_workers),
+            "max_queue": self.max_queue,
+        }
+
+    def shutdown(self) -> None:
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+
+heavy = WorkerPool("heavy", "thread", EXECUTOR_HEAVY_WORKERS, EXECUTOR_HEAVY_QUEUE)
+light = WorkerPool("light", EXECUTOR_LIGHT_KIND, EXECUTOR_LIGHT_WORKERS, EXECUTOR_LIGHT_QUEUE)
+pools: Dict[str, WorkerPool] = {pool.name: pool for pool in (heavy, light)}
+
+metrics.register_gauge("executors", lambda: {name: pool.stats() for name, pool in pools.items()})
+
+
+def shutdown() -> None:
+    """
+    Stop the pools (running jobs finish, queued ones are cancelled)
+    """
+    for pool in pools.values():
+        pool.shutdown()
@@ -0,0 +1,167 @@
+"""
+Liveness and readiness probes
+
+Liveness only shows the event loop is answering. Readiness checks what a
+request needs to be served in time: a database round trip through the
+connection pool (bounded by READINESS_DB_TIMEOUT), free pool connections,
+the threadpool queue, the admission queues, the light worker pool and
+the background tasks' schedule. Its result is reused for
+READINESS_CACHE_SECONDS, so frequent probes cost one check per interval,
+and concurrent probes share it.
+"""
+import asyncio
+import logging
+import os
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Optional
+import anyio.to_thread
+from sqlalchemy import func, select, text
+from sqlalchemy.pool import QueuePool
+from app.database import engine
+from app import admission, executors, metrics, models, rollups, scheduler
+
+logger = logging.getLogger(__name__)
+
+# How long a readiness result is reused
+READINESS_CACHE_SECONDS = float(os.getenv("READINESS_CACHE_SECONDS", "1"))
+# Database ping (pool checkout + SELECT) budget
+READINESS_DB_TIMEOUT = float(os.getenv("READINESS_DB_TIMEOUT", "1"))
+# Requests waiting for a threadpool thread before the worker reports not ready
+READINESS_MAX_THREADPOOL_WAITING = int(os.getenv("READINESS_MAX_THREADPOOL_WAITING", "64"))
+# Route classes whose full admission queue makes the worker not ready
+READINESS_ADMISSION_CLASSES = [
+    name.strip() for name in os.getenv("READINESS_ADMISSION_CLASSES", "light,default").split(",") if name.strip()
+]
+# Grace before an overdue scheduled task makes the worker not ready
+READINESS_TASK_GRACE_SECONDS = float(os.getenv("READINESS_TASK_GRACE_SECONDS", "60"))
+# History rows not yet rolled up before the worker reports not ready (0 = report only)
+READINESS_MAX_ROLLUP_LAG_ROWS = int(os.getenv("READINESS_MAX_ROLLUP_LAG_ROWS", "0"))
+
+# The ping has its own thread: a saturated request threadpool must not delay it
+_ping_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="readiness")
+_ping: Optional[Future] = None
+_lock: Optional[asyncio.Lock] = None
+_cached: Optional[dict] = None
+_cached_at = 0.0
+
+
+def _ping_database() -> dict:
+    started = time.perf_counter()
+    with engine.connect() as conn:
+        if engine.dialect.name == "postgresql":
+            conn.execute(text(f"SET LOCAL statement_timeout = {int(READINESS_DB_TIMEOUT * 1000)}"))
+        conn.execute(text("SELECT 1"))
+        history = models.ConversionHistory
+        newest = conn.scalar(select(func.max(history.id)))
+        watermark = conn.scalar(
+            select(models.RollupWatermark.last_id).where(models.RollupWatermark.name == rollups.WATERMARK_NAME)
+        )
+    return {
+        "latency_ms": round((time.perf_counter() - started) * 1000, 1),
+        "rollup_lag_rows": max(0, (newest or 0) - (watermark or 0)),
+    }
+
+
+async def _check_database() -> dict:
+    global _ping
+    if _ping is not None and not _ping.done():
+        # The previous ping is still stuck; don't pile up another one
+        return {"ok": False, "error": "previous ping has not returned"}
+    _ping = _ping_executor.submit(_ping_database)
+    try:
+        result = await asyncio.wait_for(asyncio.wrap_future(_ping), READINESS_DB_TIMEOUT)
+    except asyncio.TimeoutError:
+        return {"ok": False, "error": f"no answer within {READINESS_DB_TIMEOUT:g}s"}
+    except Exception as e:
+        return {"ok": False, "error": str(e).splitlines()[0]}
+    lag = result["rollup_lag_rows"]
+    return {**result, "ok": not (READINESS_MAX_ROLLUP_LAG_ROWS and lag > READINESS_MAX_ROLLUP_LAG_ROWS)}
+
+
+def _check_pool() -> dict:
+    pool = engine.pool
+    if not isinstance(pool, QueuePool):
+        return {"ok": True, "pool": type(pool).__name__}
+    # A negative max_overflow means no limit
+    capacity = pool.size() + pool._max_overflow if pool._max_overflow >= 0 else None
+    checked_out = pool.checkedout()
+    return {
+        "ok": capacity is None or checked_out < capacity,
+        "checked_out": checked_out,
+        "capacity": capacity,
+    }
+
+
+def _check_threadpool() -> dict:
+    stats = anyio.to_thread.current_default_thread_limiter().statistics()
+    return {
+        "ok": stats.tasks_waiting <= READINESS_MAX_THREADPOOL_WAITING,
+        "busy": stats.borrowed_tokens,
+        "threads": stats.total_tokens,
+        "waiting": stats.tasks_waiting,
+    }
+
+
+def _check_admission() -> dict:
+    queues = {
+        name: {"in_flight": limiter.in_flight, "waiting": limiter.waiting, "max_queue": limiter.max_queue}
+        for name, limiter in admission.limiters.items()
+    }
+    full = [
+        name for name in READINESS_ADMISSION_CLASSES
+        if name in admission.limiters and 0 < admission.limiters[name].max_queue <= admission.limiters[name].waiting
+    ]
+    return {"ok": not full, "full": full, "queues": queues}
+
+
+def _check_executors() -> dict:
+    # A full heavy pool only delays exports; a full light pool turns conversions away
+    light = executors.light
+    return {
+        "ok": light.pending < light.max_workers + light.max_queue,
+        "pools": {name: pool.stats() for name, pool in executors.pools.items()},
+    }
+
+
+def _check_scheduler() -> dict:
+    tasks = scheduler.task_status()
+    late = [
+        name for name, task in tasks.items()
+        if task["overdue_seconds"] > max(task["interval"], READINESS_TASK_GRACE_SECONDS)
+    ]
+    return {"ok": not late, "late": late, "leader": scheduler.is_leader(), "tasks": tasks}
+
+
+async def _run_checks() -> dict:
+    checks = {
+        "database": await _check_database(),
+        "pool": _check_pool(),
+        "threadpool": _check_threadpool(),
+        "admission": _check_admission(),
+        "executors": _check_executors(),
+        "scheduler": _check_scheduler(),
+    }
+    ready = all(check["ok"] for check in checks.values())
+    if not ready:
+        failed = [name for name, check in checks.items() if not check["ok"]]
+        metrics.increment("readiness_failures", check=",".join(failed))
+        logger.warning(f"Not ready: {', '.join(failed)}")
+    return {"status": "ready" if ready else "not_ready", "checks": checks}
+
+
+async def readiness() -> dict:
+    """
+    Get the readiness report, re-checked at most every READINESS_CACHE_SECONDS
+    """
+    global _lock, _cached, _cached_at
+    if _cached is not None and time.monotonic() - _cached_at < READINESS_CACHE_SECONDS:
+        return _cached
+    if _lock is None:
+        _lock = asyncio.Lock()
+    async with _lock:
+        # Probes that waited for the lock reuse the result just computed
+        if _cached is None or time.monotonic() - _cached_at >= READINESS_CACHE_SECONDS:
+            _cached = await _run_checks()
+            _cached_at = time.monotonic()
+    return _cached
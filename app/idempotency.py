@@ -0,0 +1,159 @@
+import hashlib
+import json
+import os
+import threading
+import time
+import logging
+from collections import OrderedDict
+from datetime import datetime, timedelta, timezone
+from typing import Optional, Tuple
+from fastapi import HTTPException, Response
+from pydantic import BaseModel
+from sqlalchemy import delete
+from sqlalchemy.orm import Session
+from app.database import SessionLocal
+from app import models, tenants
+
+logger = logging.getLogger(__name__)
+
+IDEMPOTENCY_HEADER = "Idempotency-Key"
+REPLAYED_HEADER = "Idempotent-Replayed"
+# How long a key is remembered
+IDEMPOTENCY_TTL_SECONDS = float(os.getenv("IDEMPOTENCY_TTL_SECONDS", "86400"))
+# Keys kept in the in-process LRU in front of the idempotency_keys table
+IDEMPOTENCY_CACHE_SIZE = int(os.getenv("IDEMPOTENCY_CACHE_SIZE", "10000"))
+IDEMPOTENCY_PURGE_INTERVAL_SECONDS = float(os.getenv("IDEMPOTENCY_PURGE_INTERVAL_SECONDS", "3600"))
+
+SCOPE_TODOS = "todos"
+SCOPE_CONVERSION_HISTORY = "conversion_history"
+
+
+def history_scope(tenant_id: str) -> str:
+    # Keys are per tenant (the default tenant keeps the original scope)
+    if tenant_id == tenants.DEFAULT_TENANT:
+        return SCOPE_CONVERSION_HISTORY
+    return f"{SCOPE_CONVERSION_HISTORY}:{tenant_id}"
+
+
+class Replayed(Exception):
+    """
+    A concurrent request with the same key created the resource first
+    """
+
+    def __init__(self, resource):
+        super().__init__(f"{IDEMPOTENCY_HEADER} was used by a concurrent request")
+        self.resource = resource
+
+
+class _LRUCache:
+    """
+    Bounded, thread-safe LRU of (scope, key) -> (resource id, request hash) with expiry
+    """
+
+    def __init__(self, max_size: int, ttl: float):
+        self.max_size = max_size
+        self.ttl = ttl
+        self._items: OrderedDict = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, cache_key: tuple) -> Optional[tuple]:
+        with self._lock:
+            item = self._items.get(cache_key)
+            if item is None:
+                return None
+            value, expires_at = item
+            if expires_at < time.monotonic():
+                del self._items[cache_key]
+                return None
+            self._items.move_to_end(cache_key)
+            return value
+
+    def put(self, cache_key: tuple, value: tuple, ttl: Optional[float] = None) -> None:
+        with self._lock:
+            self._items[cache_key] = (value, time.monotonic() + (self.ttl if ttl is None else ttl))
+            self._items.move_to_end(cache_key)
+            while len(self._items) > self.max_size:
+                self._items.popitem(last=False)
+
+
+_cache = _LRUCache(IDEMPOTENCY_CACHE_SIZE, IDEMPOTENCY_TTL_SECONDS)
+
+
+def request_hash(body: BaseModel) -> str:
+    """
+    Fingerprint of a create request's body
+    """
+    payload = json.dumps(body.model_dump(mode="json"), sort_keys=True, separators=(",", ":"))
+    return hashlib.sha256(payload.encode()).hexdigest()
+
+
+def lookup(db: Session, scope: str, key: str, body_hash: Optional[str] = None) -> Optional[int]:
+    """
+    Get the id of the resource created under this key (LRU first, then one PK lookup)
+
+    A key older than the TTL counts as unused, even before the purge deletes it.
+    Raises:
+        HTTPException: 422 if the key was used with another request body
+    """
+    entry: Optional[Tuple[int, Optional[str]]] = _cache.get((scope, key))
+    if entry is None:
+        row = db.get(models.IdempotencyKey, (scope, key))
+        if row is None:
+            return None
+        created_at = row.created_at if row.created_at.tzinfo else row.created_at.replace(tzinfo=timezone.utc)
+        remaining = IDEMPOTENCY_TTL_SECONDS - (datetime.now(timezone.utc) - created_at).total_seconds()
+        if remaining <= 0:
+            # Expired but not purged yet: free the key for this request (committed with it)
+            db.execute(delete(models.IdempotencyKey).where(
+                models.IdempotencyKey.scope == scope, models.IdempotencyKey.key == key
+            ))
+            db.expunge(row)
+            return None
+        entry = (row.resource_id, row.request_hash)
+        _cache.put((scope, key), entry, ttl=remaining)
+    resource_id, stored_hash = entry
+    if body_hash is not None and stored_hash is not None and body_hash != stored_hash:
+        raise HTTPException(
+            status_code=422,
+            detail=f"{IDEMPOTENCY_HEADER} was already used with a different request body"
+        )
+    return resource_id
+
+
+def record(db: Session, scope: str, key: str, resource_id: int, body_hash: Optional[str] = None) -> None:
+    """
+    Add the key to the current transaction (the caller commits)
+    """
+    db.add(models.IdempotencyKey(scope=scope, key=key, resource_id=resource_id, request_hash=body_hash))
+
+
+def remember(scope: str, key: str, resource_id: int, body_hash: Optional[str] = None) -> None:
+    """
+    Cache a committed key in the LRU
+    """
+    _cache.put((scope, key), (resource_id, body_hash))
+
+
+def replay(resource, response: Response):
+    """
+    Return the original resource of a retried create request
+    """
+    if resource is None:
+        raise HTTPException(
+            status_code=409,
+            detail=f"{IDEMPOTENCY_HEADER} was already used for a resource that no longer exists"
+        )
+    response.headers[REPLAYED_HEADER] = "true"
+    return resource
+
+
+def purge_expired() -> None:
+    """
+    Scheduled task: delete keys older than the TTL
+    """
+    cutoff = datetime.now(timezone.utc) - timedelta(seconds=IDEMPOTENCY_TTL_SECONDS)
+    with SessionLocal() as db:
+        result = db.execute(delete(models.IdempotencyKey).where(models.IdempotencyKey.created_at < cutoff))
+        db.commit()
+    if result.rowcount:
+        logger.info(f"Purged {result.rowcount} expired idempotency keys")
@@ -0,0 +1,319 @@
+import csv
+import logging
+import os
+import tempfile
+from datetime import datetime, timezone
+from typing import BinaryIO, Iterable, Iterator, List, Optional, Tuple
+from pydantic import ValidationError
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+from app.database import SessionLocal
+from app import crud, executors, jobs, models, schemas, tenants, units
+
+logger = logging.getLogger(__name__)
+
+# Rows validated and inserted per transaction
+IMPORT_CHUNK_SIZE = int(os.getenv("IMPORT_CHUNK_SIZE", "1000"))
+# Largest accepted upload
+IMPORT_MAX_BYTES = int(os.getenv("IMPORT_MAX_BYTES", str(200 * 1024 * 1024)))
+# Row errors kept in the job result (the rest are only counted)
+IMPORT_MAX_ERRORS = 100
+
+KIND_TODOS = "todos"
+KIND_CONVERSIONS = "conversion_history"
+
+# Sheet names written by export.create_excel_file
+SHEET_KINDS = {"Todos": KIND_TODOS, "Conversion History": KIND_CONVERSIONS}
+REQUIRED_COLUMNS = {
+    KIND_TODOS: ("title",),
+    KIND_CONVERSIONS: ("value", "from unit", "to unit", "result", "unit type"),
+}
+
+
+class UploadTooLarge(Exception):
+    pass
+
+
+def save_upload(source: BinaryIO, suffix: str) -> str:
+    """
+    Copy an uploaded file to a temporary file for the background job
+    Returns:
+        str: Path of the temporary file
+    """
+    fd, path = tempfile.mkstemp(prefix="import_", suffix=suffix)
+    size = 0
+    try:
+        with os.fdopen(fd, "wb") as target:
+            while True:
+                block = source.read(1024 * 1024)
+                if not block:
+                    break
+                size += len(block)
+                if size > IMPORT_MAX_BYTES:
+                    raise UploadTooLarge(f"File is larger than {IMPORT_MAX_BYTES} bytes")
+                target.write(block)
+    except BaseException:
+        os.unlink(path)
+        raise
+    return path
+
+
+def _column_name(header) -> str:
+    # "From Unit", "from_unit" and "FROM UNIT" all map to "from unit"
+    return str(header or "").strip().lower().replace("_", " ")
+
+
+def _parse_datetime(value) -> Optional[datetime]:
+    if value is None or value == "":
+        return None
+    if isinstance(value, datetime):
+        return value
+    return datetime.fromisoformat(str(value).strip())
+
+
+def _parse_bool(value) -> bool:
+    if isinstance(value, bool):
+        return value
+    text = str(value or "").strip().lower()
+    if text in ("yes", "true", "1", "y"):
+        return True
+    if text in ("no", "false", "0", "n", ""):
+        return False
+    raise ValueError(f"Invalid completed value: {value!r}")
+
+
+def _todo_row(record: dict, preserve_ids: bool) -> dict:
+    todo = schemas.TodoCreate(
+        title=str(record.get("title") or ""),
+        description=str(record["description"]) if record.get("description") not in (None, "") else None,
+        completed=_parse_bool(record.get("completed")),
+    )
+    created_at = _parse_datetime(record.get("created at")) or datetime.now(timezone.utc)
+    row = {
+        "title": todo.title,
+        "description": todo.description,
+        "completed": todo.completed,
+        "created_at": created_at,
+        "updated_at": _parse_datetime(record.get("updated at")) or created_at,
+    }
+    if preserve_ids:
+        row["id"] = int(record["id"])
+    return row
+
+
+def _conversion_row(record: dict, preserve_ids: bool) -> dict:
+    conversion = schemas.ConversionHistoryCreate(
+        value=record.get("value"),
+        from_unit=str(record.get("from unit") or ""),
+        to_unit=str(record.get("to unit") or ""),
+        result=record.get("result"),
+        unit_type=str(record.get("unit type") or ""),
+    )
+    row = {
+        "value": conversion.value,
+        "from_unit_id": units.unit_id(conversion.from_unit),
+        "to_unit_id": units.unit_id(conversion.to_unit),
+        "result": conversion.result,
+        "unit_type_id": units.unit_type_id(conversion.unit_type),
+        "created_at": _parse_datetime(record.get("created at")) or datetime.now(timezone.utc),
+    }
+    if preserve_ids:
+        row["id"] = int(record["id"])
+    return row
+
+
+ROW_BUILDERS = {KIND_TODOS: _todo_row, KIND_CONVERSIONS: _conversion_row}
+BULK_INSERTS = {KIND_TODOS: crud.bulk_create_todos, KIND_CONVERSIONS: crud.bulk_create_conversion_history}
+MODELS = {KIND_TODOS: models.Todo, KIND_CONVERSIONS: models.ConversionHistory}
+
+
+class _Import:
+    """
+    Validates rows in chunks and bulk-inserts them, tracking progress on the job
+    """
+
+    def __init__(self, job_id: str, preserve_ids: bool, tenant_id: str = tenants.DEFAULT_TENANT):
+        self.job_id = job_id
+        self.preserve_ids = preserve_ids
+        self.tenant_id = tenant_id
+        self.processed = 0
+        self.stats = {}
+        self.errors: List[dict] = []
+        self.error_count = 0
+
+    def _error(self, source: str, row_number: int, message: str) -> None:
+        self.error_count += 1
+        if len(self.errors) < IMPORT_MAX_ERRORS:
+            self.errors.append({"source": source, "row": row_number, "error": message})
+
+    def load(self, kind: str, source: str, rows: Iterable[Tuple[int, tuple]], header: tuple) -> None:
+        """
+        Import (row number, values) rows of one sheet or file
+        """
+        columns = [_column_name(h) for h in header]
+        required = REQUIRED_COLUMNS[kind] + (("id",) if self.preserve_ids else ())
+        missing = [c for c in required if c not in columns]
+        if missing:
+            raise ValueError(f"{source}: missing column(s) {', '.join(missing)}")
+
+        stats = self.stats.setdefault(kind, {"inserted": 0, "skipped": 0, "invalid": 0})
+        build = ROW_BUILDERS[kind]
+        chunk: List[dict] = []
+        numbers: List[int] = []
+        for row_number, values in rows:
+            self.processed += 1
+            if all(v is None or v == "" for v in values):
+                continue
+            record = dict(zip(columns, values))
+            try:
+                row = build(record, self.preserve_ids)
+                if kind == KIND_CONVERSIONS:
+                    row["tenant_id"] = self.tenant_id
+                chunk.append(row)
+                numbers.append(row_number)
+            except ValidationError as e:
+                stats["invalid"] += 1
+                message = "; ".join(
+                    (f"{'.'.join(map(str, err['loc']))}: " if err["loc"] else "") + err["msg"] for err in e.errors()
+                )
+                self._error(source, row_number, message)
+            except (ValueError, TypeError, KeyError) as e:
+                stats["invalid"] += 1
+                self._error(source, row_number, str(e))
+            if len(chunk) >= IMPORT_CHUNK_SIZE:
+                self._flush(kind, source, chunk, numbers, stats)
+                chunk, numbers = [], []
+        self._flush(kind, source, chunk, numbers, stats)
+        if self.preserve_ids:
+            with SessionLocal() as db:
+                crud.reset_id_sequence(db, MODELS[kind])
+
+    def _flush(self, kind: str, source: str, chunk: List[dict], numbers: List[int], stats: dict) -> None:
+        if chunk:
+            with SessionLocal() as db:
+                if kind == KIND_CONVERSIONS:
+                    if self.preserve_ids:
+                        chunk = self._drop_foreign_ids(db, source, chunk, numbers, stats)
+                    # 429 fails the job; earlier chunks stay imported
+                    tenants.check_history_quota(db, self.tenant_id, adding=len(chunk))
+                inserted = len(BULK_INSERTS[kind](db, chunk)) if chunk else 0
+            stats["inserted"] += inserted
+            stats["skipped"] += len(chunk) - inserted
+        jobs.update_job(self.job_id, processed=self.processed, result=self.result())
+
+    def _drop_foreign_ids(
+        self, db: Session, source: str, chunk: List[dict], numbers: List[int], stats: dict
+    ) -> List[dict]:
+        """
+        Reject rows whose preserved id belongs to another tenant
+
+        The (tenant_id, id) key of the partitioned table would accept them as
+        duplicates. Like the quota, the check is not atomic with the insert.
+        """
+        history = models.ConversionHistory
+        foreign = set(db.scalars(
+            select(history.id)
+            .where(history.id.in_([row["id"] for row in chunk]), history.tenant_id != self.tenant_id)
+        ))
+        if not foreign:
+            return chunk
+        kept = []
+        for row_number, row in zip(numbers, chunk):
+            if row["id"] in foreign:
+                stats["invalid"] += 1
+                self._error(source, row_number, f"id {row['id']} belongs to another tenant")
+            else:
+                kept.append(row)
+        return kept
+
+    def result(self) -> dict:
+        return {**self.stats, "error_count": self.error_count, "errors": list(self.errors)}
+
+
+def _sheet_kind(name: str) -> Optional[str]:
+    # Rows beyond one sheet's limit continue on "Todos 2", "Conversion History 2", ...
+    base, _, number = name.rpartition(" ")
+    if base in SHEET_KINDS and number.isdigit():
+        return SHEET_KINDS[base]
+    return SHEET_KINDS.get(name)
+
+
+def _numbered(rows: Iterator, start: int) -> Iterator[Tuple[int, tuple]]:
+    for row_number, values in enumerate(rows, start=start):
+        yield row_number, tuple(values)
+
+
+def import_excel(job_id: str, path: str, preserve_ids: bool = False, tenant_id: str = tenants.DEFAULT_TENANT) -> None:
+    """
+    Import the Todos and Conversion History sheets of a workbook in the
+    create_excel_file format, streaming rows with openpyxl's read-only mode
+    """
+    from openpyxl import load_workbook
+
+    importer = _Import(job_id, preserve_ids, tenant_id)
+    workbook = None
+    try:
+        workbook = load_workbook(path, read_only=True, data_only=True)
+        sheets = [(name, workbook[name]) for name in workbook.sheetnames if _sheet_kind(name)]
+        if not sheets:
+            raise ValueError(f"Workbook has none of the sheets: {', '.join(SHEET_KINDS)}")
+        # Dimensions come from the sheet metadata; they may be missing
+        if all(sheet.max_row for _, sheet in sheets):
+            jobs.update_job(job_id, total=sum(max(sheet.max_row - 1, 0) for _, sheet in sheets))
+        for name, sheet in sheets:
+            rows = sheet.iter_rows(values_only=True)
+            header = next(rows, None)
+            if header is None:
+                continue
+            importer.load(_sheet_kind(name), name, _numbered(rows, 2), header)
+    finally:
+        if workbook is not None:
+            workbook.close()
+        os.unlink(path)
+    jobs.update_job(job_id, processed=importer.processed, result=importer.result())
+    logger.info(f"Import job {job_id} finished: {importer.result()['error_count']} invalid rows, {importer.stats}")
+
+
+def import_csv(
+    job_id: str, path: str, kind: str, preserve_ids: bool = False, tenant_id: str = tenants.DEFAULT_TENANT
+) -> None:
+    """
+    Import a CSV file of todos or conversion history (same columns as the export sheets)
+    """
+    importer = _Import(job_id, preserve_ids, tenant_id)
+    try:
+        with open(path, newline="", encoding="utf-8-sig") as f:
+            rows = csv.reader(f)
+            header = next(rows, None)
+            if header is None:
+                raise ValueError("CSV file is empty")
+            importer.load(kind, "csv", _numbered(rows, 2), tuple(header))
+    finally:
+        os.unlink(path)
+    jobs.update_job(job_id, processed=importer.processed, result=importer.result())
+    logger.info(f"Import job {job_id} finished: {importer.result()['error_count']} invalid rows, {importer.stats}")
+
+
+def start_import(
+    path: str, fmt: str, kind: Optional[str], filename: str, preserve_ids: bool,
+    tenant_id: str = tenants.DEFAULT_TENANT
+) -> dict:
+    """
+    Start a background job importing an uploaded file
+    (conversion history rows are assigned to tenant_id)
+    Raises:
+        executors.PoolBusy: The heavy pool is full (the file is deleted)
+    """
+    job = jobs.create_job("import", {
+        "filename": filename, "format": fmt, "kind": kind, "preserve_ids": preserve_ids, "tenant_id": tenant_id
+    })
+    # Parsing and writing run on the bounded heavy pool, not a thread per job
+    try:
+        if fmt == "xlsx":
+            jobs.run_in_background(job["id"], import_excel, path, preserve_ids, tenant_id, pool=executors.heavy)
+        else:
+            jobs.run_in_background(job["id"], import_csv, path, kind, preserve_ids, tenant_id, pool=executors.heavy)
+    except executors.PoolBusy:
+        os.unlink(path)
+        raise
+    return job
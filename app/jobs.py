@@ -0,0 +1,157 @@
+"""
+Background jobs and their status
+
+Job status lives in the jobs table, so any worker can answer
+GET /api/jobs/{id} for a job another worker runs. Every status update
+refreshes updated_at; a pending or running job without an update for
+JOB_STALE_SECONDS (its worker exited) is marked failed.
+"""
+import os
+import threading
+import uuid
+from datetime import datetime, timedelta, timezone
+from typing import Callable, List, Optional
+from sqlalchemy import delete, select, update
+from app.database import SessionLocal
+from app import executors, models
+
+# Finished jobs kept for status queries
+MAX_FINISHED_JOBS = 100
+# A pending/running job not updated for this long is considered abandoned
+JOB_STALE_SECONDS = float(os.getenv("JOB_STALE_SECONDS", "600"))
+
+ACTIVE_STATUSES = ("pending", "running")
+
+_FIELDS = (
+    "id", "kind", "status", "params", "processed", "total", "error", "result", "created_at", "finished_at"
+)
+
+
+def _now() -> datetime:
+    return datetime.now(timezone.utc)
+
+
+def _as_dict(job: models.Job) -> dict:
+    record = {field: getattr(job, field) for field in _FIELDS}
+    for field in ("created_at", "finished_at"):
+        if record[field] is not None and record[field].tzinfo is None:
+            # SQLite returns naive datetimes; they are stored in UTC
+            record[field] = record[field].replace(tzinfo=timezone.utc)
+    return record
+
+
+def create_job(kind: str, params: Optional[dict] = None) -> dict:
+    """
+    Register a new pending job and return its status record
+    """
+    now = _now()
+    job = models.Job(
+        id=uuid.uuid4().hex, kind=kind, status="pending", params=params or {}, processed=0,
+        created_at=now, updated_at=now
+    )
+    with SessionLocal() as db:
+        db.add(job)
+        _expire_stale(db)
+        _prune(db)
+        db.commit()
+        return _as_dict(job)
+
+
+def update_job(job_id: str, **fields) -> None:
+    """
+    Update fields of a job status record
+    """
+    with SessionLocal() as db:
+        db.execute(update(models.Job).where(models.Job.id == job_id).values(updated_at=_now(), **fields))
+        db.commit()
+
+
+def finish_job(job_id: str, error: Optional[str] = None) -> None:
+    """
+    Mark a job as completed or failed
+    """
+    update_job(job_id, status="failed" if error else "completed", error=error, finished_at=_now())
+
+
+def get_job(job_id: str) -> Optional[dict]:
+    """
+    Get a snapshot of a job status record
+    """
+    with SessionLocal() as db:
+        job = db.get(models.Job, job_id)
+        return _as_dict(job) if job else None
+
+
+def list_jobs(kind: Optional[str] = None, active: bool = False) -> List[dict]:
+    """
+    List job status records, newest first (only pending/running ones if active)
+    """
+    query = select(models.Job).order_by(models.Job.created_at.desc())
+    if kind is not None:
+        query = query.where(models.Job.kind == kind)
+    with SessionLocal() as db:
+        if active:
+            _expire_stale(db)
+            db.commit()
+            query = query.where(models.Job.status.in_(ACTIVE_STATUSES))
+        return [_as_dict(job) for job in db.scalars(query)]
+
+
+def run_in_background(
+    job_id: str, func: Callable[..., None], *args, pool: Optional[executors.WorkerPool] = None
+) -> None:
+    """
+    Run func(job_id, *args) on a daemon thread, or on a bounded worker pool,
+    recording failures on the job
+    Raises:
+        executors.PoolBusy: The pool is full (the job record is removed)
+    """
+    def target():
+        update_job(job_id, status="running")
+        try:
+            func(job_id, *args)
+            finish_job(job_id)
+        except Exception as e:
+            finish_job(job_id, error=str(e))
+
+    if pool is None:
+        threading.Thread(target=target, name=f"job-{job_id[:8]}", daemon=True).start()
+        return
+    try:
+        pool.submit(target)
+    except executors.PoolBusy:
+        with SessionLocal() as db:
+            db.execute(delete(models.Job).where(models.Job.id == job_id))
+            db.commit()
+        raise
+
+
+def _expire_stale(db) -> None:
+    now = _now()
+    db.execute(
+        update(models.Job)
+        .where(
+            models.Job.status.in_(ACTIVE_STATUSES),
+            models.Job.updated_at < now - timedelta(seconds=JOB_STALE_SECONDS)
+        )
+        .values(
+            status="failed", error=f"Abandoned: no progress for {JOB_STALE_SECONDS:g}s",
+            finished_at=now, updated_at=now
+        )
+        .execution_options(synchronize_session=False)
+    )
+
+
+def _prune(db) -> None:
+    # Keep the newest MAX_FINISHED_JOBS finished jobs
+    kept = (
+        select(models.Job.id)
+        .where(models.Job.finished_at.is_not(None))
+        .order_by(models.Job.finished_at.desc())
+        .limit(MAX_FINISHED_JOBS)
+    )
+    db.execute(
+        delete(models.Job)
+        .where(models.Job.finished_at.is_not(None), models.Job.id.not_in(kept.scalar_subquery()))
+        .execution_options(synchronize_session=False)
+    )
@@ -1,9 +1,12 @@
-from fastapi import FastAPI
+from fastapi import FastAPI, Request, HTTPException
+from fastapi.responses import JSONResponse
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.staticfiles import StaticFiles
-from fastapi.responses import FileResponse
-from app.database import init_db
-from app.routers import todos, converter, export
+from app.database import engine, init_db, replicas
+from app.dependencies import pin_reads_to_primary
+from app.routers import todos, converter, export, imports, jobs, events
+from app import scheduler, retention, rollups, metrics, idempotency, counters, deltas, tenants, health, executors
+from app.admission import AdmissionControlMiddleware
+from app.static_assets import StaticAssetCache
 import logging
 
 # Configure logging
@@ -22,6 +25,9 @@ app = FastAPI(
     redoc_url="/redoc"
 )
 
+# Rate limiting and load shedding (added first so CORS headers wrap its 429/503s)
+app.add_middleware(AdmissionControlMiddleware)
+
 # Configure CORS
 app.add_middleware(
     CORSMiddleware,
@@ -31,24 +37,42 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+
+
+@app.exception_handler(executors.PoolBusy)
+async def pool_busy(request: Request, exc: executors.PoolBusy):
+    """
+    A full worker pool sheds the request like the admission queues do
+    """
+    return JSONResponse(status_code=503, content={"detail": str(exc)}, headers={"Retry-After": "1"})
+
+
+@app.middleware("http")
+async def read_your_writes(request: Request, call_next):
+    """
+    After a successful write, pin the client's reads to the primary database
+    """
+    response = await call_next(request)
+    if replicas and request.method not in ("GET", "HEAD", "OPTIONS") and response.status_code < 400:
+        pin_reads_to_primary(response)
+    return response
+
+
 # Include routers
 app.include_router(todos.router, prefix="/api")
 app.include_router(converter.router, prefix="/api")
 app.include_router(export.router, prefix="/api")
+app.include_router(imports.router, prefix="/api")
+app.include_router(jobs.router, prefix="/api")
+app.include_router(events.router, prefix="/api")
 
-# Mount static files for HTML interface
-import os
+# Static files for HTML interface (served precompressed from memory)
 from pathlib import Path
 
 # Get the project root directory (parent of app directory)
 BASE_DIR = Path(__file__).resolve().parent.parent
 static_dir = BASE_DIR / "static"
-
-if static_dir.exists():
-    app.mount("/static", StaticFiles(directory=str(static_dir)), name="static")
-    logger.info(f"Static files mounted from: {static_dir}")
-else:
-    logger.warning(f"Static directory not found: {static_dir}")
+static_assets = StaticAssetCache(static_dir)
 
 
 @app.on_event("startup")
@@ -58,10 +82,39 @@ async def startup_event():
     """
     logger.info("Starting application...")
     try:
-        init_db()
-        logger.info("Database tables created successfully")
+        if init_db():
+            logger.info("Database tables created successfully")
+        else:
+            logger.info("Database schema is up to date")
+        # Tenants added to TENANT_API_KEYS get their own history partition
+        tenants.ensure_partitions(engine)
     except Exception as e:
         logger.error(f"Error creating database tables: {e}")
+    
+    if static_dir.exists():
+        static_assets.load()
+        logger.info(f"Static files loaded from: {static_dir}")
+    else:
+        logger.warning(f"Static directory not found: {static_dir}")
+    
+    scheduler.register_task("history_retention", retention.RETENTION_INTERVAL_SECONDS, retention.apply_retention_policies)
+    scheduler.register_task("history_rollup", rollups.ROLLUP_INTERVAL_SECONDS, rollups.run_scheduled_rollup)
+    scheduler.register_task("idempotency_purge", idempotency.IDEMPOTENCY_PURGE_INTERVAL_SECONDS, idempotency.purge_expired)
+    scheduler.register_task(
+        "row_counter_reconcile", counters.ROW_COUNTER_RECONCILE_SECONDS, counters.run_scheduled_reconcile
+    )
+    scheduler.register_task("tombstone_purge", deltas.TOMBSTONE_PURGE_INTERVAL_SECONDS, deltas.purge_expired)
+    # One worker per database runs the tasks
+    scheduler.start_scheduler(engine)
+
+
+@app.on_event("shutdown")
+async def shutdown_event():
+    """
+    Shutdown event - Stop background tasks
+    """
+    scheduler.stop_scheduler()
+    executors.shutdown()
 
 
 @app.get("/", tags=["health"])
@@ -81,7 +134,7 @@ def root():
 @app.get("/health", tags=["health"])
 def health_check():
     """
-    Health check endpoint to verify service status
+    Health check endpoint to verify service status (static; see /health/ready)
     """
     return {
         "status": "healthy",
@@ -90,15 +143,49 @@ def health_check():
     }
 
 
-@app.get("/converter", tags=["converter"])
-def converter_page():
+@app.get("/health/live", tags=["health"])
+async def liveness():
+    """
+    Liveness probe: the event loop is answering (no dependencies checked)
+    """
+    return {"status": "alive"}
+
+
+@app.get("/health/ready", tags=["health"])
+async def readiness():
+    """
+    Readiness probe: 503 when the database, connection pool, threadpool,
+    admission queues or background tasks cannot keep up (cached briefly)
+    """
+    report = await health.readiness()
+    return JSONResponse(status_code=200 if report["status"] == "ready" else 503, content=report)
+
+
+@app.get("/metrics", tags=["health"])
+def get_metrics():
+    """
+    Service metrics (shed requests, admission queue depths)
+    """
+    return metrics.snapshot()
+
+
+@app.api_route("/static/{file_path:path}", methods=["GET", "HEAD"], include_in_schema=False)
+async def static_file(file_path: str, request: Request):
+    """
+    Serve a static file (brotli/gzip negotiated, ETag/304, cache headers)
+    """
+    response = static_assets.response(request, file_path)
+    if response is None:
+        raise HTTPException(status_code=404, detail="Not Found")
+    return response
+
+
+@app.api_route("/converter", methods=["GET", "HEAD"], tags=["converter"])
+async def converter_page(request: Request):
     """
     Serve the unit converter HTML page
     """
-    converter_path = static_dir / "converter.html"
-    if converter_path.exists():
-        return FileResponse(converter_path)
-    else:
-        from fastapi import HTTPException
+    response = static_assets.response(request, "converter.html")
+    if response is None:
         raise HTTPException(status_code=404, detail="Converter page not found")
-
+    return response
@@ -0,0 +1,38 @@
+import threading
+from collections import defaultdict
+from typing import Callable, Dict
+
+_counters: Dict[tuple, int] = defaultdict(int)
+_gauges: Dict[str, Callable[[], dict]] = {}
+_lock = threading.Lock()
+
+
+def increment(name: str, amount: int = 1, **labels) -> None:
+    """
+    Increment a counter identified by name and labels
+    """
+    key = (name, tuple(sorted(labels.items())))
+    with _lock:
+        _counters[key] += amount
+
+
+def register_gauge(name: str, func: Callable[[], dict]) -> None:
+    """
+    Register a callable returning current values, evaluated on every snapshot
+    """
+    _gauges[name] = func
+
+
+def snapshot() -> dict:
+    """
+    Get all counters and gauges as a JSON-serializable dict
+    """
+    with _lock:
+        items = list(_counters.items())
+    counters: Dict[str, list] = defaultdict(list)
+    for (name, labels), value in sorted(items):
+        counters[name].append({"labels": dict(labels), "value": value})
+    return {
+        "counters": dict(counters),
+        "gauges": {name: func() for name, func in _gauges.items()},
+    }
@@ -0,0 +1,331 @@
+import logging
+from sqlalchemy import inspect, select, text
+from sqlalchemy.engine import Engine
+from app import units
+
+logger = logging.getLogger(__name__)
+
+# Rows updated per transaction when backfilling existing tables
+MIGRATION_CHUNK_SIZE = 50_000
+
+
+LEGACY_COLUMNS = {"unit_type": "legacy_unit_type", "from_unit": "legacy_from_unit", "to_unit": "legacy_to_unit"}
+
+
+def _name_to_id_case(column: str, mapping: dict) -> str:
+    whens = " ".join(f"WHEN '{name}' THEN {id_}" for name, id_ in mapping.items())
+    return f"CASE lower(trim({column})) {whens} ELSE {units.UNKNOWN_ID} END"
+
+
+def _legacy_name_case(column: str, mapping: dict) -> str:
+    # The original name when it is outside the registry, else NULL
+    names = ", ".join(f"'{name}'" for name in mapping)
+    return f"CASE WHEN lower(trim({column})) IN ({names}) THEN NULL ELSE {column} END"
+
+
+def migrate_conversion_history_unit_ids(engine: Engine) -> bool:
+    """
+    Convert legacy string unit columns of conversion_history to registry ids
+
+    Adds unit_type_id/from_unit_id/to_unit_id, backfills them in id-range
+    chunks (safe to resume), then drops the old string columns. Names
+    outside the registry get id 0 and are kept in legacy_unit_type/
+    legacy_from_unit/legacy_to_unit, which the model reads them back from.
+    Returns:
+        bool: True if a legacy table was migrated
+    """
+    table = "conversion_history"
+    columns = {column["name"] for column in inspect(engine).get_columns(table)}
+    with engine.begin() as conn:
+        for legacy in LEGACY_COLUMNS.values():
+            if legacy not in columns:
+                conn.execute(text(f"ALTER TABLE {table} ADD COLUMN {legacy} VARCHAR"))
+    if "from_unit" not in columns:
+        return False
+
+    logger.info("Migrating conversion_history unit columns to registry ids...")
+    with engine.begin() as conn:
+        for column in ("unit_type_id", "from_unit_id", "to_unit_id"):
+            if column not in columns:
+                conn.execute(text(f"ALTER TABLE {table} ADD COLUMN {column} SMALLINT"))
+        max_id = conn.scalar(text(f"SELECT max(id) FROM {table}")) or 0
+
+    update = text(
+        f"UPDATE {table} SET "
+        f"unit_type_id = {_name_to_id_case('unit_type', units.UNIT_TYPE_IDS)}, "
+        f"from_unit_id = {_name_to_id_case('from_unit', units.UNIT_IDS)}, "
+        f"to_unit_id = {_name_to_id_case('to_unit', units.UNIT_IDS)}, "
+        f"legacy_unit_type = {_legacy_name_case('unit_type', units.UNIT_TYPE_IDS)}, "
+        f"legacy_from_unit = {_legacy_name_case('from_unit', units.UNIT_IDS)}, "
+        f"legacy_to_unit = {_legacy_name_case('to_unit', units.UNIT_IDS)} "
+        "WHERE id > :start AND id <= :end"
+    )
+    for start in range(0, max_id, MIGRATION_CHUNK_SIZE):
+        with engine.begin() as conn:
+            conn.execute(update, {"start": start, "end": start + MIGRATION_CHUNK_SIZE})
+        logger.info(f"Migrated conversion_history rows up to id {min(start + MIGRATION_CHUNK_SIZE, max_id)}/{max_id}")
+
+    with engine.begin() as conn:
+        # Every original name is an id or a legacy name now; stop before dropping anything otherwise
+        lost = conn.scalar(text(
+            f"SELECT count(*) FROM {table} WHERE "
+            + " OR ".join(
+                f"({name} IS NOT NULL AND {name}_id = {units.UNKNOWN_ID} AND {legacy} IS NULL)"
+                for name, legacy in LEGACY_COLUMNS.items()
+            )
+        ))
+        if lost:
+            raise RuntimeError(f"{lost} conversion_history rows would lose their unit names; not dropping the old columns")
+        unknown = conn.scalar(text(
+            f"SELECT count(*) FROM {table} "
+            f"WHERE unit_type_id = {units.UNKNOWN_ID} OR from_unit_id = {units.UNKNOWN_ID} OR to_unit_id = {units.UNKNOWN_ID}"
+        ))
+        if unknown:
+            logger.warning(
+                f"{unknown} conversion_history rows have units outside the registry "
+                "(stored as id 0, original names kept in the legacy_* columns)"
+            )
+        if engine.dialect.name == "postgresql":
+            for column in ("unit_type_id", "from_unit_id", "to_unit_id"):
+                conn.execute(text(f"ALTER TABLE {table} ALTER COLUMN {column} SET NOT NULL"))
+        for column in ("unit_type", "from_unit", "to_unit"):
+            conn.execute(text(f"ALTER TABLE {table} DROP COLUMN {column}"))
+        conn.execute(text(
+            f"CREATE INDEX IF NOT EXISTS ix_conversion_history_pair ON {table} (unit_type_id, from_unit_id, to_unit_id)"
+        ))
+    logger.info("conversion_history migration complete (run VACUUM on SQLite to reclaim space)")
+    return True
+
+
+def migrate_conversion_history_tenants(engine: Engine) -> bool:
+    """
+    Add tenant_id (existing rows go to the default tenant) and its indexes
+    Returns:
+        bool: True if the column was added
+    """
+    table = "conversion_history"
+    columns = {column["name"] for column in inspect(engine).get_columns(table)}
+    added = "tenant_id" not in columns
+    with engine.begin() as conn:
+        if added:
+            # A constant default: no table rewrite on PostgreSQL 11+ or SQLite
+            conn.execute(text(f"ALTER TABLE {table} ADD COLUMN tenant_id VARCHAR NOT NULL DEFAULT 'default'"))
+            logger.info("Added conversion_history.tenant_id")
+        conn.execute(text(
+            f"CREATE INDEX IF NOT EXISTS ix_conversion_history_tenant_created ON {table} (tenant_id, created_at)"
+        ))
+    return added
+
+
+def partition_conversion_history(engine: Engine) -> bool:
+    """
+    Turn conversion_history into a table LIST-partitioned by tenant_id (PostgreSQL)
+
+    The table is rebuilt in one transaction: rows are copied into the new
+    partitions and the id sequence is kept. The primary key becomes
+    (tenant_id, id), as a partitioned table requires.
+    Returns:
+        bool: True if the table was rebuilt
+    """
+    if engine.dialect.name != "postgresql":
+        return False
+    table = "conversion_history"
+    with engine.connect() as conn:
+        partitioned = conn.scalar(text(
+            "SELECT EXISTS (SELECT 1 FROM pg_partitioned_table p JOIN pg_class c ON c.oid = p.partrelid "
+            f"WHERE c.relname = '{table}')"
+        ))
+    if partitioned:
+        return False
+
+    from app import models, tenants
+
+    logger.info("Partitioning conversion_history by tenant_id...")
+    columns = ", ".join(column.name for column in models.ConversionHistory.__table__.columns)
+    with engine.begin() as conn:
+        conn.execute(text(f"ALTER TABLE {table} RENAME TO {table}_unpartitioned"))
+        conn.execute(text(
+            f"CREATE TABLE {table} (LIKE {table}_unpartitioned INCLUDING DEFAULTS, PRIMARY KEY (tenant_id, id)) "
+            "PARTITION BY LIST (tenant_id)"
+        ))
+        for tenant in tenants.tenant_names():
+            conn.execute(text(
+                f"CREATE TABLE {tenants.partition_name(tenant)} PARTITION OF {table} FOR VALUES IN ('{tenant}')"
+            ))
+        conn.execute(text(f"CREATE TABLE {table}_other PARTITION OF {table} DEFAULT"))
+        conn.execute(text(f"INSERT INTO {table} ({columns}) SELECT {columns} FROM {table}_unpartitioned"))
+        # Keep the id sequence when the old table (its owner) is dropped
+        conn.execute(text(f"ALTER SEQUENCE {table}_id_seq OWNED BY {table}.id"))
+        conn.execute(text(f"DROP TABLE {table}_unpartitioned"))
+        for index in models.ConversionHistory.__table__.indexes:
+            index.create(conn)
+    logger.info("conversion_history is partitioned (triggers are re-created by init_db)")
+    return True
+
+
+def migrate_rollup_watermark_horizon(engine: Engine) -> bool:
+    """
+    Add the safe-horizon columns to rollup_watermarks
+    Returns:
+        bool: True if the columns were added
+    """
+    table = "rollup_watermarks"
+    columns = {column["name"] for column in inspect(engine).get_columns(table)}
+    if "horizon_id" in columns:
+        return False
+    timestamp = "TIMESTAMP WITH TIME ZONE" if engine.dialect.name == "postgresql" else "DATETIME"
+    with engine.begin() as conn:
+        conn.execute(text(f"ALTER TABLE {table} ADD COLUMN horizon_id INTEGER"))
+        conn.execute(text(f"ALTER TABLE {table} ADD COLUMN horizon_at {timestamp}"))
+    logger.info("Added rollup_watermarks.horizon_id/horizon_at")
+    return True
+
+
+def migrate_row_counter_slots(engine: Engine) -> bool:
+    """
+    Rebuild row_counters with the slot column (init_db recounts it)
+    Returns:
+        bool: True if the table was rebuilt
+    """
+    table = "row_counters"
+    columns = {column["name"] for column in inspect(engine).get_columns(table)}
+    if "slot" in columns:
+        return False
+    from app import models
+
+    with engine.begin() as conn:
+        conn.execute(text(f"DROP TABLE {table}"))
+        models.RowCounter.__table__.create(conn)
+    logger.info("Rebuilt row_counters with counter slots")
+    return True
+
+
+def migrate_rollup_tenants(engine: Engine) -> bool:
+    """
+    Rebuild conversion_daily_rollups with tenant_id in its unique key
+
+    Older rollups mixed every tenant's rows. When raw history is kept
+    (ROLLUP_COMPACT_RAW off) they are dropped and the watermark is reset,
+    so the next run refolds the history per tenant; otherwise the raw rows
+    are gone and the old rollups are kept under the default tenant.
+    Returns:
+        bool: True if the table was rebuilt
+    """
+    table = "conversion_daily_rollups"
+    columns = {column["name"] for column in inspect(engine).get_columns(table)}
+    if "tenant_id" in columns:
+        return False
+    from app import models, rollups, tenants
+
+    rollup = models.ConversionDailyRollup
+    with engine.begin() as conn:
+        kept = []
+        if rollups.ROLLUP_COMPACT_RAW:
+            # Small: one row per day and unit pair
+            old_columns = [column for column in rollup.__table__.columns if column.name not in ("id", "tenant_id")]
+            kept = [
+                {**row, "tenant_id": tenants.DEFAULT_TENANT}
+                for row in conn.execute(select(*old_columns)).mappings()
+            ]
+        conn.execute(text(f"DROP TABLE {table}"))
+        rollup.__table__.create(conn)
+        if kept:
+            conn.execute(rollup.__table__.insert(), kept)
+        else:
+            conn.execute(
+                models.RollupWatermark.__table__.update()
+                .where(models.RollupWatermark.name == rollups.WATERMARK_NAME)
+                .values(last_id=0, horizon_id=None, horizon_at=None)
+            )
+    logger.info(f"Rebuilt {table} per tenant ({'kept' if kept else 'refolding'} the existing rollups)")
+    return True
+
+
+def migrate_tombstone_tenants(engine: Engine) -> bool:
+    """
+    Add export_tombstones.tenant_id (the triggers are re-created by init_db)
+    Returns:
+        bool: True if the column was added
+    """
+    table = "export_tombstones"
+    columns = {column["name"] for column in inspect(engine).get_columns(table)}
+    if "tenant_id" in columns:
+        return False
+    with engine.begin() as conn:
+        conn.execute(text(f"ALTER TABLE {table} ADD COLUMN tenant_id VARCHAR"))
+    logger.info("Added export_tombstones.tenant_id")
+    return True
+
+
+def migrate_idempotency_request_hash(engine: Engine) -> bool:
+    """
+    Add idempotency_keys.request_hash (keys stored before it match any body)
+    Returns:
+        bool: True if the column was added
+    """
+    table = "idempotency_keys"
+    columns = {column["name"] for column in inspect(engine).get_columns(table)}
+    if "request_hash" in columns:
+        return False
+    with engine.begin() as conn:
+        conn.execute(text(f"ALTER TABLE {table} ADD COLUMN request_hash VARCHAR(64)"))
+    logger.info("Added idempotency_keys.request_hash")
+    return True
+
+
+def migrate_conversion_history_autoincrement(engine: Engine) -> bool:
+    """
+    Rebuild conversion_history with AUTOINCREMENT (SQLite)
+
+    Without it SQLite reuses the ids of deleted newest rows, and a reused id
+    at or below the rollup watermark would never be folded. The ids carry
+    over, and the sequence starts above both the highest id and the
+    watermark.
+    Returns:
+        bool: True if the table was rebuilt
+    """
+    if engine.dialect.name != "sqlite":
+        return False
+    table = "conversion_history"
+    with engine.connect() as conn:
+        sql = conn.scalar(text("SELECT sql FROM sqlite_master WHERE type = 'table' AND name = :name"), {"name": table})
+    if sql is None or "AUTOINCREMENT" in sql.upper():
+        return False
+
+    from app import models, rollups
+
+    logger.info("Rebuilding conversion_history with AUTOINCREMENT...")
+    columns = ", ".join(column.name for column in models.ConversionHistory.__table__.columns)
+    with engine.begin() as conn:
+        conn.execute(text(f"ALTER TABLE {table} RENAME TO {table}_reused_ids"))
+        # Index names are per database: free them for the new table
+        for (index,) in conn.execute(text(
+            "SELECT name FROM sqlite_master WHERE type = 'index' AND tbl_name = :name AND sql IS NOT NULL"
+        ), {"name": f"{table}_reused_ids"}).all():
+            conn.execute(text(f"DROP INDEX {index}"))
+        models.ConversionHistory.__table__.create(conn)
+        conn.execute(text(f"INSERT INTO {table} ({columns}) SELECT {columns} FROM {table}_reused_ids"))
+        floor = conn.scalar(text(
+            f"SELECT max(coalesce((SELECT max(id) FROM {table}), 0), "
+            "coalesce((SELECT last_id FROM rollup_watermarks WHERE name = :watermark), 0))"
+        ), {"watermark": rollups.WATERMARK_NAME})
+        conn.execute(text("DELETE FROM sqlite_sequence WHERE name = :name"), {"name": table})
+        conn.execute(text("INSERT INTO sqlite_sequence (name, seq) VALUES (:name, :seq)"), {"name": table, "seq": floor})
+        conn.execute(text(f"DROP TABLE {table}_reused_ids"))
+    logger.info("conversion_history rebuilt (triggers are re-created by init_db)")
+    return True
+
+
+def run_migrations(engine: Engine) -> None:
+    """
+    Bring tables created by older versions up to the current schema
+    """
+    migrate_conversion_history_unit_ids(engine)
+    migrate_conversion_history_tenants(engine)
+    partition_conversion_history(engine)
+    migrate_rollup_watermark_horizon(engine)
+    migrate_row_counter_slots(engine)
+    migrate_rollup_tenants(engine)
+    migrate_tombstone_tenants(engine)
+    migrate_idempotency_request_hash(engine)
+    migrate_conversion_history_autoincrement(engine)
@@ -1,6 +1,7 @@
-from sqlalchemy import Column, Integer, String, Boolean, DateTime, Float
+from sqlalchemy import Column, Integer, BigInteger, SmallInteger, String, Boolean, DateTime, Float, Date, UniqueConstraint, Index, JSON, Text
 from sqlalchemy.sql import func
 from app.database import Base
+from app import units
 
 
 class Todo(Base):
@@ -14,7 +15,7 @@ class Todo(Base):
     description = Column(String, nullable=True)
     completed = Column(Boolean, default=False, nullable=False)
     created_at = Column(DateTime(timezone=True), server_default=func.now(), nullable=False)
-    updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now(), nullable=False)
+    updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now(), nullable=False, index=True)
 
     def __repr__(self):
         return f"<Todo(id={self.id}, title='{self.title}', completed={self.completed})>"
@@ -23,17 +24,185 @@ class Todo(Base):
 class ConversionHistory(Base):
     """
     Conversion history model for storing unit conversions
+
+    Units and unit type are stored as small integer ids from app.units;
+    from_unit, to_unit and unit_type expose them as names. Legacy rows whose
+    names were not in the registry keep them in the legacy_* columns. Rows
+    belong to a tenant (app.tenants); on PostgreSQL the table is
+    partitioned by it.
     """
     __tablename__ = "conversion_history"
+    __table_args__ = (
+        Index("ix_conversion_history_pair", "unit_type_id", "from_unit_id", "to_unit_id"),
+        # Tenant-scoped paging
+        Index("ix_conversion_history_tenant_created", "tenant_id", "created_at"),
+        # Never reuse ids: they are the rollup and delta export watermarks
+        {"sqlite_autoincrement": True},
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     value = Column(Float, nullable=False)
-    from_unit = Column(String, nullable=False)
-    to_unit = Column(String, nullable=False)
+    from_unit_id = Column(SmallInteger, nullable=False)
+    to_unit_id = Column(SmallInteger, nullable=False)
     result = Column(Float, nullable=False)
-    unit_type = Column(String, nullable=False)
-    created_at = Column(DateTime(timezone=True), server_default=func.now(), nullable=False)
+    unit_type_id = Column(SmallInteger, nullable=False)
+    created_at = Column(DateTime(timezone=True), server_default=func.now(), nullable=False, index=True)
+    tenant_id = Column(String, nullable=False, server_default="default")
+    # Original names of units outside the registry (id 0), set by the unit id migration
+    legacy_unit_type = Column(String, nullable=True)
+    legacy_from_unit = Column(String, nullable=True)
+    legacy_to_unit = Column(String, nullable=True)
+
+    @property
+    def from_unit(self) -> str:
+        return units.unit_name(self.from_unit_id, self.legacy_from_unit)
+
+    @from_unit.setter
+    def from_unit(self, name: str):
+        self.from_unit_id = units.unit_id(name)
+
+    @property
+    def to_unit(self) -> str:
+        return units.unit_name(self.to_unit_id, self.legacy_to_unit)
+
+    @to_unit.setter
+    def to_unit(self, name: str):
+        self.to_unit_id = units.unit_id(name)
+
+    @property
+    def unit_type(self) -> str:
+        return units.unit_type_name(self.unit_type_id, self.legacy_unit_type)
+
+    @unit_type.setter
+    def unit_type(self, name: str):
+        self.unit_type_id = units.unit_type_id(name)
 
     def __repr__(self):
         return f"<ConversionHistory(id={self.id}, {self.value} {self.from_unit} -> {self.result} {self.to_unit})>"
 
+
+class ConversionDailyRollup(Base):
+    """
+    Per-day summary of one tenant's conversion history for one unit pair
+    """
+    __tablename__ = "conversion_daily_rollups"
+    __table_args__ = (
+        UniqueConstraint("tenant_id", "day", "unit_type", "from_unit", "to_unit", name="uq_conversion_daily_rollup"),
+    )
+
+    id = Column(Integer, primary_key=True, index=True)
+    tenant_id = Column(String, nullable=False, server_default="default")
+    day = Column(Date, nullable=False, index=True)
+    unit_type = Column(String, nullable=False)
+    from_unit = Column(String, nullable=False)
+    to_unit = Column(String, nullable=False)
+    count = Column(Integer, nullable=False, default=0)
+    value_sum = Column(Float, nullable=False, default=0.0)
+    value_min = Column(Float, nullable=False)
+    value_max = Column(Float, nullable=False)
+
+    def __repr__(self):
+        return f"<ConversionDailyRollup({self.day} {self.unit_type} {self.from_unit}->{self.to_unit}, count={self.count})>"
+
+
+class RollupWatermark(Base):
+    """
+    Last raw row id folded into a rollup table, and the newest id seen at
+    horizon_at (folded once every transaction open then has finished)
+    """
+    __tablename__ = "rollup_watermarks"
+
+    name = Column(String, primary_key=True)
+    last_id = Column(Integer, nullable=False, default=0)
+    horizon_id = Column(Integer, nullable=True)
+    horizon_at = Column(DateTime(timezone=True), nullable=True)
+
+
+class IdempotencyKey(Base):
+    """
+    Idempotency-Key of a create request and the resource it created
+    """
+    __tablename__ = "idempotency_keys"
+
+    scope = Column(String, primary_key=True)
+    key = Column(String, primary_key=True)
+    resource_id = Column(Integer, nullable=False)
+    # SHA-256 of the request body; a retry with another body is rejected
+    request_hash = Column(String(64), nullable=True)
+    created_at = Column(DateTime(timezone=True), server_default=func.now(), nullable=False, index=True)
+
+    def __repr__(self):
+        return f"<IdempotencyKey({self.scope}/{self.key} -> {self.resource_id})>"
+
+
+class RowCounter(Base):
+    """
+    One slot of the row count of a table, or of one filter value, maintained
+    by triggers (see app.counters)
+    """
+    __tablename__ = "row_counters"
+
+    name = Column(String, primary_key=True)
+    # A counter's value is the sum of its slots
+    slot = Column(SmallInteger, primary_key=True, default=0)
+    value = Column(BigInteger, nullable=False, default=0)
+
+    def __repr__(self):
+        return f"<RowCounter({self.name}[{self.slot}]={self.value})>"
+
+
+class CacheGeneration(Base):
+    """
+    Write counter of a table; cached list pages are keyed by it (see app.page_cache)
+    """
+    __tablename__ = "cache_generations"
+
+    name = Column(String, primary_key=True)
+    generation = Column(BigInteger, nullable=False, default=0)
+
+    def __repr__(self):
+        return f"<CacheGeneration({self.name}={self.generation})>"
+
+
+class ExportTombstone(Base):
+    """
+    A deleted row, recorded by triggers for delta exports (see app.deltas)
+    """
+    __tablename__ = "export_tombstones"
+    # Never reuse ids: they are the deleted-rows watermark
+    __table_args__ = {"sqlite_autoincrement": True}
+
+    id = Column(Integer, primary_key=True)
+    table_name = Column(String, nullable=False)
+    # NULL when the whole table was truncated
+    row_id = Column(Integer, nullable=True)
+    # Tenant of a deleted conversion history row (NULL for todos, truncates
+    # and rows deleted before tombstones recorded it)
+    tenant_id = Column(String, nullable=True)
+    deleted_at = Column(DateTime(timezone=True), server_default=func.now(), nullable=False, index=True)
+
+    def __repr__(self):
+        return f"<ExportTombstone({self.id}: {self.table_name} {self.row_id})>"
+
+
+class Job(Base):
+    """
+    Status of a background job (see app.jobs), readable from every worker
+    """
+    __tablename__ = "jobs"
+
+    id = Column(String, primary_key=True)
+    kind = Column(String, nullable=False, index=True)
+    status = Column(String, nullable=False, index=True)
+    params = Column(JSON, nullable=False)
+    processed = Column(Integer, nullable=False, default=0)
+    total = Column(Integer, nullable=True)
+    error = Column(Text, nullable=True)
+    result = Column(JSON, nullable=True)
+    created_at = Column(DateTime(timezone=True), nullable=False)
+    # Last status update: a pending/running job without updates is abandoned
+    updated_at = Column(DateTime(timezone=True), nullable=False)
+    finished_at = Column(DateTime(timezone=True), nullable=True)
+
+    def __repr__(self):
+        return f"<Job({self.id}: {self.kind} {self.status})>"
@@ -0,0 +1,98 @@
+import sys
+from array import array
+from contextvars import ContextVar
+from typing import Any, Callable
+import msgpack
+from fastapi import HTTPException, Request, Response
+from fastapi.responses import JSONResponse
+from fastapi.routing import APIRoute
+
+MSGPACK_MEDIA_TYPES = ("application/msgpack", "application/x-msgpack", "application/vnd.msgpack")
+MSGPACK_MEDIA_TYPE = MSGPACK_MEDIA_TYPES[0]
+
+# Whether the current request asked for a msgpack response (Accept header)
+_wants_msgpack: ContextVar[bool] = ContextVar("wants_msgpack", default=False)
+
+
+def _is_msgpack(media_type: str) -> bool:
+    return any(t in media_type for t in MSGPACK_MEDIA_TYPES)
+
+
+def wants_msgpack() -> bool:
+    """
+    True while handling a request that accepts msgpack (e.g. to send packed arrays)
+    """
+    return _wants_msgpack.get()
+
+
+def pack_floats(values) -> bytes:
+    """
+    Pack floats as little-endian float64 (msgpack bin)
+    """
+    packed = array("d", values)
+    if sys.byteorder == "big":
+        packed.byteswap()
+    return packed.tobytes()
+
+
+def unpack_floats(data: bytes) -> list:
+    """
+    Unpack little-endian float64 bytes into a list of floats
+    """
+    if len(data) % 8:
+        raise ValueError("Packed float array length must be a multiple of 8 bytes")
+    values = array("d")
+    values.frombytes(data)
+    if sys.byteorder == "big":
+        values.byteswap()
+    return values.tolist()
+
+
+class NegotiatedResponse(JSONResponse):
+    """
+    JSON by default, msgpack when the request's Accept header asks for it
+    """
+
+    def render(self, content: Any) -> bytes:
+        if wants_msgpack():
+            self.media_type = MSGPACK_MEDIA_TYPE
+            return msgpack.packb(content, use_bin_type=True)
+        return super().render(content)
+
+    def init_headers(self, headers=None) -> None:
+        super().init_headers(headers)
+        self.raw_headers.append((b"vary", b"Accept"))
+
+
+class MsgPackRoute(APIRoute):
+    """
+    Route that also accepts msgpack request bodies (Content-Type: application/msgpack)
+
+    The body is decoded with msgpack and handed to FastAPI's normal JSON body
+    validation, so endpoints and models stay the same for both formats.
+    """
+
+    def get_route_handler(self) -> Callable:
+        handler = super().get_route_handler()
+
+        async def negotiating_handler(request: Request) -> Response:
+            if _is_msgpack(request.headers.get("content-type", "")):
+                body = await request.body()
+                scope = dict(request.scope)
+                scope["headers"] = [
+                    (name, value) for name, value in request.scope["headers"] if name != b"content-type"
+                ] + [(b"content-type", b"application/json")]
+                request = Request(scope, request.receive)
+                request._body = body
+                if body:
+                    try:
+                        request._json = msgpack.unpackb(body, raw=False)
+                    except (ValueError, msgpack.UnpackException):
+                        raise HTTPException(status_code=400, detail="Invalid msgpack body")
+            token = _wants_msgpack.set(_is_msgpack(request.headers.get("accept", "")))
+            try:
+                return await handler(request)
+            finally:
+                _wants_msgpack.reset(token)
+
+        return negotiating_handler
@@ -0,0 +1,153 @@
+"""
+Write-invalidated cache of serialized list pages
+
+Every write to a table bumps its generation counter (crud, imports,
+retention and rollup compaction call bump() after committing). Pages are
+cached under (table, generation, request key), so a write makes all older
+pages unreachable and they age out of the LRU.
+
+The counters are rows of cache_generations in the database, so a write on
+any worker or host invalidates the pages cached everywhere. Each worker
+keeps the counters it read for PAGE_CACHE_GENERATION_TTL seconds, so a
+cache hit issues no query at all: a write through this worker drops its
+copy at once, a write through another worker is seen once the copy
+expires. Pages are only cached from primary reads; a replica may lag
+behind the generation.
+"""
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Callable, Hashable, Optional, Tuple
+from fastapi import Response
+from sqlalchemy import select, update
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.orm import Session
+from app.database import engine
+from app import metrics, models
+
+logger = logging.getLogger(__name__)
+
+# Cached pages per worker (0 disables the cache)
+PAGE_CACHE_SIZE = int(os.getenv("PAGE_CACHE_SIZE", "1000"))
+# Seconds a worker reuses a generation it read (how long a write through
+# another worker may go unseen; 0 reads it on every request)
+PAGE_CACHE_GENERATION_TTL = float(os.getenv("PAGE_CACHE_GENERATION_TTL", "1"))
+
+TODOS = "todos"
+HISTORY = "conversion_history"
+
+CACHE_HEADER = "X-Cache"
+
+
+class _PageLRU:
+    """
+    Bounded, thread-safe LRU of cache key -> (body, headers, media type)
+    """
+
+    def __init__(self, max_size: int):
+        self.max_size = max_size
+        self._items: OrderedDict = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: tuple) -> Optional[tuple]:
+        with self._lock:
+            page = self._items.get(key)
+            if page is not None:
+                self._items.move_to_end(key)
+            return page
+
+    def put(self, key: tuple, page: tuple) -> None:
+        with self._lock:
+            self._items[key] = page
+            self._items.move_to_end(key)
+            while len(self._items) > self.max_size:
+                self._items.popitem(last=False)
+
+    def __len__(self) -> int:
+        return len(self._items)
+
+
+_pages = _PageLRU(PAGE_CACHE_SIZE)
+
+# table -> (generation, monotonic expiry) read by this worker
+_generations: dict = {}
+# table -> local bumps, so a read racing a local bump does not keep the old value
+_bumps: dict = {}
+_generations_lock = threading.Lock()
+
+metrics.register_gauge("page_cache", lambda: {"pages": len(_pages)})
+
+
+def generation(db: Session, table: str) -> int:
+    """
+    Get the write counter of a table
+
+    Served from this worker's copy while it is fresh; only primary reads
+    refresh the copy.
+    """
+    with _generations_lock:
+        cached = _generations.get(table)
+        if cached is not None and cached[1] > time.monotonic():
+            return cached[0]
+        bumps = _bumps.get(table, 0)
+    counter = models.CacheGeneration
+    value = db.scalar(select(counter.generation).where(counter.name == table)) or 0
+    if PAGE_CACHE_GENERATION_TTL > 0 and db.info.get("replica") is None:
+        with _generations_lock:
+            if _bumps.get(table, 0) == bumps:
+                _generations[table] = (value, time.monotonic() + PAGE_CACHE_GENERATION_TTL)
+    return value
+
+
+def bump(table: str) -> None:
+    """
+    Invalidate the cached pages of a table (call after committing a write)
+    """
+    if PAGE_CACHE_SIZE <= 0:
+        return
+    counter = models.CacheGeneration
+    with engine.begin() as conn:
+        bumped = conn.execute(
+            update(counter).where(counter.name == table).values(generation=counter.generation + 1)
+        ).rowcount
+        if not bumped:
+            # First write to the table; a concurrent first write also counts
+            insert = pg_insert if engine.dialect.name == "postgresql" else sqlite_insert
+            conn.execute(
+                insert(counter).values(name=table, generation=1)
+                .on_conflict_do_update(index_elements=["name"], set_={"generation": counter.generation + 1})
+            )
+    with _generations_lock:
+        _generations.pop(table, None)
+        _bumps[table] = _bumps.get(table, 0) + 1
+
+
+def cached_page(db: Session, table: str, key: Tuple[Hashable, ...], build: Callable[[], Response]) -> Response:
+    """
+    Serve a list page from the cache, or build it and cache the rendered body
+
+    key identifies the page (filters, page number, response format).
+    """
+    if PAGE_CACHE_SIZE <= 0:
+        return build()
+    # Read the generation before the query: a write committing meanwhile
+    # bumps it, so the page can never outlive a newer write
+    cache_key = (table, generation(db, table)) + key
+    page = _pages.get(cache_key)
+    if page is not None:
+        metrics.increment("page_cache_hits", table=table)
+        body, headers, media_type = page
+        response = Response(content=body, headers=headers, media_type=media_type)
+        response.headers[CACHE_HEADER] = "HIT"
+        return response
+
+    metrics.increment("page_cache_misses", table=table)
+    response = build()
+    if db.info.get("replica") is None and response.status_code == 200:
+        headers = {name: value for name, value in response.headers.items() if name != "content-length"}
+        _pages.put(cache_key, (response.body, headers, response.media_type))
+    response.headers[CACHE_HEADER] = "MISS"
+    return response
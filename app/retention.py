@@ -0,0 +1,125 @@
+import os
+import time
+import logging
+from datetime import datetime, timedelta, timezone
+from functools import partial
+from typing import List, Optional
+from sqlalchemy import select, delete, func
+from app.database import SessionLocal
+from app import models, jobs, events, page_cache, counters, rollups
+
+logger = logging.getLogger(__name__)
+
+# TTL policy for conversion history (0 disables automatic cleanup)
+HISTORY_TTL_DAYS = float(os.getenv("HISTORY_TTL_DAYS", "0"))
+RETENTION_INTERVAL_SECONDS = float(os.getenv("RETENTION_INTERVAL_SECONDS", "3600"))
+# Rows deleted per transaction and pause between chunks, to keep locks and WAL small
+RETENTION_CHUNK_SIZE = int(os.getenv("RETENTION_CHUNK_SIZE", "5000"))
+RETENTION_CHUNK_PAUSE = float(os.getenv("RETENTION_CHUNK_PAUSE", "0.05"))
+# Clearing more rows than this runs as a chunked background job instead of one DELETE
+HISTORY_CLEAR_SYNC_MAX_ROWS = int(os.getenv("HISTORY_CLEAR_SYNC_MAX_ROWS", "10000"))
+
+
+def _history_tenants(db) -> List[str]:
+    # Tenants with history rows: from the row counters, else a DISTINCT scan
+    prefix = counters.history_tenant("")
+    values = counters.totals(db)
+    if counters.HISTORY in values:
+        return sorted(name[len(prefix):] for name, value in values.items() if name.startswith(prefix) and value > 0)
+    return list(db.scalars(select(models.ConversionHistory.tenant_id).distinct()))
+
+
+def delete_history_older_than(
+    job_id: str,
+    cutoff: datetime,
+    tenant_id: Optional[str] = None,
+    unfold: bool = False,
+    chunk_size: int = RETENTION_CHUNK_SIZE
+) -> int:
+    """
+    Delete conversion history created before `cutoff` (of one tenant, if
+    given, else tenant by tenant) in small committed chunks
+
+    With unfold, deleted rows are also taken out of the daily rollups (API
+    deletes); the TTL policy keeps them counted there.
+    Returns:
+        int: Number of deleted records
+    """
+    history = models.ConversionHistory
+    with SessionLocal() as db:
+        tenant_ids = [tenant_id] if tenant_id is not None else _history_tenants(db)
+        total = db.scalar(
+            select(func.count()).select_from(history)
+            .where(history.created_at < cutoff, history.tenant_id.in_(tenant_ids))
+        )
+    jobs.update_job(job_id, total=total)
+
+    deleted = 0
+    for tenant in tenant_ids:
+        # Both the chunk query and the DELETE name the tenant, so on PostgreSQL
+        # they touch only its partition
+        chunk_ids = (
+            select(history.id)
+            .where(history.tenant_id == tenant, history.created_at < cutoff)
+            .order_by(history.id)
+            .limit(chunk_size)
+            .scalar_subquery()
+        )
+        while True:
+            with SessionLocal() as db:
+                watermark = rollups.lock_watermark(db) if unfold else None
+                rows = db.execute(
+                    delete(history)
+                    .where(history.tenant_id == tenant, history.id.in_(chunk_ids))
+                    .returning(*rollups.UNFOLD_COLUMNS)
+                    .execution_options(synchronize_session=False)
+                ).all()
+                if unfold:
+                    rollups.unfold(db, rows, watermark)
+                db.commit()
+            ids = [row.id for row in rows]
+            if not ids:
+                break
+            page_cache.bump(page_cache.HISTORY)
+            events.publish(events.TOPIC_HISTORY, "history.deleted", {"ids": ids, "tenant_id": tenant})
+            deleted += len(ids)
+            jobs.update_job(job_id, processed=deleted)
+            time.sleep(RETENTION_CHUNK_PAUSE)
+
+    logger.info(f"Retention job {job_id} deleted {deleted} conversion history records older than {cutoff}")
+    return deleted
+
+
+def start_history_cleanup(older_than_days: float, tenant_id: Optional[str] = None) -> dict:
+    """
+    Start a background job deleting conversion history older than N days
+    (of one tenant, if given); 0 days deletes everything created so far.
+    The deleted rows are taken out of the daily rollups.
+    """
+    cutoff = datetime.now(timezone.utc) - timedelta(days=older_than_days)
+    job = jobs.create_job("history_retention", {
+        "older_than_days": older_than_days, "cutoff": cutoff.isoformat(), "tenant_id": tenant_id
+    })
+    jobs.run_in_background(job["id"], partial(delete_history_older_than, unfold=True), cutoff, tenant_id)
+    return job
+
+
+def apply_retention_policies() -> None:
+    """
+    Scheduled task: apply the configured conversion history TTL
+    """
+    if HISTORY_TTL_DAYS <= 0:
+        return
+    if jobs.list_jobs("history_retention", active=True):
+        logger.info("Skipping retention run: previous job still running")
+        return
+
+    cutoff = datetime.now(timezone.utc) - timedelta(days=HISTORY_TTL_DAYS)
+    job = jobs.create_job("history_retention", {"older_than_days": HISTORY_TTL_DAYS, "cutoff": cutoff.isoformat()})
+    jobs.update_job(job["id"], status="running")
+    try:
+        delete_history_older_than(job["id"], cutoff)
+        jobs.finish_job(job["id"])
+    except Exception as e:
+        jobs.finish_job(job["id"], error=str(e))
+        raise
@@ -0,0 +1,340 @@
+"""
+Per-tenant daily rollups of the conversion history
+
+run_rollup folds raw rows past the watermark into one row per tenant, day
+and unit pair. Rows deleted through the API after they were folded are
+taken out again (unfold), and clearing a tenant's history drops its
+rollups; rows removed by the TTL retention policy or by compaction stay
+counted, as the rollups are meant to outlive the raw rows.
+"""
+import os
+import logging
+from datetime import date, datetime, timedelta, timezone
+from typing import List, Optional
+from sqlalchemy import select, delete, update, func, case
+from sqlalchemy.orm import Session
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from app.database import SessionLocal
+from app import models, units, events, page_cache
+
+logger = logging.getLogger(__name__)
+
+ROLLUP_INTERVAL_SECONDS = float(os.getenv("ROLLUP_INTERVAL_SECONDS", "300"))
+# Maximum raw rows folded per transaction
+ROLLUP_BATCH_SIZE = int(os.getenv("ROLLUP_BATCH_SIZE", "50000"))
+# Delete raw rows once they are folded into the rollups
+ROLLUP_COMPACT_RAW = os.getenv("ROLLUP_COMPACT_RAW", "false").lower() in ("1", "true", "yes")
+# PostgreSQL: longest a transaction writing conversion history may stay open.
+# Ids are assigned before commit, so rows are folded only up to the newest
+# id seen at least this long ago (a lower id can't still be uncommitted)
+ROLLUP_SAFETY_LAG_SECONDS = float(os.getenv("ROLLUP_SAFETY_LAG_SECONDS", "60"))
+
+WATERMARK_NAME = "conversion_daily_rollups"
+
+_history = models.ConversionHistory
+# Unit ids plus the legacy names of unregistered units
+LEGACY_GROUP = (
+    _history.unit_type_id,
+    _history.from_unit_id,
+    _history.to_unit_id,
+    _history.legacy_unit_type,
+    _history.legacy_from_unit,
+    _history.legacy_to_unit,
+)
+# What a DELETE ... RETURNING of conversion history returns for unfold()
+UNFOLD_COLUMNS = (
+    _history.id, _history.tenant_id, func.date(_history.created_at).label("day"), *LEGACY_GROUP, _history.value
+)
+
+
+def get_watermark(db: Session) -> int:
+    """
+    Get the last conversion history id already folded into the rollups
+    """
+    watermark = db.get(models.RollupWatermark, WATERMARK_NAME)
+    return watermark.last_id if watermark else 0
+
+
+def lock_watermark(db: Session) -> int:
+    """
+    Get the rollup watermark, share-locked until the transaction ends
+
+    A rollup run holds the row locked while it folds, so a delete that takes
+    this lock before deleting either runs before the rollup reads its rows
+    or sees the watermark the rollup moved.
+    """
+    watermark = models.RollupWatermark
+    return db.scalar(
+        select(watermark.last_id).where(watermark.name == WATERMARK_NAME).with_for_update(read=True)
+    ) or 0
+
+
+def _day(value) -> date:
+    # func.date() returns text on SQLite
+    return date.fromisoformat(value) if isinstance(value, str) else value
+
+
+def _pair(row) -> tuple:
+    # Legacy rows keep their original names instead of "unknown"
+    return (
+        units.unit_type_name(row.unit_type_id, row.legacy_unit_type),
+        units.unit_name(row.from_unit_id, row.legacy_from_unit),
+        units.unit_name(row.to_unit_id, row.legacy_to_unit),
+    )
+
+
+def unfold(db: Session, rows: list, watermark: int) -> None:
+    """
+    Take deleted history rows (UNFOLD_COLUMNS) that were already folded out
+    of the rollups, in the caller's transaction
+
+    count and value_sum are exact; value_min/value_max stay bounds of the
+    values folded so far. A rollup left with no rows is deleted.
+    """
+    groups = {}
+    for row in rows:
+        if row.id > watermark:
+            continue
+        key = (row.tenant_id, _day(row.day)) + _pair(row)
+        count, value_sum = groups.get(key, (0, 0.0))
+        groups[key] = (count + 1, value_sum + row.value)
+
+    rollup = models.ConversionDailyRollup
+    for (tenant_id, day, unit_type, from_unit, to_unit), (count, value_sum) in groups.items():
+        match = (
+            rollup.tenant_id == tenant_id, rollup.day == day, rollup.unit_type == unit_type,
+            rollup.from_unit == from_unit, rollup.to_unit == to_unit,
+        )
+        remaining = db.scalar(
+            update(rollup).where(*match)
+            .values(count=rollup.count - count, value_sum=rollup.value_sum - value_sum)
+            .returning(rollup.count)
+            .execution_options(synchronize_session=False)
+        )
+        if remaining is not None and remaining <= 0:
+            db.execute(delete(rollup).where(*match).execution_options(synchronize_session=False))
+
+
+def drop_tenant(db: Session, tenant_id: str) -> int:
+    """
+    Delete all rollups of a tenant (its history was cleared), in the caller's transaction
+    Returns:
+        int: Number of rollup rows deleted
+    """
+    rollup = models.ConversionDailyRollup
+    return db.execute(
+        delete(rollup).where(rollup.tenant_id == tenant_id).execution_options(synchronize_session=False)
+    ).rowcount
+
+
+def _upsert_rollups(db: Session, rows: List[dict]) -> None:
+    rollup = models.ConversionDailyRollup
+    insert = pg_insert if db.get_bind().dialect.name == "postgresql" else sqlite_insert
+    stmt = insert(rollup).values(rows)
+    excluded = stmt.excluded
+    stmt = stmt.on_conflict_do_update(
+        index_elements=["tenant_id", "day", "unit_type", "from_unit", "to_unit"],
+        set_={
+            "count": rollup.count + excluded.count,
+            "value_sum": rollup.value_sum + excluded.value_sum,
+            "value_min": case((excluded.value_min < rollup.value_min, excluded.value_min), else_=rollup.value_min),
+            "value_max": case((excluded.value_max > rollup.value_max, excluded.value_max), else_=rollup.value_max),
+        },
+    )
+    db.execute(stmt)
+
+
+def _safe_horizon(db: Session, watermark: models.RollupWatermark) -> int:
+    """
+    Highest history id that can be folded without skipping a row still being committed
+    """
+    newest = db.scalar(select(func.max(models.ConversionHistory.id))) or 0
+    if db.get_bind().dialect.name != "postgresql":
+        # SQLite has a single writer: a visible id means every lower id is committed
+        return newest
+    now = datetime.now(timezone.utc)
+    horizon_at = watermark.horizon_at
+    if horizon_at is not None and horizon_at.tzinfo is None:
+        horizon_at = horizon_at.replace(tzinfo=timezone.utc)
+    if horizon_at is None or watermark.last_id >= (watermark.horizon_id or 0):
+        # Nothing recorded, or the recorded horizon is folded: record the current one
+        if horizon_at is None or watermark.horizon_id != newest:
+            watermark.horizon_id, watermark.horizon_at = newest, now
+        return watermark.last_id
+    if now - horizon_at < timedelta(seconds=ROLLUP_SAFETY_LAG_SECONDS):
+        return watermark.last_id
+    return watermark.horizon_id
+
+
+def run_rollup(db: Session, batch_size: int = ROLLUP_BATCH_SIZE, compact: bool = ROLLUP_COMPACT_RAW) -> int:
+    """
+    Fold conversion history rows newer than the watermark into per-tenant daily rollups
+    Returns:
+        int: Number of raw rows folded
+    """
+    history = models.ConversionHistory
+    # Held until commit: deletes of folded rows wait for it (see lock_watermark)
+    watermark = db.get(models.RollupWatermark, WATERMARK_NAME, with_for_update=True)
+    if watermark is None:
+        watermark = models.RollupWatermark(name=WATERMARK_NAME, last_id=0)
+        db.add(watermark)
+    last_id = watermark.last_id
+    safe_id = _safe_horizon(db, watermark)
+
+    batch_ids = (
+        select(history.id)
+        .where(history.id > last_id, history.id <= safe_id)
+        .order_by(history.id)
+        .limit(batch_size)
+        .subquery()
+    )
+    upper_id, folded = db.execute(select(func.max(batch_ids.c.id), func.count(batch_ids.c.id))).one()
+    if upper_id is None:
+        db.commit()  # keeps a newly recorded horizon
+        return 0
+
+    day = func.date(history.created_at)
+    groups = db.execute(
+        select(
+            history.tenant_id,
+            day.label("day"),
+            *LEGACY_GROUP,
+            func.count().label("count"),
+            func.sum(history.value).label("value_sum"),
+            func.min(history.value).label("value_min"),
+            func.max(history.value).label("value_max"),
+        )
+        .where(history.id > last_id, history.id <= upper_id)
+        .group_by(history.tenant_id, day, *LEGACY_GROUP)
+    ).all()
+
+    rows = {}
+    for group in groups:
+        key = (group.tenant_id, _day(group.day)) + _pair(group)
+        if key in rows:
+            # Two id/legacy combinations with the same names: one upserted row
+            row = rows[key]
+            row["count"] += group.count
+            row["value_sum"] += group.value_sum
+            row["value_min"] = min(row["value_min"], group.value_min)
+            row["value_max"] = max(row["value_max"], group.value_max)
+            continue
+        rows[key] = {
+            "tenant_id": group.tenant_id,
+            "day": key[1],
+            "unit_type": key[2],
+            "from_unit": key[3],
+            "to_unit": key[4],
+            "count": group.count,
+            "value_sum": group.value_sum,
+            "value_min": group.value_min,
+            "value_max": group.value_max,
+        }
+    _upsert_rollups(db, list(rows.values()))
+
+    watermark.last_id = upper_id
+    if compact:
+        # Exactly the rows just aggregated
+        db.execute(
+            delete(history)
+            .where(history.id > last_id, history.id <= upper_id)
+            .execution_options(synchronize_session=False)
+        )
+    db.commit()
+    if compact:
+        page_cache.bump(page_cache.HISTORY)
+        events.publish(events.TOPIC_HISTORY, "history.compacted", {"up_to_id": upper_id})
+    logger.info(f"Rolled up {folded} conversion history rows (watermark {last_id} -> {upper_id})")
+    return folded
+
+
+def run_scheduled_rollup() -> None:
+    """
+    Scheduled task: fold all pending conversion history rows
+    """
+    with SessionLocal() as db:
+        while run_rollup(db) >= ROLLUP_BATCH_SIZE:
+            pass
+
+
+def get_conversion_stats(
+    db: Session,
+    tenant_id: str,
+    unit_type: Optional[str] = None,
+    start_day: Optional[date] = None,
+    end_day: Optional[date] = None
+) -> List[dict]:
+    """
+    Aggregate a tenant's conversion statistics per unit pair
+
+    Reads the daily rollups and adds the raw rows newer than the watermark,
+    so results are exact without scanning the full history table.
+    """
+    rollup = models.ConversionDailyRollup
+    history = models.ConversionHistory
+    watermark = get_watermark(db)
+
+    rollup_query = select(
+        rollup.unit_type,
+        rollup.from_unit,
+        rollup.to_unit,
+        func.sum(rollup.count),
+        func.sum(rollup.value_sum),
+        func.min(rollup.value_min),
+        func.max(rollup.value_max),
+    ).where(rollup.tenant_id == tenant_id).group_by(rollup.unit_type, rollup.from_unit, rollup.to_unit)
+    raw_query = select(
+        *LEGACY_GROUP,
+        func.count(),
+        func.sum(history.value),
+        func.min(history.value),
+        func.max(history.value),
+    ).where(history.tenant_id == tenant_id, history.id > watermark).group_by(*LEGACY_GROUP)
+
+    if unit_type is not None:
+        rollup_query = rollup_query.where(rollup.unit_type == unit_type)
+        raw_query = raw_query.where(history.unit_type_id == units.unit_type_id(unit_type))
+    if start_day is not None:
+        rollup_query = rollup_query.where(rollup.day >= start_day)
+        raw_query = raw_query.where(func.date(history.created_at) >= start_day.isoformat())
+    if end_day is not None:
+        rollup_query = rollup_query.where(rollup.day <= end_day)
+        raw_query = raw_query.where(func.date(history.created_at) <= end_day.isoformat())
+
+    raw_rows = [_pair(row) + tuple(row[6:]) for row in db.execute(raw_query)]
+
+    stats = {}
+    for row in list(db.execute(rollup_query)) + raw_rows:
+        key = (row[0], row[1], row[2])
+        count, value_sum, value_min, value_max = row[3], row[4], row[5], row[6]
+        if key not in stats:
+            stats[key] = {
+                "unit_type": key[0],
+                "from_unit": key[1],
+                "to_unit": key[2],
+                "count": 0,
+                "value_sum": 0.0,
+                "value_min": value_min,
+                "value_max": value_max,
+            }
+        entry = stats[key]
+        entry["count"] += count
+        entry["value_sum"] += value_sum
+        entry["value_min"] = min(entry["value_min"], value_min)
+        entry["value_max"] = max(entry["value_max"], value_max)
+
+    result = sorted(stats.values(), key=lambda s: s["count"], reverse=True)
+    for entry in result:
+        entry["value_avg"] = entry["value_sum"] / entry["count"] if entry["count"] else 0.0
+    return result
+
+
+def get_all_rollups(db: Session, tenant_id: str) -> List[models.ConversionDailyRollup]:
+    """
+    Get all daily rollup rows of a tenant, newest day first
+    """
+    rollup = models.ConversionDailyRollup
+    return list(db.scalars(
+        select(rollup).where(rollup.tenant_id == tenant_id).order_by(rollup.day.desc(), rollup.unit_type, rollup.from_unit, rollup.to_unit)
+    ))
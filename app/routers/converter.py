@@ -1,13 +1,31 @@
-from fastapi import APIRouter, Query, HTTPException, Depends
+from fastapi import APIRouter, Query, HTTPException, Depends, Request, Response, Header
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
 from sqlalchemy.orm import Session
 from pydantic import BaseModel, Field, field_validator, ValidationError, ValidationInfo
-from typing import Literal, List
+from typing import Literal, List, Optional
+from datetime import date
 from enum import Enum
 from app.database import get_db
-from app import crud, schemas
+from app.dependencies import get_read_db
+from app import crud, schemas, retention, rollups, idempotency, negotiation, singleflight, page_cache, tenants, metrics, executors
+from app.engine import ConversionError, convert, convert_many, validate_unit_pair
+from app.engine.factors import (
+    LENGTH_TO_METER, LENGTH_FROM_METER, WEIGHT_TO_KILOGRAM, WEIGHT_FROM_KILOGRAM,
+    TEMPERATURE_TO_CELSIUS, TEMPERATURE_FROM_CELSIUS, ABSOLUTE_ZERO_TOLERANCE, MAX_ABS_VALUE, RESULT_DECIMALS
+)
 from math import ceil, isnan, isinf
+import hashlib
+import json
+import os
 
-router = APIRouter(prefix="/converter", tags=["converter"])
+# Every endpoint also speaks msgpack (Content-Type / Accept: application/msgpack)
+router = APIRouter(
+    prefix="/converter",
+    tags=["converter"],
+    route_class=negotiation.MsgPackRoute,
+    default_response_class=negotiation.NegotiatedResponse
+)
 
 
 # Unit types
@@ -36,10 +54,9 @@ class TemperatureUnit(str, Enum):
     KELVIN = "kelvin"
 
 
-# Valid unit sets
-VALID_LENGTH_UNITS = {"meter", "kilometer", "centimeter", "millimeter", "mile", "foot", "inch", "yard"}
-VALID_WEIGHT_UNITS = {"kilogram", "gram", "pound", "ounce", "ton"}
-VALID_TEMPERATURE_UNITS = {"celsius", "fahrenheit", "kelvin"}
+# Conversion factors and functions live in app.engine (no web/DB imports)
+MAX_BATCH_SIZE = int(os.getenv("MAX_BATCH_SIZE", "100000"))
+
 
 # Request/Response models
 class ConvertRequest(BaseModel):
@@ -57,7 +74,7 @@ class ConvertRequest(BaseModel):
         if isinf(v):
             raise ValueError("Value cannot be Infinity")
         # Check for extremely large values that might cause overflow
-        if abs(v) > 1e15:
+        if abs(v) > MAX_ABS_VALUE:
             raise ValueError(f"Value {v} is too large. Maximum allowed value is 1e15")
         return v
     
@@ -71,35 +88,7 @@ class ConvertRequest(BaseModel):
     
     def model_post_init(self, __context):
         """Validate units match the unit_type"""
-        from_unit_lower = self.from_unit.lower()
-        to_unit_lower = self.to_unit.lower()
-        
-        if self.unit_type == "length":
-            valid_units = VALID_LENGTH_UNITS
-            unit_type_name = "length"
-        elif self.unit_type == "weight":
-            valid_units = VALID_WEIGHT_UNITS
-            unit_type_name = "weight"
-        elif self.unit_type == "temperature":
-            valid_units = VALID_TEMPERATURE_UNITS
-            unit_type_name = "temperature"
-        else:
-            raise ValueError(f"Invalid unit_type: {self.unit_type}")
-        
-        if from_unit_lower not in valid_units:
-            raise ValueError(
-                f"Invalid source unit '{self.from_unit}' for {unit_type_name}. "
-                f"Valid units: {', '.join(sorted(valid_units))}"
-            )
-        
-        if to_unit_lower not in valid_units:
-            raise ValueError(
-                f"Invalid target unit '{self.to_unit}' for {unit_type_name}. "
-                f"Valid units: {', '.join(sorted(valid_units))}"
-            )
-        
-        if from_unit_lower == to_unit_lower:
-            raise ValueError(f"Source and target units cannot be the same: {self.from_unit}")
+        validate_unit_pair(self.unit_type, self.from_unit, self.to_unit)
 
 
 class ConvertResponse(BaseModel):
@@ -110,156 +99,37 @@ class ConvertResponse(BaseModel):
     unit_type: str
 
 
-# Conversion functions
-def convert_length(value: float, from_unit: str, to_unit: str) -> float:
-    """Convert length units with validation"""
-    from_unit_lower = from_unit.lower()
-    to_unit_lower = to_unit.lower()
-    
-    # Validate units
-    if from_unit_lower not in VALID_LENGTH_UNITS:
-        raise ValueError(f"Invalid source unit for length: '{from_unit}'. Valid units: {', '.join(sorted(VALID_LENGTH_UNITS))}")
-    if to_unit_lower not in VALID_LENGTH_UNITS:
-        raise ValueError(f"Invalid target unit for length: '{to_unit}'. Valid units: {', '.join(sorted(VALID_LENGTH_UNITS))}")
-    
-    # Convert to meters first
-    to_meter = {
-        "meter": 1.0,
-        "kilometer": 1000.0,
-        "centimeter": 0.01,
-        "millimeter": 0.001,
-        "mile": 1609.34,
-        "foot": 0.3048,
-        "inch": 0.0254,
-        "yard": 0.9144
-    }
-    
-    # Convert from source unit to meters
-    conversion_factor = to_meter[from_unit_lower]
-    value_in_meters = value * conversion_factor
-    
-    # Check for overflow
-    if isinf(value_in_meters) or isnan(value_in_meters):
-        raise ValueError(f"Calculation overflow: {value} {from_unit} results in invalid value")
-    
-    # Convert from meters to target unit
-    from_meter = {
-        "meter": 1.0,
-        "kilometer": 0.001,
-        "centimeter": 100.0,
-        "millimeter": 1000.0,
-        "mile": 0.000621371,
-        "foot": 3.28084,
-        "inch": 39.3701,
-        "yard": 1.09361
-    }
-    
-    result = value_in_meters * from_meter[to_unit_lower]
-    
-    # Validate result
-    if isinf(result) or isnan(result):
-        raise ValueError(f"Calculation result is invalid: {result}")
-    
-    return result
-
-
-def convert_weight(value: float, from_unit: str, to_unit: str) -> float:
-    """Convert weight units with validation"""
-    from_unit_lower = from_unit.lower()
-    to_unit_lower = to_unit.lower()
-    
-    # Validate units
-    if from_unit_lower not in VALID_WEIGHT_UNITS:
-        raise ValueError(f"Invalid source unit for weight: '{from_unit}'. Valid units: {', '.join(sorted(VALID_WEIGHT_UNITS))}")
-    if to_unit_lower not in VALID_WEIGHT_UNITS:
-        raise ValueError(f"Invalid target unit for weight: '{to_unit}'. Valid units: {', '.join(sorted(VALID_WEIGHT_UNITS))}")
-    
-    # Convert to kilograms first
-    to_kilogram = {
-        "kilogram": 1.0,
-        "gram": 0.001,
-        "pound": 0.453592,
-        "ounce": 0.0283495,
-        "ton": 1000.0
-    }
-    
-    # Convert from source unit to kilograms
-    conversion_factor = to_kilogram[from_unit_lower]
-    value_in_kg = value * conversion_factor
-    
-    # Check for overflow
-    if isinf(value_in_kg) or isnan(value_in_kg):
-        raise ValueError(f"Calculation overflow: {value} {from_unit} results in invalid value")
-    
-    # Convert from kilograms to target unit
-    from_kilogram = {
-        "kilogram": 1.0,
-        "gram": 1000.0,
-        "pound": 2.20462,
-        "ounce": 35.274,
-        "ton": 0.001
-    }
-    
-    result = value_in_kg * from_kilogram[to_unit_lower]
-    
-    # Validate result
-    if isinf(result) or isnan(result):
-        raise ValueError(f"Calculation result is invalid: {result}")
+class BatchConvertRequest(BaseModel):
+    values: List[float] = Field(
+        ..., description="Values to convert; msgpack clients may send packed little-endian float64 bytes"
+    )
+    from_unit: str = Field(..., description="Source unit")
+    to_unit: str = Field(..., description="Target unit")
+    unit_type: Literal["length", "weight", "temperature"] = Field(..., description="Type of unit conversion")
     
-    return result
-
-
-def convert_temperature(value: float, from_unit: str, to_unit: str) -> float:
-    """Convert temperature units with validation"""
-    from_unit_lower = from_unit.lower()
-    to_unit_lower = to_unit.lower()
+    @field_validator('values', mode='before')
+    @classmethod
+    def unpack_values(cls, v):
+        """Accept packed float64 arrays (msgpack bin) as well as lists"""
+        if isinstance(v, (bytes, bytearray)):
+            v = negotiation.unpack_floats(v)
+        if isinstance(v, list) and len(v) > MAX_BATCH_SIZE:
+            raise ValueError(f"Too many values: {len(v)}. Maximum batch size is {MAX_BATCH_SIZE}")
+        return v
     
-    # Validate units
-    if from_unit_lower not in VALID_TEMPERATURE_UNITS:
-        raise ValueError(f"Invalid source unit for temperature: '{from_unit}'. Valid units: {', '.join(sorted(VALID_TEMPERATURE_UNITS))}")
-    if to_unit_lower not in VALID_TEMPERATURE_UNITS:
-        raise ValueError(f"Invalid target unit for temperature: '{to_unit}'. Valid units: {', '.join(sorted(VALID_TEMPERATURE_UNITS))}")
+    @field_validator('from_unit', 'to_unit')
+    @classmethod
+    def validate_unit(cls, v: str) -> str:
+        """Normalize unit names"""
+        return v.strip().lower()
     
-    # Convert to Celsius first
-    try:
-        if from_unit_lower == "fahrenheit":
-            celsius = (value - 32) * 5 / 9
-        elif from_unit_lower == "kelvin":
-            # Absolute zero check for Kelvin
-            if value < 0:
-                raise ValueError(f"Invalid temperature: Kelvin cannot be negative. Received: {value} K")
-            celsius = value - 273.15
-        else:  # celsius
-            celsius = value
-        
-        # Validate intermediate result
-        if isinf(celsius) or isnan(celsius):
-            raise ValueError(f"Calculation error: {value} {from_unit} results in invalid Celsius value")
-        
-        # Convert from Celsius to target unit
-        if to_unit_lower == "fahrenheit":
-            result = celsius * 9 / 5 + 32
-        elif to_unit_lower == "kelvin":
-            result = celsius + 273.15
-            # Validate Kelvin result (cannot be negative)
-            if result < 0:
-                raise ValueError(f"Conversion result is invalid: {result} K (below absolute zero)")
-        else:  # celsius
-            result = celsius
-        
-        # Validate final result
-        if isinf(result) or isnan(result):
-            raise ValueError(f"Calculation result is invalid: {result}")
-        
-        return result
-    except ZeroDivisionError:
-        raise ValueError("Division by zero error in temperature conversion")
-    except OverflowError:
-        raise ValueError(f"Temperature conversion overflow for value: {value} {from_unit}")
+    def model_post_init(self, __context):
+        """Validate units match the unit_type"""
+        validate_unit_pair(self.unit_type, self.from_unit, self.to_unit)
 
 
 @router.post("/convert", response_model=ConvertResponse)
-def convert_units(request: ConvertRequest):
+async def convert_units(request: ConvertRequest):
     """
     Convert units between different measurement systems
     
@@ -291,31 +161,14 @@ def convert_units(request: ConvertRequest):
                 detail="Invalid input: Value cannot be Infinity"
             )
         
-        # Perform conversion based on unit type
-        if request.unit_type == "length":
-            result = convert_length(request.value, request.from_unit, request.to_unit)
-        elif request.unit_type == "weight":
-            result = convert_weight(request.value, request.from_unit, request.to_unit)
-        elif request.unit_type == "temperature":
-            result = convert_temperature(request.value, request.from_unit, request.to_unit)
-        else:
-            raise HTTPException(
-                status_code=400,
-                detail=f"Unsupported unit type: {request.unit_type}. Supported types: length, weight, temperature"
-            )
-        
-        # Validate result before returning
-        if isnan(result) or isinf(result):
-            raise HTTPException(
-                status_code=500,
-                detail=f"Calculation error: Result is invalid (NaN or Infinity). Please check your input values."
-            )
+        # Perform conversion (engine validates units and result) on the light pool
+        result = await executors.light.run(convert, request.value, request.from_unit, request.to_unit, request.unit_type)
         
         return ConvertResponse(
             value=request.value,
             from_unit=request.from_unit,
             to_unit=request.to_unit,
-            result=round(result, 6),
+            result=result,
             unit_type=request.unit_type
         )
     except ValidationError as e:
@@ -326,12 +179,12 @@ def convert_units(request: ConvertRequest):
             detail=f"Validation error: {'; '.join(error_messages)}"
         )
     except ValueError as e:
-        # Value errors from conversion functions
+        # ConversionError (a ValueError) from the engine
         raise HTTPException(
             status_code=400,
             detail=f"Invalid input: {str(e)}"
         )
-    except HTTPException:
+    except (HTTPException, executors.PoolBusy):
         # Re-raise HTTP exceptions as-is
         raise
     except OverflowError as e:
@@ -352,6 +205,34 @@ def convert_units(request: ConvertRequest):
         )
 
 
+@router.post("/convert/batch")
+async def convert_units_batch(request: BatchConvertRequest):
+    """
+    Convert many values between the same pair of units
+
+    With `Content-Type: application/msgpack`, `values` may be a packed
+    little-endian float64 array (msgpack bin). With `Accept: application/msgpack`
+    the `results` come back packed the same way; JSON clients get a list.
+    The whole batch is rejected (400) if any value is invalid. Batches run on
+    the heavy worker pool.
+    """
+    try:
+        results = await executors.heavy.run(
+            convert_many, request.values, request.from_unit, request.to_unit, request.unit_type
+        )
+    except ConversionError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    
+    # Returned as a response directly: packed bytes must not go through jsonable_encoder
+    return negotiation.NegotiatedResponse({
+        "from_unit": request.from_unit,
+        "to_unit": request.to_unit,
+        "unit_type": request.unit_type,
+        "count": len(results),
+        "results": negotiation.pack_floats(results) if negotiation.wants_msgpack() else results
+    })
+
+
 @router.get("/units")
 def get_available_units():
     """
@@ -371,52 +252,217 @@ def get_available_units():
     }
 
 
+def _build_factor_snapshot() -> tuple[bytes, str]:
+    """
+    Serialize the unit registry once; the version is a hash of its content
+    """
+    body = {
+        "max_abs_value": MAX_ABS_VALUE,
+        "result_decimals": RESULT_DECIMALS,
+        "unit_types": {
+            "length": {
+                "kind": "linear",
+                "base": "meter",
+                "to_base": LENGTH_TO_METER,
+                "from_base": LENGTH_FROM_METER
+            },
+            "weight": {
+                "kind": "linear",
+                "base": "kilogram",
+                "to_base": WEIGHT_TO_KILOGRAM,
+                "from_base": WEIGHT_FROM_KILOGRAM
+            },
+            "temperature": {
+                "kind": "affine",
+                "base": "celsius",
+                "to_base": {unit: list(terms) for unit, terms in TEMPERATURE_TO_CELSIUS.items()},
+                "from_base": {unit: list(terms) for unit, terms in TEMPERATURE_FROM_CELSIUS.items()},
+                "min_value": {"kelvin": 0.0},
+                # Results down to this far below min_value are clamped to it
+                "min_value_tolerance": ABSOLUTE_ZERO_TOLERANCE
+            }
+        }
+    }
+    version = hashlib.sha256(json.dumps(body, sort_keys=True).encode()).hexdigest()[:16]
+    payload = json.dumps({"version": version, **body}, sort_keys=True, separators=(",", ":")).encode()
+    return payload, version
+
+
+FACTORS_PAYLOAD, FACTORS_VERSION = _build_factor_snapshot()
+FACTORS_CACHE_CONTROL = "public, max-age=86400, stale-while-revalidate=604800"
+FACTORS_IMMUTABLE_CACHE_CONTROL = "public, max-age=31536000, immutable"
+
+
+@router.get("/factors")
+async def get_conversion_factors(
+    request: Request,
+    v: Optional[str] = Query(None, description="Snapshot version; a matching version is cached as immutable")
+):
+    """
+    Get a versioned snapshot of all conversion factors so clients can convert locally
+
+    - **linear** types: `result = value * to_base[from] * from_base[to]`
+    - **affine** types (temperature): `base = value * to_base[from][0] + to_base[from][1]`,
+      then `result = base * from_base[to][0] + from_base[to][1]`
+    - Round results to `result_decimals`; reject `|value| > max_abs_value` and values below `min_value`
+    """
+    etag = f'"{FACTORS_VERSION}"'
+    headers = {
+        "ETag": etag,
+        "Cache-Control": FACTORS_IMMUTABLE_CACHE_CONTROL if v == FACTORS_VERSION else FACTORS_CACHE_CONTROL
+    }
+    if_none_match = request.headers.get("if-none-match", "")
+    if etag in if_none_match or if_none_match.strip() == "*":
+        return Response(status_code=304, headers=headers)
+    return Response(content=FACTORS_PAYLOAD, media_type="application/json", headers=headers)
+
+
 @router.post("/history", response_model=schemas.ConversionHistoryResponse, status_code=201)
 def save_conversion_history(
     conversion: schemas.ConversionHistoryCreate,
+    response: Response,
+    idempotency_key: Optional[str] = Header(None, alias=idempotency.IDEMPOTENCY_HEADER, max_length=255),
+    tenant: str = Depends(tenants.get_tenant),
     db: Session = Depends(get_db)
 ):
     """
-    Save a conversion to history
+    Save a conversion to the history of the caller's tenant (X-API-Key)
+    
+    Send an **Idempotency-Key** header to make retries safe: a repeated key
+    returns the original record (with `Idempotent-Replayed: true`) without
+    inserting again; reusing it with another body returns 422. Returns 429
+    once the tenant's history quota is reached.
     """
-    return crud.create_conversion_history(db=db, conversion=conversion)
+    if idempotency_key:
+        history_id = idempotency.lookup(
+            db, idempotency.history_scope(tenant), idempotency_key, idempotency.request_hash(conversion)
+        )
+        if history_id is not None:
+            return idempotency.replay(crud.get_conversion_history_item(db, history_id, tenant), response)
+    tenants.check_history_quota(db, tenant)
+    try:
+        db_conversion = crud.create_conversion_history(
+            db=db, conversion=conversion, idempotency_key=idempotency_key, tenant_id=tenant
+        )
+    except idempotency.Replayed as e:
+        return idempotency.replay(e.resource, response)
+    metrics.increment("tenant_history_writes", tenant=tenant)
+    return db_conversion
 
 
 @router.get("/history", response_model=List[schemas.ConversionHistoryResponse])
 def get_conversion_history(
     page: int = Query(1, ge=1, description="Page number"),
     page_size: int = Query(20, ge=1, le=100, description="Number of items per page"),
-    db: Session = Depends(get_db)
+    unit_type: Optional[Literal["length", "weight", "temperature"]] = Query(None, description="Filter by unit type"),
+    tenant: str = Depends(tenants.get_tenant),
+    db: Session = Depends(get_read_db)
 ):
     """
-    Get conversion history with pagination
+    Get the conversion history of the caller's tenant with pagination
+    
+    Pages are cached until the next write to the history (X-Cache: HIT/MISS).
     """
-    skip = (page - 1) * page_size
-    conversions, total = crud.get_conversion_history(db=db, skip=skip, limit=page_size)
+    def build() -> Response:
+        skip = (page - 1) * page_size
+        conversions, total = crud.get_conversion_history(
+            db=db, skip=skip, limit=page_size, unit_type=unit_type, tenant_id=tenant
+        )
+        return negotiation.NegotiatedResponse([
+            schemas.ConversionHistoryResponse.model_validate(c).model_dump(mode="json") for c in conversions
+        ])
     
-    return conversions
+    # JSON and msgpack bodies are cached separately
+    key = (tenant, page, page_size, unit_type, negotiation.wants_msgpack())
+    return page_cache.cached_page(db, page_cache.HISTORY, key, build)
+
+
+@router.get("/history/usage", response_model=schemas.TenantUsageResponse)
+def get_history_usage(
+    tenant: str = Depends(tenants.get_tenant),
+    db: Session = Depends(get_read_db)
+):
+    """
+    Get the caller's tenant, its number of history rows and its quota
+    """
+    quota = tenants.history_quota(tenant)
+    return schemas.TenantUsageResponse(tenant=tenant, rows=tenants.history_rows(db, tenant), quota=quota or None)
+
+
+@router.get("/history/stats", response_model=List[schemas.ConversionStatsResponse])
+def get_conversion_stats(
+    unit_type: Optional[str] = Query(None, description="Filter by unit type"),
+    start_day: Optional[date] = Query(None, description="First day to include (YYYY-MM-DD)"),
+    end_day: Optional[date] = Query(None, description="Last day to include (YYYY-MM-DD)"),
+    tenant: str = Depends(tenants.get_tenant),
+    db: Session = Depends(get_read_db)
+):
+    """
+    Get the caller's tenant's conversion statistics per unit pair (count, sum, min, max, avg)
+
+    Served from the daily rollup table plus the not-yet-rolled-up tail.
+    Identical concurrent requests of a tenant share one query.
+    """
+    return singleflight.do(
+        ("history_stats", tenant, unit_type, start_day, end_day),
+        lambda: rollups.get_conversion_stats(
+            db=db, tenant_id=tenant, unit_type=unit_type, start_day=start_day, end_day=end_day
+        )
+    )
+
+
+@router.post("/history/rollup", response_model=schemas.RollupRunResponse)
+def run_history_rollup(tenant: str = Depends(tenants.require_admin), db: Session = Depends(get_db)):
+    """
+    Fold new conversion history rows into the daily rollups now (admin
+    tenants only: it folds every tenant's rows)
+    """
+    processed = rollups.run_rollup(db=db)
+    return schemas.RollupRunResponse(processed=processed, watermark=rollups.get_watermark(db))
 
 
 @router.delete("/history/{history_id}", status_code=204)
 def delete_conversion_history_item(
     history_id: int,
+    tenant: str = Depends(tenants.get_tenant),
     db: Session = Depends(get_db)
 ):
     """
-    Delete a specific conversion history item
+    Delete a specific conversion history item of the caller's tenant
     """
-    success = crud.delete_conversion_history(db=db, history_id=history_id)
+    success = crud.delete_conversion_history(db=db, history_id=history_id, tenant_id=tenant)
     if not success:
         raise HTTPException(status_code=404, detail="Conversion history not found")
     return None
 
 
 @router.delete("/history", status_code=200)
-def clear_conversion_history(db: Session = Depends(get_db)):
+def clear_conversion_history(
+    older_than_days: Optional[float] = Query(
+        None, gt=0, description="Only delete records older than N days (runs as a background job)"
+    ),
+    tenant: str = Depends(tenants.get_tenant),
+    db: Session = Depends(get_db)
+):
     """
-    Clear all conversion history
+    Clear all conversion history of the caller's tenant
+
+    With **older_than_days**, or when the tenant has more than
+    HISTORY_CLEAR_SYNC_MAX_ROWS records, records are deleted in small
+    chunks by a background job (202); poll `/api/jobs/{id}` for progress.
+    On PostgreSQL a tenant with its own partition has it truncated instead.
     """
-    count = crud.clear_conversion_history(db=db)
+    if (
+        older_than_days is None
+        and tenants.own_partition(db, tenant) is None
+        and tenants.history_rows(db, tenant) > retention.HISTORY_CLEAR_SYNC_MAX_ROWS
+    ):
+        # One DELETE of that many rows would hold its locks and WAL until it
+        # commits (truncating the tenant's own partition is quick at any size)
+        older_than_days = 0
+    if older_than_days is not None:
+        job = retention.start_history_cleanup(older_than_days, tenant)
+        return JSONResponse(status_code=202, content=jsonable_encoder(schemas.JobResponse(**job)))
+
+    count = crud.clear_conversion_history(db=db, tenant_id=tenant)
     return {"message": f"Deleted {count} conversion history records"}
-
-
@@ -0,0 +1,67 @@
+import asyncio
+from fastapi import APIRouter, Header, Query, Request
+from fastapi.responses import StreamingResponse
+from typing import Optional
+from app import events, tenants
+
+router = APIRouter(prefix="/events", tags=["events"])
+
+HEARTBEAT_SECONDS = 15
+
+
+@router.get("")
+async def stream_events(
+    request: Request,
+    topics: Optional[str] = Query(None, description="Comma-separated topics: history, todos (default: all)"),
+    last_event_id: Optional[int] = Query(None, description="Resume after this event id"),
+    last_event_id_header: Optional[int] = Header(None, alias="Last-Event-ID"),
+    api_key: Optional[str] = Query(None, description=f"Tenant API key (EventSource cannot send {tenants.API_KEY_HEADER})"),
+    api_key_header: Optional[str] = Header(None, alias=tenants.API_KEY_HEADER)
+):
+    """
+    Server-Sent Events feed of history and todo changes
+
+    Events: `history.created`, `history.deleted`, `history.cleared`,
+    `history.compacted`, `history.imported`, `todo.created`, `todo.updated`,
+    `todo.deleted`, `todo.imported`.
+    Reconnect with `Last-Event-ID` (browsers do this automatically) to receive
+    only the missed deltas. A `reset` event means the gap could not be replayed
+    and the client should reload its list once.
+    History events of other tenants are not sent.
+    """
+    tenant = tenants.resolve(api_key_header or api_key)
+    topic_set = {t.strip() for t in topics.split(",") if t.strip()} if topics else None
+    cursor = last_event_id_header if last_event_id_header is not None else last_event_id
+    subscription = events.bus.subscribe(topic_set, cursor)
+
+    def visible(event: events.Event) -> bool:
+        # Events without a tenant (bulk imports, compaction, global retention) go to everyone
+        owner = event.data.get("tenant_id")
+        return owner is None or owner == tenant
+
+    async def stream():
+        async with subscription:
+            yield "retry: 3000\n\n"
+            if subscription.reset:
+                yield f"id: {events.bus.last_id}\nevent: reset\ndata: {{}}\n\n"
+            for event in subscription.backlog:
+                if visible(event):
+                    yield event.to_sse()
+            while not await request.is_disconnected():
+                try:
+                    event = await asyncio.wait_for(subscription.queue.get(), HEARTBEAT_SECONDS)
+                except asyncio.TimeoutError:
+                    yield ": keep-alive\n\n"
+                    continue
+                if event is None:
+                    # Subscriber fell too far behind; let it resync and reconnect
+                    yield f"id: {events.bus.last_id}\nevent: reset\ndata: {{}}\n\n"
+                    return
+                if visible(event):
+                    yield event.to_sse()
+
+    return StreamingResponse(
+        stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
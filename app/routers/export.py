@@ -1,26 +1,34 @@
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Query
 from fastapi.responses import FileResponse
 from sqlalchemy.orm import Session
-from app.database import get_db
-from app import crud
-from openpyxl import Workbook
-from openpyxl.styles import Font, PatternFill, Alignment
-from openpyxl.utils import get_column_letter
+from starlette.background import BackgroundTask
+from app.dependencies import get_read_db
+from app import crud, rollups, singleflight, sharded_export, deltas, diagnostics, executors, tenants
+from app.sharded_export import EXCEL_MAX_ROWS
 from datetime import datetime
+from typing import List, Optional
 import os
 from pathlib import Path
 import logging
+import uuid
 
 logger = logging.getLogger(__name__)
 
 router = APIRouter(prefix="/export", tags=["export"])
 
 
-def create_excel_file(todos: list, conversions: list) -> str:
+def create_excel_file(todos: list, conversions: list, rollups: list = None, deleted: list = None) -> str:
     """
     Create Excel file with todos and conversion history
+    (plus a "Daily Rollups" sheet when rollups are given, and a
+    "Deleted Rows" sheet when delta export tombstones are given)
     Returns the file path
     """
+    # openpyxl is imported on first export to keep it out of worker start-up
+    from openpyxl import Workbook
+    from openpyxl.styles import Font, PatternFill, Alignment
+    from openpyxl.utils import get_column_letter
+    
     wb = Workbook()
     
     # Remove default sheet if it exists
@@ -30,23 +38,29 @@ def create_excel_file(todos: list, conversions: list) -> str:
     header_fill = PatternFill(start_color="667eea", end_color="667eea", fill_type="solid")
     header_font = Font(bold=True, color="FFFFFF")
     
-    # Always create Todos sheet
-    todos_sheet = wb.create_sheet("Todos", 0)
+    def add_sheet(title: str, headers: list, index: int):
+        sheet = wb.create_sheet(title, index)
+        sheet.append(headers)
+        # Style headers
+        for cell in sheet[1]:
+            cell.fill = header_fill
+            cell.font = header_font
+            cell.alignment = Alignment(horizontal="center", vertical="center")
+        return sheet
     
-    # Headers for Todos
+    # Always create Todos sheet
     todos_headers = ["ID", "Title", "Description", "Completed", "Created At", "Updated At"]
-    todos_sheet.append(todos_headers)
+    todos_sheet = add_sheet("Todos", todos_headers, 0)
     
-    # Style headers
-    for cell in todos_sheet[1]:
-        cell.fill = header_fill
-        cell.font = header_font
-        cell.alignment = Alignment(horizontal="center", vertical="center")
-    
-    # Add todos data
+    # Add todos data; rows beyond Excel's sheet limit continue on "Todos 2", ...
     logger.info(f"Adding {len(todos)} todos to Excel sheet")
+    sheet, sheet_rows, sheet_number = todos_sheet, 1, 1
     for todo in todos:
-        todos_sheet.append([
+        if sheet_rows >= EXCEL_MAX_ROWS:
+            sheet_number += 1
+            sheet = add_sheet(f"Todos {sheet_number}", todos_headers, wb.index(sheet) + 1)
+            sheet_rows = 1
+        sheet.append([
             todo.id,
             todo.title,
             todo.description or "",
@@ -54,6 +68,7 @@ def create_excel_file(todos: list, conversions: list) -> str:
             todo.created_at.strftime("%Y-%m-%d %H:%M:%S") if todo.created_at else "",
             todo.updated_at.strftime("%Y-%m-%d %H:%M:%S") if todo.updated_at else ""
         ])
+        sheet_rows += 1
     
     # Auto-adjust column widths for Todos
     for column in todos_sheet.columns:
@@ -69,28 +84,22 @@ def create_excel_file(todos: list, conversions: list) -> str:
         todos_sheet.column_dimensions[column_letter].width = adjusted_width
     
     # Always create Conversion History sheet
-    conv_sheet = wb.create_sheet("Conversion History", 1)
-    
-    # Headers for Conversion History
     conv_headers = ["ID", "Value", "From Unit", "To Unit", "Result", "Unit Type", "Created At"]
-    conv_sheet.append(conv_headers)
-    
-    # Style headers
-    for cell in conv_sheet[1]:
-        cell.fill = header_fill
-        cell.font = header_font
-        cell.alignment = Alignment(horizontal="center", vertical="center")
+    conv_sheet = add_sheet("Conversion History", conv_headers, len(wb.sheetnames))
     
     # Add conversion data
     logger.info(f"Adding {len(conversions)} conversions to Excel sheet")
-    print(f"[EXCEL] Adding {len(conversions)} conversions to Excel sheet")
-    
-    if len(conversions) == 0:
-        print("[EXCEL] WARNING: No conversions to add to Excel!")
     
-    for idx, conv in enumerate(conversions):
+    # Rows beyond Excel's sheet limit continue on "Conversion History 2", ...
+    sheet, sheet_rows, sheet_number = conv_sheet, 1, 1
+    written = 0
+    for conv in conversions:
         try:
-            conv_sheet.append([
+            if sheet_rows >= EXCEL_MAX_ROWS:
+                sheet_number += 1
+                sheet = add_sheet(f"Conversion History {sheet_number}", conv_headers, wb.index(sheet) + 1)
+                sheet_rows = 1
+            sheet.append([
                 conv.id,
                 conv.value,
                 conv.from_unit,
@@ -99,18 +108,14 @@ def create_excel_file(todos: list, conversions: list) -> str:
                 conv.unit_type,
                 conv.created_at.strftime("%Y-%m-%d %H:%M:%S") if conv.created_at else ""
             ])
-            if idx < 3:  # Print first 3 for debugging
-                print(f"[EXCEL] Added conversion {idx+1}: ID={conv.id}, Value={conv.value}, From={conv.from_unit}, To={conv.to_unit}")
+            sheet_rows += 1
+            written += 1
         except Exception as e:
-            print(f"[EXCEL] Error adding conversion {idx+1}: {str(e)}")
-            logger.error(f"Error adding conversion to Excel: {str(e)}")
-    
-    print(f"[EXCEL] Total rows in Conversion History sheet: {conv_sheet.max_row} (should be {len(conversions) + 1} including header)")
+            logger.error(f"Error adding conversion {conv.id} to Excel: {str(e)}")
     
-    # Verify data was written
-    if conv_sheet.max_row != len(conversions) + 1:
-        print(f"[EXCEL] ERROR: Row count mismatch! Expected {len(conversions) + 1} rows, got {conv_sheet.max_row}")
-        logger.error(f"Row count mismatch in Conversion History sheet: expected {len(conversions) + 1}, got {conv_sheet.max_row}")
+    logger.debug(f"Wrote {written} conversion rows in {sheet_number} sheet(s)")
+    if written != len(conversions):
+        logger.error(f"Row count mismatch in Conversion History sheets: expected {len(conversions)}, got {written}")
     
     # Auto-adjust column widths for Conversion History
     for column in conv_sheet.columns:
@@ -125,12 +130,53 @@ def create_excel_file(todos: list, conversions: list) -> str:
         adjusted_width = min(max_length + 2, 50)
         conv_sheet.column_dimensions[column_letter].width = adjusted_width
     
+    if rollups is not None:
+        rollup_sheet = add_sheet(
+            "Daily Rollups", ["Day", "Unit Type", "From Unit", "To Unit", "Count", "Sum", "Min", "Max"], len(wb.sheetnames)
+        )
+        
+        logger.info(f"Adding {len(rollups)} rollup rows to Excel sheet")
+        for rollup in rollups:
+            rollup_sheet.append([
+                rollup.day.strftime("%Y-%m-%d"),
+                rollup.unit_type,
+                rollup.from_unit,
+                rollup.to_unit,
+                rollup.count,
+                rollup.value_sum,
+                rollup.value_min,
+                rollup.value_max
+            ])
+        
+        for column in rollup_sheet.columns:
+            column_letter = get_column_letter(column[0].column)
+            max_length = max(len(str(cell.value)) for cell in column)
+            rollup_sheet.column_dimensions[column_letter].width = min(max_length + 2, 50)
+    
+    if deleted is not None:
+        deleted_headers = ["Table", "ID", "Deleted At"]
+        sheet = add_sheet("Deleted Rows", deleted_headers, len(wb.sheetnames))
+        sheet_rows, sheet_number = 1, 1
+        for tombstone in deleted:
+            if sheet_rows >= EXCEL_MAX_ROWS:
+                sheet_number += 1
+                sheet = add_sheet(f"Deleted Rows {sheet_number}", deleted_headers, len(wb.sheetnames))
+                sheet_rows = 1
+            # An empty ID means the whole table was truncated
+            sheet.append([
+                tombstone.table_name,
+                tombstone.row_id,
+                tombstone.deleted_at.strftime("%Y-%m-%d %H:%M:%S") if tombstone.deleted_at else ""
+            ])
+            sheet_rows += 1
+    
     # Save to temporary file
     BASE_DIR = Path(__file__).resolve().parent.parent.parent
     exports_dir = BASE_DIR / "exports"
     exports_dir.mkdir(exist_ok=True)
     
-    filename = f"database_export_{datetime.now().strftime('%Y%m%d_%H%M%S')}.xlsx"
+    # Unique per call: exports started in the same second must not share files
+    filename = f"database_export_{datetime.now().strftime('%Y%m%d_%H%M%S')}_{uuid.uuid4().hex[:8]}.xlsx"
     filepath = exports_dir / filename
     
     wb.save(filepath)
@@ -138,153 +184,281 @@ def create_excel_file(todos: list, conversions: list) -> str:
     return str(filepath)
 
 
+XLSX_MEDIA_TYPE = "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
+
+
+def _remove_export(result) -> None:
+    """
+    Delete the file of a finished export (result is a path or (path, headers))
+    """
+    filepath = result[0] if isinstance(result, tuple) else result
+    Path(filepath).unlink(missing_ok=True)
+
+
+class ExportFileResponse(FileResponse):
+    """
+    FileResponse for the file of a coalesced export
+
+    Releases the caller's share of the flight once the file is sent (also
+    when sending fails or the client goes away); the last release deletes it.
+    """
+
+    def __init__(self, flight: singleflight.Flight, media_type: str = XLSX_MEDIA_TYPE):
+        result = flight.result
+        filepath, headers = result if isinstance(result, tuple) else (result, None)
+        self._flight = flight
+        super().__init__(
+            path=filepath,
+            filename=os.path.basename(filepath),
+            media_type=media_type,
+            headers=headers,
+            background=BackgroundTask(self._release)
+        )
+
+    def _release(self) -> None:
+        flight, self._flight = self._flight, None
+        if flight is not None:
+            flight.release()
+
+    async def __call__(self, scope, receive, send) -> None:
+        try:
+            await super().__call__(scope, receive, send)
+        finally:
+            self._release()
+
+
+async def _export(key: tuple, func, *args, **kwargs) -> singleflight.Flight:
+    """
+    Build an export on the heavy pool, coalescing identical concurrent requests
+    """
+    return await singleflight.join(key, lambda: executors.heavy.run(func, *args, **kwargs), cleanup=_remove_export)
+
+
+def _build_delta_export(
+    db: Session,
+    tables: List[str],
+    since_id: Optional[int],
+    since_timestamp: Optional[datetime],
+    deleted_since_id: Optional[int],
+    tenant: Optional[str] = None
+):
+    """
+    Export the rows added/changed and deleted since the watermarks
+    (conversion history of one tenant)
+    Returns the file path and the next-watermark headers
+    """
+    # Read the watermarks first so writes during the export are not lost
+    horizon = deltas.safe_horizon(db)
+    deleted_up_to = deltas.tombstone_watermark(db, horizon)
+    rows = {table: deltas.changed_rows(db, table, since_id, since_timestamp, tenant) for table in tables}
+    deleted = deltas.deleted_rows(db, tables, deleted_up_to, deleted_since_id, since_timestamp, tenant)
+    logger.info(f"Delta export of {tables}: {sum(map(len, rows.values()))} changed, {len(deleted)} deleted rows")
+    filepath = create_excel_file(rows.get("todos", []), rows.get("conversion_history", []), deleted=deleted)
+    return filepath, deltas.next_watermark(rows, deleted_up_to, since_id, since_timestamp, horizon)
+
+
 @router.get("/excel")
-def export_to_excel(db: Session = Depends(get_db)):
+async def export_to_excel(
+    since_timestamp: Optional[datetime] = Query(None, description="Only rows created/updated at or after this time"),
+    deleted_since_id: Optional[int] = Query(None, ge=0, description="Only deleted rows after this tombstone id"),
+    tenant: str = Depends(tenants.get_tenant),
+    db: Session = Depends(get_read_db)
+):
     """
-    Export all database data (Todos and Conversion History) to Excel file
+    Export all database data (Todos and the caller's tenant's Conversion History) to Excel file
+    
+    Concurrent requests are coalesced: they wait for one build and get the same file.
+    Builds run on the heavy worker pool (503 when its queue is full).
     
     Returns an Excel file with two sheets:
     - Todos: All todo items
     - Conversion History: All conversion records
+    
+    The X-Next-Since-Timestamp and X-Next-Deleted-Since-Id headers are the
+    watermarks of the next delta export; with a watermark only changed rows
+    are exported, plus a "Deleted Rows" sheet.
     """
     try:
-        # Direct database query to verify data exists
-        from app import models
-        direct_count = db.query(models.ConversionHistory).count()
-        print(f"[EXPORT] Direct DB query count: {direct_count} conversions")
-        logger.info(f"Direct DB query found {direct_count} conversions")
+        if since_timestamp is not None or deleted_since_id is not None:
+            flight = await _export(
+                ("export_excel_delta", tenant, since_timestamp, deleted_since_id),
+                _build_delta_export,
+                db, ["todos", "conversion_history"], None, since_timestamp, deleted_since_id, tenant
+            )
+            return ExportFileResponse(flight)
         
-        # Get all todos without pagination
-        todos = crud.get_all_todos(db=db)
-        logger.info(f"Exporting {len(todos)} todos")
-        print(f"[EXPORT] Found {len(todos)} todos in database")
+        def build():
+            horizon = deltas.safe_horizon(db)
+            deleted_up_to = deltas.tombstone_watermark(db, horizon)
+            # All todos and the tenant's conversion history, without pagination
+            todos = crud.get_all_todos(db=db)
+            conversions = crud.get_all_conversion_history(db=db, tenant_id=tenant)
+            logger.info(f"Exporting {len(todos)} todos and {len(conversions)} conversions")
+            filepath = create_excel_file(todos, conversions)
+            logger.debug(f"Excel file created at: {filepath}")
+            return filepath, deltas.next_watermark(
+                {"todos": todos, "conversion_history": conversions}, deleted_up_to, horizon=horizon
+            )
         
-        # Get all conversion history without pagination - try multiple methods
-        conversions = crud.get_all_conversion_history(db=db)
-        logger.info(f"Exporting {len(conversions)} conversions")
-        print(f"[EXPORT] Found {len(conversions)} conversions using crud.get_all_conversion_history")
+        # Concurrent export requests share one build
+        flight = await _export(("export_excel", tenant), build)
         
-        # If no conversions found, try direct query
-        if len(conversions) == 0 and direct_count > 0:
-            print("[EXPORT] WARNING: crud returned 0 but direct query found data! Using direct query...")
-            conversions = db.query(models.ConversionHistory).order_by(models.ConversionHistory.created_at.desc()).all()
-            print(f"[EXPORT] Direct query returned {len(conversions)} conversions")
-        
-        # Debug: Print first few conversions if any
-        if conversions:
-            print(f"[EXPORT] First conversion: ID={conversions[0].id}, Value={conversions[0].value}, From={conversions[0].from_unit}, To={conversions[0].to_unit}")
-            print(f"[EXPORT] Last conversion: ID={conversions[-1].id}, Value={conversions[-1].value}, From={conversions[-1].from_unit}, To={conversions[-1].to_unit}")
-        else:
-            print("[EXPORT] WARNING: No conversions found in database!")
-            print(f"[EXPORT] Direct count was: {direct_count}")
-        
-        # Create Excel file
-        filepath = create_excel_file(todos, conversions)
-        logger.info(f"Excel file created at: {filepath} with {len(todos)} todos and {len(conversions)} conversions")
-        print(f"[EXPORT] Excel file created: {filepath} with {len(todos)} todos and {len(conversions)} conversions")
-        
-        return FileResponse(
-            path=filepath,
-            filename=os.path.basename(filepath),
-            media_type="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
-        )
+        return ExportFileResponse(flight)
+    except deltas.WatermarkExpired as e:
+        raise HTTPException(status_code=410, detail=f"{e}; run a full export")
+    except executors.PoolBusy:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error creating Excel file: {str(e)}")
 
 
 @router.get("/excel/todos")
-def export_todos_to_excel(db: Session = Depends(get_db)):
+async def export_todos_to_excel(
+    since_id: Optional[int] = Query(None, ge=0, description="Only todos with a larger id"),
+    since_timestamp: Optional[datetime] = Query(None, description="Only todos updated at or after this time"),
+    deleted_since_id: Optional[int] = Query(None, ge=0, description="Only deleted todos after this tombstone id"),
+    db: Session = Depends(get_read_db)
+):
     """
-    Export only Todos to Excel file
+    Export only Todos to Excel file (a delta when a watermark is given)
     """
     try:
-        todos = crud.get_all_todos(db=db)
-        logger.info(f"Exporting {len(todos)} todos only")
-        filepath = create_excel_file(todos, [])
+        def build():
+            if since_id is not None or since_timestamp is not None or deleted_since_id is not None:
+                return _build_delta_export(db, ["todos"], since_id, since_timestamp, deleted_since_id)
+            horizon = deltas.safe_horizon(db)
+            deleted_up_to = deltas.tombstone_watermark(db, horizon)
+            todos = crud.get_all_todos(db=db)
+            logger.info(f"Exporting {len(todos)} todos only")
+            return create_excel_file(todos, []), deltas.next_watermark({"todos": todos}, deleted_up_to, horizon=horizon)
         
-        return FileResponse(
-            path=filepath,
-            filename=os.path.basename(filepath),
-            media_type="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
-        )
+        flight = await _export(("export_excel_todos", since_id, since_timestamp, deleted_since_id), build)
+        
+        return ExportFileResponse(flight)
+    except deltas.WatermarkExpired as e:
+        raise HTTPException(status_code=410, detail=f"{e}; run a full export")
+    except executors.PoolBusy:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error creating Excel file: {str(e)}")
 
 
 @router.get("/excel/conversions")
-def export_conversions_to_excel(db: Session = Depends(get_db)):
+async def export_conversions_to_excel(
+    since_id: Optional[int] = Query(None, ge=0, description="Only conversions with a larger id"),
+    since_timestamp: Optional[datetime] = Query(None, description="Only conversions created at or after this time"),
+    deleted_since_id: Optional[int] = Query(None, ge=0, description="Only deleted conversions after this tombstone id"),
+    tenant: str = Depends(tenants.get_tenant),
+    db: Session = Depends(get_read_db)
+):
     """
-    Export only Conversion History to Excel file
+    Export only the caller's tenant's Conversion History to Excel file (a delta when a watermark is given)
+    
+    For nightly syncs pass back the X-Next-Since-Id and
+    X-Next-Deleted-Since-Id headers of the previous export.
     """
     try:
-        conversions = crud.get_all_conversion_history(db=db)
-        logger.info(f"Exporting {len(conversions)} conversions only")
-        print(f"[EXPORT] Found {len(conversions)} conversions for export")
-        filepath = create_excel_file([], conversions)
+        def build():
+            if since_id is not None or since_timestamp is not None or deleted_since_id is not None:
+                return _build_delta_export(
+                    db, ["conversion_history"], since_id, since_timestamp, deleted_since_id, tenant
+                )
+            horizon = deltas.safe_horizon(db)
+            deleted_up_to = deltas.tombstone_watermark(db, horizon)
+            conversions = crud.get_all_conversion_history(db=db, tenant_id=tenant)
+            logger.info(f"Exporting {len(conversions)} conversions only")
+            return (
+                create_excel_file([], conversions),
+                deltas.next_watermark({"conversion_history": conversions}, deleted_up_to, horizon=horizon)
+            )
         
-        return FileResponse(
-            path=filepath,
-            filename=os.path.basename(filepath),
-            media_type="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
-        )
+        flight = await _export(("export_excel_conversions", tenant, since_id, since_timestamp, deleted_since_id), build)
+        
+        return ExportFileResponse(flight)
+    except deltas.WatermarkExpired as e:
+        raise HTTPException(status_code=410, detail=f"{e}; run a full export")
+    except executors.PoolBusy:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error creating Excel file: {str(e)}")
 
 
-@router.get("/debug/counts")
-def get_data_counts(db: Session = Depends(get_db)):
+@router.get("/excel/rollups")
+async def export_rollups_to_excel(tenant: str = Depends(tenants.get_tenant), db: Session = Depends(get_read_db)):
     """
-    Debug endpoint to check how many records are in the database
+    Export the caller's tenant's daily conversion rollups (per day and unit pair) to Excel file
+
+    Much smaller than the raw history export; run a rollup first to include
+    the latest conversions.
     """
     try:
-        from app import models
-        from sqlalchemy import desc
-        
-        # Direct database queries
-        direct_todos_count = db.query(models.Todo).count()
-        direct_conversions_count = db.query(models.ConversionHistory).count()
+        def build() -> str:
+            daily_rollups = rollups.get_all_rollups(db=db, tenant_id=tenant)
+            logger.info(f"Exporting {len(daily_rollups)} daily rollup rows")
+            return create_excel_file([], [], rollups=daily_rollups)
         
-        # Using CRUD functions
-        todos = crud.get_all_todos(db=db)
-        conversions = crud.get_all_conversion_history(db=db)
+        flight = await _export(("export_excel_rollups", tenant), build)
         
-        # Get all conversions directly
-        all_conversions_direct = db.query(models.ConversionHistory).order_by(desc(models.ConversionHistory.created_at)).all()
+        return ExportFileResponse(flight)
+    except executors.PoolBusy:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error creating Excel file: {str(e)}")
+
+
+@router.get("/excel/sharded")
+async def export_sharded_to_excel(
+    tables: str = Query("todos,conversion_history", description="Comma-separated tables to export"),
+    tenant: str = Depends(tenants.get_tenant),
+    db: Session = Depends(get_read_db)
+):
+    """
+    Export tables as a zip of workbooks, one per id range of at most
+    EXPORT_SHARD_ROWS rows, rendered in parallel worker processes
+    (conversion history of the caller's tenant only)
+
+    Use this for tables beyond a single sheet's row limit. Rows are in id
+    order; each workbook can be re-imported with /api/import/excel.
+    """
+    selected = [t.strip() for t in tables.split(",") if t.strip()]
+    unknown = [t for t in selected if t not in sharded_export.TABLES]
+    if not selected or unknown:
+        raise HTTPException(
+            status_code=400,
+            detail=f"tables must be a comma-separated subset of: {', '.join(sharded_export.TABLES)}"
+        )
+    try:
+        flight = await _export(
+            ("export_excel_sharded", tenant, tuple(selected)),
+            sharded_export.export_sharded, db, selected, tenant_id=tenant
+        )
         
-        return {
-            "direct_db_counts": {
-                "todos": direct_todos_count,
-                "conversions": direct_conversions_count
-            },
-            "crud_counts": {
-                "todos": len(todos),
-                "conversions": len(conversions)
-            },
-            "direct_query_count": len(all_conversions_direct),
-            "todos": [{"id": t.id, "title": t.title} for t in todos[:5]],  # First 5
-            "conversions_crud": [
-                {
-                    "id": c.id,
-                    "value": c.value,
-                    "from_unit": c.from_unit,
-                    "to_unit": c.to_unit,
-                    "result": c.result,
-                    "unit_type": c.unit_type,
-                    "created_at": str(c.created_at) if c.created_at else None
-                } for c in conversions[:10]  # First 10
-            ],
-            "conversions_direct": [
-                {
-                    "id": c.id,
-                    "value": c.value,
-                    "from_unit": c.from_unit,
-                    "to_unit": c.to_unit,
-                    "result": c.result,
-                    "unit_type": c.unit_type,
-                    "created_at": str(c.created_at) if c.created_at else None
-                } for c in all_conversions_direct[:10]  # First 10
-            ]
-        }
+        return ExportFileResponse(flight, media_type="application/zip")
+    except executors.PoolBusy:
+        raise
     except Exception as e:
-        import traceback
-        raise HTTPException(status_code=500, detail=f"Error getting counts: {str(e)}\n{traceback.format_exc()}")
+        raise HTTPException(status_code=500, detail=f"Error creating sharded export: {str(e)}")
+
+
+@router.get("/debug/inventory")
+@router.get("/debug/counts", deprecated=True)
+def get_data_inventory(
+    recent: int = Query(5, ge=0, le=diagnostics.DIAGNOSTICS_MAX_RECENT, description="Newest rows per table"),
+    tenant: str = Depends(tenants.get_tenant),
+    db: Session = Depends(get_read_db)
+):
+    """
+    Debug endpoint: row counts, table and index sizes and the newest rows
+    (conversion history rows and counters of the caller's tenant only;
+    history totals, unit type counters and sizes for admin tenants only)
+
+    Counts come from the row counters (no COUNT(*)), sizes from the catalog
+    and rows from LIMIT queries, within DIAGNOSTICS_TIMEOUT_SECONDS; sections
+    that run out are listed in `errors`. `/debug/counts` is the old name.
+    (concurrent requests share one set of queries)
+    """
+    admin = tenants.is_admin(tenant)
+    return singleflight.do(
+        ("debug_inventory", tenant, recent),
+        lambda: diagnostics.inventory(db, recent, tenant_id=tenant, admin=admin)
+    )
@@ -0,0 +1,66 @@
+from fastapi import APIRouter, Depends, File, HTTPException, Query, UploadFile
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
+from typing import Optional
+from app import executors, importer, schemas, tenants
+
+router = APIRouter(prefix="/import", tags=["import"])
+
+XLSX_MAGIC = b"PK\x03\x04"
+
+
+async def _start(file: UploadFile, fmt: str, kind: Optional[str], preserve_ids: bool, tenant: str) -> JSONResponse:
+    if fmt == "xlsx" and await file.read(4) != XLSX_MAGIC:
+        raise HTTPException(status_code=400, detail="File is not an .xlsx workbook")
+    await file.seek(0)
+    try:
+        # Copying a large upload is disk-bound: keep it off the request threadpool
+        path = await executors.heavy.run(importer.save_upload, file.file, suffix=f".{fmt}")
+    except importer.UploadTooLarge as e:
+        raise HTTPException(status_code=413, detail=str(e))
+    job = importer.start_import(path, fmt, kind, file.filename or "", preserve_ids, tenant)
+    return JSONResponse(status_code=202, content=jsonable_encoder(schemas.JobResponse(**job)))
+
+
+@router.post("/excel", status_code=202, response_model=schemas.JobResponse)
+async def import_excel(
+    file: UploadFile = File(..., description="Workbook in the /api/export/excel format"),
+    preserve_ids: bool = Query(False, description="Keep the ID column (rows with existing ids are skipped)"),
+    tenant: str = Depends(tenants.get_tenant)
+):
+    """
+    Import todos and conversion history from an Excel workbook
+
+    Reads the **Todos** and **Conversion History** sheets written by the
+    export endpoints (other sheets are ignored). Rows are streamed, validated
+    and inserted in chunks by a background job; poll `/api/jobs/{id}` for
+    progress and per-row errors in `result`. Conversion history rows belong
+    to the caller's tenant.
+    """
+    return await _start(file, "xlsx", None, preserve_ids, tenant)
+
+
+@router.post("/csv/todos", status_code=202, response_model=schemas.JobResponse)
+async def import_todos_csv(
+    file: UploadFile = File(..., description="CSV with ID, Title, Description, Completed, Created At, Updated At"),
+    preserve_ids: bool = Query(False, description="Keep the ID column (rows with existing ids are skipped)"),
+    tenant: str = Depends(tenants.get_tenant)
+):
+    """
+    Import todos from CSV (same columns as the Todos export sheet; only Title is required)
+    """
+    return await _start(file, "csv", importer.KIND_TODOS, preserve_ids, tenant)
+
+
+@router.post("/csv/conversions", status_code=202, response_model=schemas.JobResponse)
+async def import_conversions_csv(
+    file: UploadFile = File(
+        ..., description="CSV with ID, Value, From Unit, To Unit, Result, Unit Type, Created At"
+    ),
+    preserve_ids: bool = Query(False, description="Keep the ID column (rows with existing ids are skipped)"),
+    tenant: str = Depends(tenants.get_tenant)
+):
+    """
+    Import conversion history from CSV (same columns as the Conversion History export sheet)
+    """
+    return await _start(file, "csv", importer.KIND_CONVERSIONS, preserve_ids, tenant)
@@ -0,0 +1,24 @@
+from fastapi import APIRouter, HTTPException, Query
+from typing import List, Optional
+from app import jobs, schemas
+
+router = APIRouter(prefix="/jobs", tags=["jobs"])
+
+
+@router.get("", response_model=List[schemas.JobResponse])
+def list_jobs(kind: Optional[str] = Query(None, description="Filter by job kind")):
+    """
+    List background jobs (newest first)
+    """
+    return jobs.list_jobs(kind)
+
+
+@router.get("/{job_id}", response_model=schemas.JobResponse)
+def get_job(job_id: str):
+    """
+    Get progress of a background job
+    """
+    job = jobs.get_job(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return job
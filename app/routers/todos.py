@@ -1,8 +1,10 @@
-from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi import APIRouter, Depends, HTTPException, Query, Header, Response
+from fastapi.responses import JSONResponse
 from sqlalchemy.orm import Session
 from typing import Optional
-from app import crud, schemas
+from app import crud, schemas, idempotency, page_cache
 from app.database import get_db
+from app.dependencies import get_read_db
 from math import ceil
 
 router = APIRouter(prefix="/todos", tags=["todos"])
@@ -11,6 +13,8 @@ router = APIRouter(prefix="/todos", tags=["todos"])
 @router.post("", response_model=schemas.TodoResponse, status_code=201)
 def create_todo(
     todo: schemas.TodoCreate,
+    response: Response,
+    idempotency_key: Optional[str] = Header(None, alias=idempotency.IDEMPOTENCY_HEADER, max_length=255),
     db: Session = Depends(get_db)
 ):
     """
@@ -19,8 +23,17 @@ def create_todo(
     - **title**: Task title (required)
     - **description**: Task description (optional)
     - **completed**: Completion status (default: false)
+    - **Idempotency-Key** header (optional): retries with the same key return
+      the original Todo instead of creating a duplicate (422 if the body differs)
     """
-    return crud.create_todo(db=db, todo=todo)
+    if idempotency_key:
+        todo_id = idempotency.lookup(db, idempotency.SCOPE_TODOS, idempotency_key, idempotency.request_hash(todo))
+        if todo_id is not None:
+            return idempotency.replay(crud.get_todo(db=db, todo_id=todo_id), response)
+    try:
+        return crud.create_todo(db=db, todo=todo, idempotency_key=idempotency_key)
+    except idempotency.Replayed as e:
+        return idempotency.replay(e.resource, response)
 
 
 @router.get("", response_model=schemas.TodoListResponse)
@@ -28,7 +41,8 @@ def get_todos(
     page: int = Query(1, ge=1, description="Page number"),
     page_size: int = Query(10, ge=1, le=100, description="Number of items per page"),
     completed: Optional[bool] = Query(None, description="Filter by completion status"),
-    db: Session = Depends(get_db)
+    q: Optional[str] = Query(None, min_length=1, max_length=200, description="Full-text search in title and description"),
+    db: Session = Depends(get_read_db)
 ):
     """
     Get list of Todos with pagination and filtering
@@ -36,25 +50,37 @@ def get_todos(
     - **page**: Page number (starts from 1)
     - **page_size**: Number of items per page (max 100)
     - **completed**: Filter by status (true/false/null for all)
-    """
-    skip = (page - 1) * page_size
-    todos, total = crud.get_todos(db=db, skip=skip, limit=page_size, completed=completed)
+    - **q**: Search text; results are ranked by relevance instead of date
+      (the newest SEARCH_MAX_CANDIDATES matches; total_capped is true when there are more)
     
-    total_pages = ceil(total / page_size) if total > 0 else 0
+    Pages are cached until the next write to todos (X-Cache: HIT/MISS).
+    """
+    def build() -> Response:
+        skip = (page - 1) * page_size
+        total_capped = False
+        if q:
+            todos, total, total_capped = crud.search_todos(db=db, q=q, skip=skip, limit=page_size, completed=completed)
+        else:
+            todos, total = crud.get_todos(db=db, skip=skip, limit=page_size, completed=completed)
+        
+        total_pages = ceil(total / page_size) if total > 0 else 0
+        
+        return JSONResponse(schemas.TodoListResponse(
+            items=todos,
+            total=total,
+            page=page,
+            page_size=page_size,
+            total_pages=total_pages,
+            total_capped=total_capped
+        ).model_dump(mode="json"))
     
-    return schemas.TodoListResponse(
-        items=todos,
-        total=total,
-        page=page,
-        page_size=page_size,
-        total_pages=total_pages
-    )
+    return page_cache.cached_page(db, page_cache.TODOS, (page, page_size, completed, q), build)
 
 
 @router.get("/{todo_id}", response_model=schemas.TodoResponse)
 def get_todo(
     todo_id: int,
-    db: Session = Depends(get_db)
+    db: Session = Depends(get_read_db)
 ):
     """
     Get a Todo by ID
@@ -0,0 +1,203 @@
+"""
+Periodic tasks on daemon threads
+
+Every worker process runs the scheduler, but only the leader (one process
+per database, see LeaderLock) runs the tasks; the others skip each run
+and take over when the leader exits.
+"""
+import sqlite3
+import threading
+import logging
+import time
+from typing import Callable, Dict, Optional
+from sqlalchemy import create_engine, text
+from sqlalchemy.engine import Engine
+from sqlalchemy.pool import NullPool
+
+logger = logging.getLogger(__name__)
+
+# pg_try_advisory_lock key of the scheduler leader
+LEADER_LOCK_KEY = 0x7363686564756C65
+
+
+class LeaderLock:
+    """
+    Elects one process per database to run the scheduled tasks
+
+    PostgreSQL: a session advisory lock held on a dedicated connection.
+    SQLite (whose processes share a host): an open exclusive transaction on
+    a lock file next to the database. Both are released when the process
+    exits; another process gets the lock on its next try.
+    """
+
+    def __init__(self, engine: Engine):
+        self.url = engine.url
+        self.leading = False
+        # The connection holding the lock (None for a private SQLite database)
+        self._conn = None
+        self._lock = threading.Lock()
+
+    def held(self) -> bool:
+        """
+        Whether this process is the leader (trying to become it if not)
+        """
+        with self._lock:
+            if not (self.leading and self._alive()):
+                self.release()
+                self.leading = self._acquire()
+                if self.leading:
+                    logger.info("This process is the scheduler leader")
+            return self.leading
+
+    def release(self) -> None:
+        conn, self._conn, self.leading = self._conn, None, False
+        if conn is not None:
+            try:
+                conn.close()
+            except Exception:
+                pass
+
+    def _acquire(self) -> bool:
+        backend = self.url.get_backend_name()
+        try:
+            if backend == "postgresql":
+                conn = create_engine(self.url, poolclass=NullPool).connect()
+                locked = conn.scalar(text("SELECT pg_try_advisory_lock(:key)"), {"key": LEADER_LOCK_KEY})
+                conn.commit()
+            elif backend == "sqlite" and self.url.database and self.url.database != ":memory:":
+                conn = sqlite3.connect(f"{self.url.database}.scheduler-lock", timeout=0, check_same_thread=False)
+                conn.isolation_level = None
+                try:
+                    conn.execute("BEGIN EXCLUSIVE")
+                    locked = True
+                except sqlite3.OperationalError:
+                    locked = False
+            else:
+                return True  # a database private to this process
+        except Exception as e:
+            logger.error(f"Scheduler leader lock failed: {e}")
+            return False
+        if locked:
+            self._conn = conn
+        else:
+            conn.close()
+        return locked
+
+    def _alive(self) -> bool:
+        if self.url.get_backend_name() != "postgresql":
+            return True
+        try:
+            # A lost connection has lost the lock with it
+            self._conn.scalar(text("SELECT 1"))
+            self._conn.commit()
+            return True
+        except Exception as e:
+            logger.warning(f"Scheduler leader connection lost: {e}")
+            return False
+
+
+class PeriodicTask:
+    """
+    A function that runs every `interval` seconds on its own daemon thread
+    """
+
+    def __init__(self, name: str, interval: float, func: Callable[[], None], leader: Optional[LeaderLock] = None):
+        self.name = name
+        self.interval = interval
+        self.func = func
+        # Runs only while this process holds the leader lock, if given
+        self.leader = leader
+        self._stop = threading.Event()
+        self._thread = None
+        # time.monotonic() of the last completed run (or of start)
+        self.last_run = None
+        self.running = False
+
+    def start(self):
+        if self._thread is not None and self._thread.is_alive():
+            return
+        self._stop.clear()
+        self.last_run = time.monotonic()
+        self._thread = threading.Thread(target=self._run, name=f"scheduler-{self.name}", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            if self.leader is not None and not self.leader.held():
+                # Another process runs it; skipping is on schedule
+                self.last_run = time.monotonic()
+                continue
+            self.running = True
+            try:
+                self.func()
+            except Exception as e:
+                logger.error(f"Scheduled task '{self.name}' failed: {e}")
+            finally:
+                self.running = False
+                self.last_run = time.monotonic()
+
+    def overdue_seconds(self) -> float:
+        """
+        Seconds past the next expected run (0 when on schedule or not started)
+        """
+        if self.last_run is None or self._stop.is_set():
+            return 0.0
+        return max(0.0, time.monotonic() - self.last_run - self.interval)
+
+
+_tasks: Dict[str, PeriodicTask] = {}
+_leader: Optional[LeaderLock] = None
+
+
+def register_task(name: str, interval: float, func: Callable[[], None]) -> None:
+    """
+    Register a periodic task (interval <= 0 disables it)
+    """
+    if interval <= 0:
+        logger.info(f"Scheduled task '{name}' disabled")
+        return
+    _tasks[name] = PeriodicTask(name, interval, func)
+
+
+def start_scheduler(engine: Optional[Engine] = None) -> None:
+    """
+    Start all registered tasks (run only by the leader process of engine's
+    database, if given)
+    """
+    global _leader
+    if engine is not None and _leader is None:
+        _leader = LeaderLock(engine)
+    for task in _tasks.values():
+        logger.info(f"Starting scheduled task '{task.name}' (every {task.interval}s)")
+        task.leader = _leader
+        task.start()
+
+
+def stop_scheduler() -> None:
+    """
+    Signal all registered tasks to stop, and give up leadership
+    """
+    for task in _tasks.values():
+        task.stop()
+    if _leader is not None:
+        _leader.release()
+
+
+def is_leader() -> Optional[bool]:
+    """
+    Whether this process runs the scheduled tasks (None without a leader lock)
+    """
+    return None if _leader is None else _leader.leading
+
+
+def task_status() -> Dict[str, dict]:
+    """
+    Get the schedule state of every registered task
+    """
+    return {
+        name: {"interval": task.interval, "running": task.running, "overdue_seconds": round(task.overdue_seconds(), 1)}
+        for name, task in _tasks.items()
+    }
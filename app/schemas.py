@@ -1,6 +1,7 @@
-from pydantic import BaseModel, Field
+from pydantic import BaseModel, Field, field_validator, model_validator
 from typing import Optional
 from datetime import datetime
+from app import units
 
 
 class TodoBase(BaseModel):
@@ -49,6 +50,8 @@ class TodoListResponse(BaseModel):
     page: int
     page_size: int
     total_pages: int
+    # Search only: total stopped counting at the search candidate limit
+    total_capped: bool = False
 
 
 class ConversionHistoryCreate(BaseModel):
@@ -61,6 +64,31 @@ class ConversionHistoryCreate(BaseModel):
     result: float
     unit_type: str
 
+    @field_validator("unit_type")
+    @classmethod
+    def validate_unit_type(cls, v: str) -> str:
+        """Unit type must be in the unit registry"""
+        if units.unit_type_id(v) is None:
+            raise ValueError(f"Unknown unit type '{v}'. Valid types: {', '.join(units.UNIT_TYPE_IDS)}")
+        return v.strip().lower()
+
+    @field_validator("from_unit", "to_unit")
+    @classmethod
+    def validate_unit(cls, v: str) -> str:
+        """Unit must be in the unit registry"""
+        if units.unit_id(v) is None:
+            raise ValueError(f"Unknown unit '{v}'")
+        return v.strip().lower()
+
+    @model_validator(mode="after")
+    def validate_units_match_type(self):
+        """Both units must belong to unit_type"""
+        type_id = units.unit_type_id(self.unit_type)
+        for unit in (self.from_unit, self.to_unit):
+            if units.UNIT_TYPE_OF_UNIT[units.unit_id(unit)] != type_id:
+                raise ValueError(f"Unit '{unit}' is not a {self.unit_type} unit")
+        return self
+
 
 class ConversionHistoryResponse(BaseModel):
     """
@@ -77,3 +105,50 @@ class ConversionHistoryResponse(BaseModel):
     class Config:
         from_attributes = True
 
+
+
+class ConversionStatsResponse(BaseModel):
+    """
+    Schema for aggregated conversion statistics of one unit pair
+    """
+    unit_type: str
+    from_unit: str
+    to_unit: str
+    count: int
+    value_sum: float
+    value_min: float
+    value_max: float
+    value_avg: float
+
+
+class RollupRunResponse(BaseModel):
+    """
+    Schema for a manual rollup run
+    """
+    processed: int
+    watermark: int
+
+
+class TenantUsageResponse(BaseModel):
+    """
+    Schema for a tenant's conversion history usage
+    """
+    tenant: str
+    rows: int
+    quota: Optional[int] = None
+
+
+class JobResponse(BaseModel):
+    """
+    Schema for background job status
+    """
+    id: str
+    kind: str
+    status: str
+    params: dict
+    processed: int
+    total: Optional[int] = None
+    error: Optional[str] = None
+    result: Optional[dict] = None
+    created_at: datetime
+    finished_at: Optional[datetime] = None
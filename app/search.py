@@ -0,0 +1,195 @@
+import math
+import os
+import re
+from typing import List, Optional
+from sqlalchemy import select, func, text, literal_column, table, column
+from sqlalchemy.engine import Engine
+from sqlalchemy.orm import Session
+from app import models
+
+# Matches ranked per search: the newest ones, so a common term costs a
+# bounded amount of work; beyond it the total is reported as capped
+SEARCH_MAX_CANDIDATES = int(os.getenv("SEARCH_MAX_CANDIDATES", "200"))
+
+# SQLite: FTS5 table keyed by todo id (rowid), maintained from crud.py;
+# prefix indexes serve the search-as-you-type prefix of 2-3 characters
+FTS_TABLE = "todos_fts"
+FTS_OPTIONS = "title, description, prefix='2 3'"
+todos_fts = table(FTS_TABLE, column("rowid"), column("title"), column("description"))
+
+# PostgreSQL: GIN expression index; queries must use the identical expression
+PG_CONFIG = "english"
+PG_INDEX = "ix_todos_search"
+PG_DOCUMENT = (
+    f"to_tsvector('{PG_CONFIG}', coalesce(todos.title, '') || ' ' || coalesce(todos.description, ''))"
+)
+
+
+def _dialect(bind) -> str:
+    return bind.dialect.name
+
+
+def init_search_index(engine: Engine) -> None:
+    """
+    Create the full-text index for todos (and backfill it on SQLite)
+    """
+    with engine.begin() as conn:
+        if _dialect(engine) == "sqlite":
+            sql = conn.scalar(
+                text("SELECT sql FROM sqlite_master WHERE type = 'table' AND name = :name"),
+                {"name": FTS_TABLE}
+            )
+            if sql is not None and FTS_OPTIONS not in sql:
+                # Created with other options (older schema): rebuild
+                conn.execute(text(f"DROP TABLE {FTS_TABLE}"))
+                sql = None
+            if sql is None:
+                conn.execute(text(f"CREATE VIRTUAL TABLE {FTS_TABLE} USING fts5({FTS_OPTIONS})"))
+                conn.execute(text(
+                    f"INSERT INTO {FTS_TABLE} (rowid, title, description) "
+                    "SELECT id, title, coalesce(description, '') FROM todos"
+                ))
+        elif _dialect(engine) == "postgresql":
+            conn.execute(text(
+                f"CREATE INDEX IF NOT EXISTS {PG_INDEX} ON todos USING GIN "
+                f"({PG_DOCUMENT.replace('todos.', '')})"
+            ))
+
+
+def index_todo(db: Session, todo_id: int, title: str, description: Optional[str]) -> None:
+    """
+    Add or replace a todo in the search index (PostgreSQL indexes itself)
+    """
+    if _dialect(db.get_bind()) != "sqlite":
+        return
+    db.execute(
+        text(f"INSERT OR REPLACE INTO {FTS_TABLE} (rowid, title, description) VALUES (:id, :title, :description)"),
+        {"id": todo_id, "title": title, "description": description or ""}
+    )
+
+
+def index_todos(db: Session, todos: List[tuple]) -> None:
+    """
+    Add or replace many (id, title, description) todos in the search index
+    """
+    if not todos or _dialect(db.get_bind()) != "sqlite":
+        return
+    db.execute(
+        text(f"INSERT OR REPLACE INTO {FTS_TABLE} (rowid, title, description) VALUES (:id, :title, :description)"),
+        [{"id": todo_id, "title": title, "description": description or ""} for todo_id, title, description in todos]
+    )
+
+
+def unindex_todo(db: Session, todo_id: int) -> None:
+    """
+    Remove a todo from the search index (PostgreSQL indexes itself)
+    """
+    if _dialect(db.get_bind()) != "sqlite":
+        return
+    db.execute(text(f"DELETE FROM {FTS_TABLE} WHERE rowid = :id"), {"id": todo_id})
+
+
+def _fts5_query(q: str) -> str:
+    # Quote every term so user input cannot inject FTS5 query syntax;
+    # the last term is a prefix match for search-as-you-type
+    terms = ['"' + term.replace('"', '""') + '"' for term in q.split()]
+    if terms:
+        terms[-1] += "*"
+    return " ".join(terms)
+
+
+# Tokens the way FTS5's default unicode61 tokenizer splits them (close enough for ranking)
+_TOKEN = re.compile(r"[^\W_]+")
+# BM25 parameters (FTS5's bm25() defaults)
+_K1 = 1.2
+_B = 0.75
+
+
+def _bm25_order(q: str, candidates: list) -> List[int]:
+    """
+    Order (id, title, description) candidates by BM25 over the candidate set
+
+    FTS5's bm25() reads every match of each term to get its document
+    frequency; computing the frequencies over the candidates instead keeps
+    ranking bounded. The last query term is a prefix, as in the MATCH.
+    """
+    terms = [token for word in q.split() for token in _TOKEN.findall(word.casefold())]
+    if not terms or not candidates:
+        return [row[0] for row in candidates]
+    prefix = terms[-1]
+    exact = set(terms[:-1])
+    documents = []
+    for todo_id, title, description in candidates:
+        tokens = _TOKEN.findall(f"{title} {description or ''}".casefold())
+        counts = {term: tokens.count(term) for term in exact}
+        # Hits of the trailing prefix term, over every token it starts
+        counts[prefix] = sum(1 for token in tokens if token.startswith(prefix))
+        documents.append((todo_id, counts, len(tokens)))
+    total = len(documents)
+    average_length = sum(length for _, _, length in documents) / total or 1.0
+    idf = {}
+    for term in set(terms):
+        frequency = sum(1 for _, counts, _ in documents if counts[term])
+        idf[term] = math.log((total - frequency + 0.5) / (frequency + 0.5) + 1)
+
+    def score(document) -> float:
+        todo_id, counts, length = document
+        norm = _K1 * (1 - _B + _B * length / average_length)
+        return sum(idf[term] * counts[term] * (_K1 + 1) / (counts[term] + norm) for term in terms)
+
+    # Best score first, then newest
+    return [document[0] for document in sorted(documents, key=lambda document: (-score(document), -document[0]))]
+
+
+def search_todos(
+    db: Session,
+    q: str,
+    skip: int = 0,
+    limit: int = 100,
+    completed: Optional[bool] = None
+) -> tuple[List[models.Todo], int, bool]:
+    """
+    Full-text search over todo titles and descriptions, best match first
+
+    Only the newest SEARCH_MAX_CANDIDATES matches are counted and ranked,
+    so neither the count nor the ranking scans every match of a common term.
+    Returns:
+        tuple: (list of todos, match count, whether the count hit the cap)
+    """
+    todo = models.Todo
+    # One more than the cap tells whether there are more matches
+    fetch = SEARCH_MAX_CANDIDATES + 1
+    if _dialect(db.get_bind()) == "sqlite":
+        match = _fts5_query(q)
+        if not match:
+            return [], 0, False
+        # FTS5 walks its rowids newest first and stops after `fetch` matches
+        candidates = (
+            select(todos_fts.c.rowid, todos_fts.c.title, todos_fts.c.description)
+            .where(text(f"{FTS_TABLE} MATCH :match").bindparams(match=match))
+            .order_by(todos_fts.c.rowid.desc())
+            .limit(fetch)
+        )
+        if completed is not None:
+            candidates = candidates.join(todo, todo.id == todos_fts.c.rowid).where(todo.completed == completed)
+        rows = db.execute(candidates).all()
+        capped = len(rows) > SEARCH_MAX_CANDIDATES
+        ranked = _bm25_order(q, rows[:SEARCH_MAX_CANDIDATES])
+    else:
+        document = literal_column(PG_DOCUMENT)
+        ts_query = func.websearch_to_tsquery(literal_column(f"'{PG_CONFIG}'"), q)
+        newest = select(todo.id).where(document.op("@@")(ts_query)).order_by(todo.id.desc()).limit(fetch)
+        if completed is not None:
+            newest = newest.where(todo.completed == completed)
+        newest = newest.subquery()
+        # ts_rank runs on the candidates only
+        rows = db.execute(
+            select(todo.id, func.ts_rank(document, ts_query).label("rank")).join(newest, newest.c.id == todo.id)
+        ).all()
+        capped = len(rows) > SEARCH_MAX_CANDIDATES
+        rows = sorted(rows, key=lambda row: -row.id)[:SEARCH_MAX_CANDIDATES]
+        ranked = [row.id for row in sorted(rows, key=lambda row: (-row.rank, -row.id))]
+
+    page = ranked[skip:skip + limit]
+    todos = {row.id: row for row in db.scalars(select(todo).where(todo.id.in_(page)))} if page else {}
+    return [todos[todo_id] for todo_id in page if todo_id in todos], len(ranked), capped
@@ -0,0 +1,208 @@
+"""
+Sharded, parallel Excel export
+
+Tables are split into id ranges of at most EXPORT_SHARD_ROWS rows. Each
+shard is rendered into its own workbook by a worker process (openpyxl
+write-only mode, rows streamed from the database), and the workbooks are
+bundled into one zip. Every shard workbook uses the regular sheet names
+("Todos", "Conversion History"), so each can be re-imported on its own.
+Given a tenant, only that tenant's conversion history is exported.
+"""
+import logging
+import os
+import shutil
+import tempfile
+import uuid
+import zipfile
+from datetime import datetime
+from pathlib import Path
+from typing import List, Optional, Tuple
+from sqlalchemy import create_engine, func, select
+from sqlalchemy.orm import Session
+from app import executors, models, units
+
+logger = logging.getLogger(__name__)
+
+# Rows per Excel worksheet, including the header row
+EXCEL_MAX_ROWS = 1_048_576
+# Rows per shard workbook (capped to what fits on one sheet)
+EXPORT_SHARD_ROWS = min(int(os.getenv("EXPORT_SHARD_ROWS", "250000")), EXCEL_MAX_ROWS - 1)
+# Worker processes rendering shards (0 = one per CPU)
+EXPORT_WORKERS = int(os.getenv("EXPORT_WORKERS", "0")) or os.cpu_count() or 1
+# Shards waiting for a worker, across all running exports
+EXPORT_QUEUE = int(os.getenv("EXPORT_QUEUE", "256"))
+
+EXPORTS_DIR = Path(__file__).resolve().parent.parent / "exports"
+
+TABLES = {
+    "todos": (models.Todo, "Todos", ["ID", "Title", "Description", "Completed", "Created At", "Updated At"]),
+    "conversion_history": (
+        models.ConversionHistory,
+        "Conversion History",
+        ["ID", "Value", "From Unit", "To Unit", "Result", "Unit Type", "Created At"],
+    ),
+}
+
+
+def _format_datetime(value) -> str:
+    return value.strftime("%Y-%m-%d %H:%M:%S") if value else ""
+
+
+def _todo_values(row) -> list:
+    return [
+        row.id,
+        row.title,
+        row.description or "",
+        "Yes" if row.completed else "No",
+        _format_datetime(row.created_at),
+        _format_datetime(row.updated_at),
+    ]
+
+
+def _conversion_values(row) -> list:
+    return [
+        row.id,
+        row.value,
+        units.unit_name(row.from_unit_id, row.legacy_from_unit),
+        units.unit_name(row.to_unit_id, row.legacy_to_unit),
+        row.result,
+        units.unit_type_name(row.unit_type_id, row.legacy_unit_type),
+        _format_datetime(row.created_at),
+    ]
+
+
+ROW_VALUES = {"todos": _todo_values, "conversion_history": _conversion_values}
+
+# Shared by all exports and started on first use (spawn: forking a threaded
+# server process can copy held locks into the children)
+pool = executors.WorkerPool("export", "process", EXPORT_WORKERS, EXPORT_QUEUE)
+executors.pools[pool.name] = pool
+
+
+def _tenant_rows(query, model, tenant_id: Optional[str]):
+    # Only conversion history has tenants
+    if tenant_id is not None and hasattr(model, "tenant_id"):
+        return query.where(model.tenant_id == tenant_id)
+    return query
+
+
+def plan_shards(
+    db: Session, table: str, shard_rows: int = EXPORT_SHARD_ROWS, tenant_id: Optional[str] = None
+) -> List[Tuple[int, int, int]]:
+    """
+    Split a table (conversion history: one tenant's rows) into id ranges
+    holding at most shard_rows rows each
+    Returns:
+        list: (first id, last id, rows) per shard, in id order
+    """
+    model = TABLES[table][0]
+    # Buckets of shard_rows consecutive ids can never exceed shard_rows rows;
+    # sparse neighbouring buckets (deleted ranges) are merged below
+    bucket = (model.id - 1) // shard_rows
+    buckets = db.execute(
+        _tenant_rows(select(func.min(model.id), func.max(model.id), func.count()), model, tenant_id)
+        .group_by(bucket)
+        .order_by(bucket)
+    ).all()
+
+    shards: List[Tuple[int, int, int]] = []
+    for first_id, last_id, rows in buckets:
+        if shards and shards[-1][2] + rows <= shard_rows:
+            shards[-1] = (shards[-1][0], last_id, shards[-1][2] + rows)
+        else:
+            shards.append((first_id, last_id, rows))
+    return shards
+
+
+def render_shard(
+    database_url: str, table: str, first_id: int, last_id: int, path: str, tenant_id: Optional[str] = None
+) -> int:
+    """
+    Write the rows of one id range to a workbook (runs in a worker process)
+    Returns:
+        int: Number of rows written
+    """
+    from openpyxl import Workbook
+    from openpyxl.cell import WriteOnlyCell
+    from openpyxl.styles import Font, PatternFill, Alignment
+
+    model, title, headers = TABLES[table]
+    to_values = ROW_VALUES[table]
+
+    wb = Workbook(write_only=True)
+    sheet = wb.create_sheet(title)
+    header_fill = PatternFill(start_color="667eea", end_color="667eea", fill_type="solid")
+    header_font = Font(bold=True, color="FFFFFF")
+    header_row = []
+    for header in headers:
+        cell = WriteOnlyCell(sheet, value=header)
+        cell.fill = header_fill
+        cell.font = header_font
+        cell.alignment = Alignment(horizontal="center", vertical="center")
+        header_row.append(cell)
+    sheet.append(header_row)
+
+    engine = create_engine(database_url)
+    written = 0
+    try:
+        with engine.connect() as conn:
+            result = conn.execution_options(stream_results=True, yield_per=5000).execute(
+                _tenant_rows(select(model.__table__), model, tenant_id)
+                .where(model.id >= first_id, model.id <= last_id)
+                .order_by(model.id)
+            )
+            for row in result:
+                sheet.append(to_values(row))
+                written += 1
+    finally:
+        engine.dispose()
+
+    wb.save(path)
+    return written
+
+
+def export_sharded(
+    db: Session, tables: List[str], shard_rows: int = EXPORT_SHARD_ROWS, tenant_id: Optional[str] = None
+) -> str:
+    """
+    Export tables (conversion history: one tenant's rows, if given) as a
+    zip of shard workbooks rendered in parallel
+    Returns:
+        str: Path of the zip file
+    """
+    database_url = db.get_bind().url.render_as_string(hide_password=False)
+    stamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+    EXPORTS_DIR.mkdir(exist_ok=True)
+    # Unique per call: exports started in the same second must not share files
+    work_dir = Path(tempfile.mkdtemp(prefix=f"sharded_{stamp}_", dir=EXPORTS_DIR))
+
+    jobs = []
+    for table in tables:
+        # An empty table still gets one (header-only) workbook
+        shards = plan_shards(db, table, shard_rows, tenant_id) or [(1, 0, 0)]
+        for number, (first_id, last_id, _) in enumerate(shards, start=1):
+            name = f"{table}_{number:04d}.xlsx" if len(shards) > 1 else f"{table}.xlsx"
+            jobs.append((table, first_id, last_id, str(work_dir / name)))
+    # The planning queries are done; don't hold the connection while workers render
+    db.rollback()
+
+    futures = []
+    try:
+        logger.info(f"Rendering {len(jobs)} export shard(s) on the {pool.max_workers}-process export pool")
+        for job in jobs:
+            futures.append(pool.submit(render_shard, database_url, *job, tenant_id))
+        written = [future.result() for future in futures]
+
+        zip_path = EXPORTS_DIR / f"database_export_{stamp}_{uuid.uuid4().hex[:8]}.zip"
+        # Workbooks are already deflate-compressed: store them as they are
+        with zipfile.ZipFile(zip_path, "w", compression=zipfile.ZIP_STORED) as bundle:
+            for _, _, _, path in jobs:
+                bundle.write(path, arcname=os.path.basename(path))
+    finally:
+        # Shards of a failed export that have not started yet are dropped
+        for future in futures:
+            future.cancel()
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+    logger.info(f"Sharded export {zip_path.name}: {sum(written)} rows in {len(jobs)} workbook(s)")
+    return str(zip_path)
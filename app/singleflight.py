@@ -0,0 +1,141 @@
+import asyncio
+import threading
+from typing import Any, Awaitable, Callable, Dict, Hashable, Optional, Tuple
+from app import metrics
+
+
+class _Call:
+    __slots__ = ("done", "result", "error", "waiters")
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+        self.waiters = 0
+
+
+_calls: Dict[Tuple[Hashable, ...], _Call] = {}
+_lock = threading.Lock()
+
+metrics.register_gauge("singleflight", lambda: {
+    "in_flight": len(_calls) + len(_flights),
+    "waiting": sum(call.waiters for call in list(_calls.values()))
+    + sum(max(0, flight.callers - 1) for flight in list(_flights.values())),
+})
+
+
+def do(key: Tuple[Hashable, ...], func: Callable[[], Any]) -> Any:
+    """
+    Run func once for concurrent callers with the same key
+
+    The first caller runs func; callers arriving while it runs wait and get
+    the same result (or exception). Nothing is cached after it finishes.
+    key[0] names the operation and labels the metrics.
+    """
+    with _lock:
+        call = _calls.get(key)
+        leader = call is None
+        if leader:
+            call = _calls[key] = _Call()
+        else:
+            call.waiters += 1
+
+    if not leader:
+        metrics.increment("singleflight_collapsed", operation=key[0])
+        call.done.wait()
+        if call.error is not None:
+            raise call.error
+        return call.result
+
+    metrics.increment("singleflight_executed", operation=key[0])
+    try:
+        call.result = func()
+        return call.result
+    except BaseException as e:
+        call.error = e
+        raise
+    finally:
+        with _lock:
+            del _calls[key]
+        call.done.set()
+
+
+class Flight:
+    """
+    One in-flight async call shared by concurrent callers (see join)
+    """
+    __slots__ = ("key", "task", "callers", "cleanup")
+
+    def __init__(self, key: Tuple[Hashable, ...], task: asyncio.Task, cleanup: Optional[Callable[[Any], None]]):
+        self.key = key
+        self.task = task
+        self.callers = 0
+        self.cleanup = cleanup
+
+    @property
+    def result(self) -> Any:
+        return self.task.result()
+
+    def release(self) -> None:
+        """
+        Done with the result (the last release runs cleanup)
+        """
+        self.callers -= 1
+        self._maybe_cleanup()
+
+    def _finished(self, task: asyncio.Task) -> None:
+        # Callers arriving from now on start a new flight
+        if _flights.get(self.key) is self:
+            del _flights[self.key]
+        if not task.cancelled():
+            task.exception()  # raised to the callers; don't log it as never retrieved
+        self._maybe_cleanup()
+
+    def _maybe_cleanup(self) -> None:
+        if self.callers or not self.task.done() or self.cleanup is None:
+            return
+        cleanup, self.cleanup = self.cleanup, None
+        if not self.task.cancelled() and self.task.exception() is None:
+            cleanup(self.task.result())
+
+
+_flights: Dict[Tuple[Hashable, ...], Flight] = {}
+
+
+async def join(
+    key: Tuple[Hashable, ...],
+    func: Callable[[], Awaitable[Any]],
+    cleanup: Optional[Callable[[Any], None]] = None
+) -> Flight:
+    """
+    Async variant of do() for the event loop: run func() once for
+    concurrent callers with the same key
+
+    The first caller starts func() as a task; callers arriving while it runs
+    await the same task, so followers hold no worker thread or pool slot.
+    A caller that goes away does not cancel it. Each caller must release()
+    the returned flight; cleanup(result) runs after the last release.
+    """
+    flight = _flights.get(key)
+    if flight is None:
+        flight = _flights[key] = Flight(key, asyncio.ensure_future(func()), cleanup)
+        flight.task.add_done_callback(flight._finished)
+        metrics.increment("singleflight_executed", operation=key[0])
+    else:
+        metrics.increment("singleflight_collapsed", operation=key[0])
+    flight.callers += 1
+    try:
+        await asyncio.shield(flight.task)
+    except BaseException:
+        flight.release()
+        raise
+    return flight
+
+
+async def do_async(key: Tuple[Hashable, ...], func: Callable[[], Awaitable[Any]]) -> Any:
+    """
+    Run func() once for concurrent callers with the same key (see join)
+    """
+    flight = await join(key, func)
+    flight.release()
+    return flight.result
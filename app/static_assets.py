@@ -0,0 +1,131 @@
+import gzip
+import hashlib
+import logging
+import mimetypes
+import os
+import re
+from pathlib import Path
+from typing import Dict, Optional
+from fastapi import Request, Response
+
+try:
+    import brotli
+except ImportError:  # Optional: gzip only without the brotli package
+    brotli = None
+
+logger = logging.getLogger(__name__)
+
+# Files named like "app.3f2a9c1d.js" never change and can be cached forever
+HASHED_ASSET = re.compile(r"\.[0-9a-f]{8,}\.[A-Za-z0-9]+$")
+IMMUTABLE_CACHE_CONTROL = "public, max-age=31536000, immutable"
+# Other files are revalidated with their ETag (cheap 304)
+REVALIDATE_CACHE_CONTROL = "public, no-cache"
+
+COMPRESSIBLE_TYPES = ("text/", "application/javascript", "application/json", "image/svg+xml")
+MIN_COMPRESS_SIZE = 512
+
+# Re-read a file when its mtime changes (useful with the docker-compose static volume)
+STATIC_AUTO_RELOAD = os.getenv("STATIC_AUTO_RELOAD", "false").lower() in ("1", "true", "yes")
+
+
+class StaticAsset:
+    """
+    A static file held in memory with precompressed variants and strong ETags
+    """
+
+    def __init__(self, path: Path):
+        self.path = path
+        self.mtime = path.stat().st_mtime
+        content = path.read_bytes()
+        self.media_type = mimetypes.guess_type(path.name)[0] or "application/octet-stream"
+        if self.media_type.startswith("text/"):
+            self.media_type += "; charset=utf-8"
+        self.cache_control = IMMUTABLE_CACHE_CONTROL if HASHED_ASSET.search(path.name) else REVALIDATE_CACHE_CONTROL
+
+        digest = hashlib.sha256(content).hexdigest()[:32]
+        # Each encoding is a different representation, so it gets its own strong ETag
+        self.variants: Dict[str, bytes] = {"identity": content}
+        self.etags: Dict[str, str] = {"identity": f'"{digest}"'}
+        if len(content) >= MIN_COMPRESS_SIZE and self.media_type.startswith(COMPRESSIBLE_TYPES):
+            self.variants["gzip"] = gzip.compress(content, compresslevel=9, mtime=0)
+            self.etags["gzip"] = f'"{digest}-gz"'
+            if brotli is not None:
+                self.variants["br"] = brotli.compress(content, quality=11)
+                self.etags["br"] = f'"{digest}-br"'
+
+    def negotiate(self, accept_encoding: str) -> str:
+        """
+        Pick the smallest variant the client accepts
+        """
+        accepted = set()
+        for part in accept_encoding.split(","):
+            coding, _, params = part.strip().partition(";")
+            params = params.replace(" ", "")
+            if coding and params not in ("q=0", "q=0.0", "q=0.00", "q=0.000"):
+                accepted.add(coding.lower())
+        for coding in ("br", "gzip"):
+            if coding in self.variants and (coding in accepted or "*" in accepted):
+                return coding
+        return "identity"
+
+
+class StaticAssetCache:
+    """
+    Loads every file of a directory into memory once and serves it with
+    content negotiation, ETag/304 handling and cache headers
+    """
+
+    def __init__(self, directory: Path):
+        self.directory = directory
+        self._assets: Dict[str, StaticAsset] = {}
+
+    def load(self) -> None:
+        """
+        (Re)load and precompress all files
+        """
+        assets = {}
+        for path in sorted(self.directory.rglob("*")):
+            if path.is_file():
+                assets[path.relative_to(self.directory).as_posix()] = StaticAsset(path)
+        self._assets = assets
+        logger.info(f"Loaded {len(assets)} static assets (brotli {'enabled' if brotli else 'unavailable'})")
+
+    def get(self, name: str) -> Optional[StaticAsset]:
+        asset = self._assets.get(name)
+        if asset is not None and STATIC_AUTO_RELOAD:
+            try:
+                if asset.path.stat().st_mtime != asset.mtime:
+                    asset = self._assets[name] = StaticAsset(asset.path)
+            except FileNotFoundError:
+                self._assets.pop(name, None)
+                return None
+        return asset
+
+    def response(self, request: Request, name: str) -> Optional[Response]:
+        """
+        Build the response for a static file, or None if it does not exist
+        """
+        asset = self.get(name)
+        if asset is None:
+            return None
+
+        coding = asset.negotiate(request.headers.get("accept-encoding", ""))
+        headers = {
+            "ETag": asset.etags[coding],
+            "Cache-Control": asset.cache_control,
+            "Vary": "Accept-Encoding",
+        }
+
+        if_none_match = request.headers.get("if-none-match")
+        if if_none_match:
+            tags = {tag.strip().removeprefix("W/") for tag in if_none_match.split(",")}
+            if "*" in tags or tags & set(asset.etags.values()):
+                return Response(status_code=304, headers=headers)
+
+        if coding != "identity":
+            headers["Content-Encoding"] = coding
+        body = asset.variants[coding]
+        if request.method == "HEAD":
+            headers["Content-Length"] = str(len(body))
+            body = b""
+        return Response(content=body, media_type=asset.media_type, headers=headers)
@@ -0,0 +1,193 @@
+"""
+Tenants of the conversion history
+
+A tenant is resolved from the X-API-Key header (TENANT_API_KEYS maps keys
+to tenant names); requests without a key belong to the "default" tenant
+unless TENANT_REQUIRE_API_KEY is set. History rows carry tenant_id and
+every history query is filtered by it. On PostgreSQL conversion_history
+is LIST-partitioned by tenant_id (one partition per configured tenant
+plus a DEFAULT partition), so those queries touch a single partition; on
+SQLite they use the (tenant_id, ...) indexes.
+"""
+import logging
+import os
+import re
+from typing import Dict, List, Optional
+from fastapi import Depends, Header, HTTPException
+from sqlalchemy import func, select, text
+from sqlalchemy.engine import Engine
+from sqlalchemy.orm import Session
+from app import models, counters, metrics
+
+logger = logging.getLogger(__name__)
+
+API_KEY_HEADER = "X-API-Key"
+DEFAULT_TENANT = "default"
+
+_TENANT_NAME = re.compile(r"^[A-Za-z0-9_-]{1,48}$")
+
+
+def _parse_pairs(value: str, setting: str) -> Dict[str, str]:
+    pairs = {}
+    for item in value.split(","):
+        if not item.strip():
+            continue
+        key, sep, name = item.strip().rpartition(":")
+        if not sep or not key or not name:
+            raise ValueError(f"{setting}: expected key:value pairs, got {item.strip()!r}")
+        pairs[key] = name
+    return pairs
+
+
+# "key1:acme,key2:globex" -> API key -> tenant
+TENANT_API_KEYS = _parse_pairs(os.getenv("TENANT_API_KEYS", ""), "TENANT_API_KEYS")
+for _tenant in TENANT_API_KEYS.values():
+    if not _TENANT_NAME.match(_tenant):
+        raise ValueError(f"TENANT_API_KEYS: invalid tenant name {_tenant!r} (letters, digits, _ and -)")
+# Reject requests without a known API key instead of using the default tenant
+TENANT_REQUIRE_API_KEY = os.getenv("TENANT_REQUIRE_API_KEY", "false").lower() in ("1", "true", "yes")
+# Maximum history rows per tenant (0 = unlimited), with per-tenant overrides "acme:1000000,globex:0"
+TENANT_HISTORY_QUOTA = int(os.getenv("TENANT_HISTORY_QUOTA", "0"))
+TENANT_HISTORY_QUOTAS = {
+    tenant: int(rows)
+    for tenant, rows in _parse_pairs(os.getenv("TENANT_HISTORY_QUOTAS", ""), "TENANT_HISTORY_QUOTAS").items()
+}
+# Tenants that see database-wide diagnostics and may run maintenance endpoints
+TENANT_ADMINS = {name.strip() for name in os.getenv("TENANT_ADMINS", DEFAULT_TENANT).split(",") if name.strip()}
+
+
+def tenant_names() -> List[str]:
+    """
+    Get the configured tenants (always including the default tenant)
+    """
+    return sorted({DEFAULT_TENANT, *TENANT_API_KEYS.values()})
+
+
+def resolve(api_key: Optional[str]) -> str:
+    """
+    Get the tenant of an API key
+    Raises:
+        HTTPException: 401 for an unknown key, or a missing one when keys are required
+    """
+    if api_key:
+        tenant = TENANT_API_KEYS.get(api_key)
+        if tenant is None:
+            raise HTTPException(status_code=401, detail="Invalid API key")
+        return tenant
+    if TENANT_REQUIRE_API_KEY:
+        raise HTTPException(status_code=401, detail=f"Missing {API_KEY_HEADER} header")
+    return DEFAULT_TENANT
+
+
+def get_tenant(api_key: Optional[str] = Header(None, alias=API_KEY_HEADER)) -> str:
+    """
+    Dependency: the tenant of the request
+    """
+    tenant = resolve(api_key)
+    metrics.increment("tenant_requests", tenant=tenant)
+    return tenant
+
+
+def is_admin(tenant: str) -> bool:
+    """
+    True if the tenant is listed in TENANT_ADMINS
+    """
+    return tenant in TENANT_ADMINS
+
+
+def require_admin(tenant: str = Depends(get_tenant)) -> str:
+    """
+    Dependency: the tenant of the request, which must be an admin
+    Raises:
+        HTTPException: 403 for other tenants
+    """
+    if not is_admin(tenant):
+        raise HTTPException(status_code=403, detail="Admin tenant required")
+    return tenant
+
+
+def history_quota(tenant: str) -> int:
+    """
+    Get the history row quota of a tenant (0 = unlimited)
+    """
+    return TENANT_HISTORY_QUOTAS.get(tenant, TENANT_HISTORY_QUOTA)
+
+
+def history_rows(db: Session, tenant: str) -> int:
+    """
+    Get the number of history rows of a tenant (a counter lookup)
+    """
+    rows = counters.count(db, counters.HISTORY, counters.history_tenant(tenant))
+    if rows is None:
+        history = models.ConversionHistory
+        rows = db.scalar(select(func.count()).select_from(history).where(history.tenant_id == tenant))
+    return rows
+
+
+def check_history_quota(db: Session, tenant: str, adding: int = 1) -> None:
+    """
+    Raise 429 if adding rows would exceed the tenant's quota
+
+    The check is not atomic with the insert, so concurrent writers can
+    overshoot the quota by a few rows.
+    """
+    quota = history_quota(tenant)
+    if quota and history_rows(db, tenant) + adding > quota:
+        metrics.increment("tenant_quota_rejections", tenant=tenant)
+        raise HTTPException(status_code=429, detail=f"Conversion history quota of {quota} rows reached")
+
+
+def partition_name(tenant: str) -> str:
+    return f"conversion_history_t_{tenant.lower().replace('-', '_')}"
+
+
+def own_partition(db: Session, tenant: str) -> Optional[str]:
+    """
+    Get the tenant's own PostgreSQL partition of conversion_history
+    (None on SQLite, or when its rows are in the DEFAULT partition)
+    """
+    if db.get_bind().dialect.name != "postgresql":
+        return None
+    name = partition_name(tenant)
+    attached = db.scalar(text(
+        "SELECT EXISTS (SELECT 1 FROM pg_inherits i JOIN pg_class c ON c.oid = i.inhrelid "
+        "JOIN pg_class p ON p.oid = i.inhparent WHERE p.relname = 'conversion_history' AND c.relname = :name)"
+    ), {"name": name})
+    return name if attached else None
+
+
+def ensure_partitions(engine: Engine) -> None:
+    """
+    Create the PostgreSQL partitions of newly configured tenants
+
+    A tenant whose rows already landed in the DEFAULT partition keeps
+    using it (PostgreSQL refuses the new partition); a warning is logged.
+    """
+    if engine.dialect.name != "postgresql":
+        return
+    with engine.connect() as conn:
+        partitioned = conn.scalar(text(
+            "SELECT EXISTS (SELECT 1 FROM pg_partitioned_table p JOIN pg_class c ON c.oid = p.partrelid "
+            "WHERE c.relname = 'conversion_history')"
+        ))
+        if not partitioned:
+            return
+        existing = set(conn.scalars(text(
+            "SELECT c.relname FROM pg_inherits i JOIN pg_class c ON c.oid = i.inhrelid "
+            "JOIN pg_class p ON p.oid = i.inhparent WHERE p.relname = 'conversion_history'"
+        )))
+    for tenant in tenant_names():
+        name = partition_name(tenant)
+        if name in existing:
+            continue
+        try:
+            with engine.begin() as conn:
+                # Tenant names are validated: [A-Za-z0-9_-]
+                conn.execute(text(f"CREATE TABLE {name} PARTITION OF conversion_history FOR VALUES IN ('{tenant}')"))
+            logger.info(f"Created conversion_history partition {name}")
+        except Exception as e:
+            logger.warning(f"Tenant {tenant!r} stays in the default partition: {e}")
+    if "conversion_history_other" not in existing:
+        with engine.begin() as conn:
+            conn.execute(text("CREATE TABLE IF NOT EXISTS conversion_history_other "
+                              "PARTITION OF conversion_history DEFAULT"))
@@ -0,0 +1,71 @@
+"""
+Stable small-integer ids for unit types and units
+
+Conversion history stores these ids instead of unit name strings.
+Ids are persisted: only append new entries, never renumber or reuse them.
+"""
+from typing import Optional
+
+UNKNOWN_ID = 0
+UNKNOWN_NAME = "unknown"
+
+UNIT_TYPE_IDS = {
+    "length": 1,
+    "weight": 2,
+    "temperature": 3,
+}
+
+UNIT_IDS = {
+    # length
+    "meter": 1,
+    "kilometer": 2,
+    "centimeter": 3,
+    "millimeter": 4,
+    "mile": 5,
+    "foot": 6,
+    "inch": 7,
+    "yard": 8,
+    # weight
+    "kilogram": 9,
+    "gram": 10,
+    "pound": 11,
+    "ounce": 12,
+    "ton": 13,
+    # temperature
+    "celsius": 14,
+    "fahrenheit": 15,
+    "kelvin": 16,
+}
+
+# Unit type of every unit id
+UNIT_TYPE_OF_UNIT = {
+    **{UNIT_IDS[name]: UNIT_TYPE_IDS["length"] for name in (
+        "meter", "kilometer", "centimeter", "millimeter", "mile", "foot", "inch", "yard")},
+    **{UNIT_IDS[name]: UNIT_TYPE_IDS["weight"] for name in ("kilogram", "gram", "pound", "ounce", "ton")},
+    **{UNIT_IDS[name]: UNIT_TYPE_IDS["temperature"] for name in ("celsius", "fahrenheit", "kelvin")},
+}
+
+UNIT_TYPE_NAMES = {type_id: name for name, type_id in UNIT_TYPE_IDS.items()}
+UNIT_NAMES = {unit_id: name for name, unit_id in UNIT_IDS.items()}
+
+
+def unit_type_id(name: str) -> Optional[int]:
+    return UNIT_TYPE_IDS.get(name.strip().lower())
+
+
+def unit_id(name: str) -> Optional[int]:
+    return UNIT_IDS.get(name.strip().lower())
+
+
+def unit_type_name(type_id: Optional[int], legacy: Optional[str] = None) -> str:
+    """
+    legacy is the original name kept for rows migrated with an unregistered unit type
+    """
+    return UNIT_TYPE_NAMES.get(type_id) or legacy or UNKNOWN_NAME
+
+
+def unit_name(unit_id_: Optional[int], legacy: Optional[str] = None) -> str:
+    """
+    legacy is the original name kept for rows migrated with an unregistered unit
+    """
+    return UNIT_NAMES.get(unit_id_) or legacy or UNKNOWN_NAME
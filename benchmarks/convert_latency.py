@@ -0,0 +1,139 @@
+"""
+/convert latency while Excel exports run: p50/p99 with the server idle
+and with concurrent exports, for each light pool kind.
+
+Starts uvicorn on a temporary SQLite database filled with conversion
+history, measures sequential /api/converter/convert requests, then
+measures them again while --exporters threads keep requesting
+/api/export/excel/conversions (the workbooks land in exports/). With the
+heavy/light pools the p99 should stay close to the idle one; with more
+than one CPU, EXECUTOR_LIGHT_KIND=process also keeps conversions off the
+GIL the export threads hold.
+
+Usage:
+    python benchmarks/convert_latency.py [--rows 50000] [--requests 2000] [--exporters 2] [--kinds thread,process]
+"""
+import argparse
+import os
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from pathlib import Path
+
+import httpx
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+
+from sqlalchemy import create_engine, insert  # noqa: E402
+from app import models  # noqa: E402
+from app.database import Base  # noqa: E402
+
+CONVERSION = {"value": 100, "from_unit": "kilometer", "to_unit": "mile", "unit_type": "length"}
+
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def _fill(database: str, rows: int) -> None:
+    engine = create_engine(f"sqlite:///{database}")
+    Base.metadata.create_all(engine)
+    with engine.begin() as conn:
+        for start in range(0, rows, 10_000):
+            conn.execute(insert(models.ConversionHistory), [
+                {"value": i, "from_unit_id": 1, "to_unit_id": 2, "result": i / 1000, "unit_type_id": 1}
+                for i in range(start, min(start + 10_000, rows))
+            ])
+    engine.dispose()
+
+
+def _latencies(client: httpx.Client, requests: int) -> list:
+    latencies = []
+    for _ in range(requests):
+        started = time.perf_counter()
+        response = client.post("/api/converter/convert", json=CONVERSION)
+        latencies.append((time.perf_counter() - started) * 1000)
+        response.raise_for_status()
+    return latencies
+
+
+def _summary(latencies: list) -> str:
+    cuts = statistics.quantiles(latencies, n=100)
+    return f"{cuts[49]:>9.2f}{cuts[98]:>9.2f}{max(latencies):>9.2f}"
+
+
+def run(kind: str, database: str, args) -> None:
+    port = _free_port()
+    env = {
+        **os.environ,
+        "DATABASE_URL": f"sqlite:///{database}",
+        "EXECUTOR_LIGHT_KIND": kind,
+        "RATE_LIMIT_PER_SECOND": "0",
+    }
+    server = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "app.main:app", "--port", str(port), "--log-level", "warning"],
+        cwd=ROOT, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+    )
+    try:
+        with httpx.Client(base_url=f"http://127.0.0.1:{port}", timeout=120) as client:
+            for _ in range(100):
+                try:
+                    client.get("/health/live")
+                    break
+                except httpx.TransportError:
+                    time.sleep(0.1)
+            _latencies(client, 50)  # warm-up (starts the light pool)
+            print(f"  {kind:<8}{'idle':<14}{_summary(_latencies(client, args.requests))}")
+
+            stop = threading.Event()
+            exports = []
+
+            def export_loop():
+                with httpx.Client(base_url=client.base_url, timeout=300) as exporter:
+                    while not stop.is_set():
+                        # Distinct watermarks defeat request coalescing
+                        since_id = len(exports) % 7
+                        exporter.get("/api/export/excel/conversions", params={"since_id": since_id})
+                        exports.append(since_id)
+
+            threads = [threading.Thread(target=export_loop) for _ in range(args.exporters)]
+            for thread in threads:
+                thread.start()
+            time.sleep(0.5)
+            latencies = _latencies(client, args.requests)
+            stop.set()
+            for thread in threads:
+                thread.join()
+            print(f"  {kind:<8}{'exporting':<14}{_summary(latencies)}   ({len(exports)} exports)")
+    finally:
+        server.terminate()
+        server.wait()
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=50_000)
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--exporters", type=int, default=2)
+    parser.add_argument("--kinds", default="thread,process", help="Comma-separated EXECUTOR_LIGHT_KIND values")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        database = os.path.join(tmp, "bench.db")
+        _fill(database, args.rows)
+        print(f"{args.rows:,} history rows, {args.exporters} exporter(s), {os.cpu_count()} CPU(s)")
+        print(f"  {'light':<8}{'server':<14}{'p50 ms':>9}{'p99 ms':>9}{'max ms':>9}")
+        for kind in args.kinds.split(","):
+            run(kind.strip(), database, args)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
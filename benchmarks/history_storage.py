@@ -0,0 +1,131 @@
+"""
+Conversion history storage benchmark: legacy string unit columns versus
+the normalized small-integer unit ids.
+
+For each layout it measures, on a fresh SQLite file:
+  - insert rate (rows/s, batched executemany)
+  - database file size (table + indexes)
+  - grouped query time (count/avg per unit pair)
+
+Usage:
+    python benchmarks/history_storage.py [--rows 200000]
+"""
+import argparse
+import os
+import random
+import sqlite3
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from app import units  # noqa: E402
+
+LEGACY_DDL = [
+    "CREATE TABLE conversion_history (id INTEGER PRIMARY KEY, value FLOAT NOT NULL, "
+    "from_unit VARCHAR NOT NULL, to_unit VARCHAR NOT NULL, result FLOAT NOT NULL, "
+    "unit_type VARCHAR NOT NULL, created_at DATETIME DEFAULT CURRENT_TIMESTAMP NOT NULL)",
+    "CREATE INDEX ix_pair ON conversion_history (unit_type, from_unit, to_unit)",
+]
+LEGACY_INSERT = (
+    "INSERT INTO conversion_history (value, from_unit, to_unit, result, unit_type) VALUES (?, ?, ?, ?, ?)"
+)
+LEGACY_GROUPED = (
+    "SELECT unit_type, from_unit, to_unit, count(*), avg(value) FROM conversion_history "
+    "GROUP BY unit_type, from_unit, to_unit"
+)
+
+NORMALIZED_DDL = [
+    "CREATE TABLE conversion_history (id INTEGER PRIMARY KEY, value FLOAT NOT NULL, "
+    "from_unit_id SMALLINT NOT NULL, to_unit_id SMALLINT NOT NULL, result FLOAT NOT NULL, "
+    "unit_type_id SMALLINT NOT NULL, created_at DATETIME DEFAULT CURRENT_TIMESTAMP NOT NULL)",
+    "CREATE INDEX ix_conversion_history_pair ON conversion_history (unit_type_id, from_unit_id, to_unit_id)",
+]
+NORMALIZED_INSERT = (
+    "INSERT INTO conversion_history (value, from_unit_id, to_unit_id, result, unit_type_id) VALUES (?, ?, ?, ?, ?)"
+)
+NORMALIZED_GROUPED = (
+    "SELECT unit_type_id, from_unit_id, to_unit_id, count(*), avg(value) FROM conversion_history "
+    "GROUP BY unit_type_id, from_unit_id, to_unit_id"
+)
+
+BATCH_SIZE = 10_000
+
+
+def generate_rows(count: int) -> list:
+    """
+    Random conversions as (value, from_unit, to_unit, result, unit_type) names
+    """
+    by_type = {}
+    for unit_name, unit_id in units.UNIT_IDS.items():
+        by_type.setdefault(units.UNIT_TYPE_NAMES[units.UNIT_TYPE_OF_UNIT[unit_id]], []).append(unit_name)
+    rng = random.Random(42)
+    rows = []
+    for _ in range(count):
+        unit_type = rng.choice(list(by_type))
+        from_unit, to_unit = rng.sample(by_type[unit_type], 2)
+        value = rng.uniform(0, 1000)
+        rows.append((value, from_unit, to_unit, value * 1.5, unit_type))
+    return rows
+
+
+def run(label: str, ddl: list, insert: str, grouped: str, rows: list) -> dict:
+    path = Path(tempfile.mkdtemp()) / f"{label}.db"
+    conn = sqlite3.connect(path)
+    for statement in ddl:
+        conn.execute(statement)
+
+    started = time.perf_counter()
+    for offset in range(0, len(rows), BATCH_SIZE):
+        conn.executemany(insert, rows[offset:offset + BATCH_SIZE])
+        conn.commit()
+    insert_seconds = time.perf_counter() - started
+
+    conn.execute("VACUUM")
+    size = os.path.getsize(path)
+
+    timings = []
+    for _ in range(5):
+        started = time.perf_counter()
+        conn.execute(grouped).fetchall()
+        timings.append(time.perf_counter() - started)
+    conn.close()
+    os.remove(path)
+
+    return {
+        "label": label,
+        "rows_per_second": len(rows) / insert_seconds,
+        "size_mb": size / 1024 / 1024,
+        "grouped_ms": min(timings) * 1000,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=200_000)
+    args = parser.parse_args()
+
+    rows = generate_rows(args.rows)
+    normalized_rows = [
+        (value, units.unit_id(from_unit), units.unit_id(to_unit), result, units.unit_type_id(unit_type))
+        for value, from_unit, to_unit, result, unit_type in rows
+    ]
+
+    results = [
+        run("legacy", LEGACY_DDL, LEGACY_INSERT, LEGACY_GROUPED, rows),
+        run("normalized", NORMALIZED_DDL, NORMALIZED_INSERT, NORMALIZED_GROUPED, normalized_rows),
+    ]
+
+    print(f"{args.rows} rows")
+    print(f"{'layout':<12}{'insert rows/s':>16}{'size MB':>10}{'grouped ms':>12}")
+    for result in results:
+        print(
+            f"{result['label']:<12}{result['rows_per_second']:>16,.0f}"
+            f"{result['size_mb']:>10.2f}{result['grouped_ms']:>12.1f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
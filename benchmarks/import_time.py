@@ -0,0 +1,91 @@
+"""
+Cold-start benchmark: import app.main with `python -X importtime` and
+enforce import-time budgets.
+
+Usage:
+    python benchmarks/import_time.py [--budget-ms 1500] [--runs 3]
+
+Exits with status 1 when a budget is exceeded, so it can run in CI.
+"""
+import argparse
+import subprocess
+import sys
+from pathlib import Path
+
+BASE_DIR = Path(__file__).resolve().parent.parent
+
+# Modules that must never be imported at start-up (loaded lazily on first use)
+FORBIDDEN_AT_STARTUP = ["openpyxl"]
+
+# Cumulative import-time budgets in milliseconds for our own modules
+MODULE_BUDGETS_MS = {
+    "app.routers.export": 50,
+    "app.routers.converter": 150,
+    "app.routers.todos": 150,
+}
+
+
+def measure() -> dict:
+    """
+    Run one fresh interpreter and return {module: cumulative_microseconds}
+    """
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", "import app.main"],
+        cwd=BASE_DIR,
+        capture_output=True,
+        text=True,
+    )
+    if proc.returncode != 0:
+        raise RuntimeError(f"import app.main failed:\n{proc.stderr}")
+
+    timings = {}
+    for line in proc.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|")
+        timings[name.strip()] = int(cumulative_us)
+    return timings
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--budget-ms", type=float, default=1500, help="Budget for the whole app.main import")
+    parser.add_argument("--runs", type=int, default=3, help="Runs to take the best (warm disk cache) timing from")
+    args = parser.parse_args()
+
+    runs = [measure() for _ in range(args.runs)]
+    best = {name: min(run.get(name, 0) for run in runs) for name in runs[0]}
+
+    failures = []
+    total_ms = best.get("app.main", 0) / 1000
+    print(f"app.main: {total_ms:.1f} ms (budget {args.budget_ms:.0f} ms)")
+    if total_ms > args.budget_ms:
+        failures.append(f"app.main took {total_ms:.1f} ms > {args.budget_ms:.0f} ms")
+
+    for name, budget in MODULE_BUDGETS_MS.items():
+        took = best.get(name, 0) / 1000
+        print(f"{name}: {took:.1f} ms (budget {budget} ms)")
+        if took > budget:
+            failures.append(f"{name} took {took:.1f} ms > {budget} ms")
+
+    for prefix in FORBIDDEN_AT_STARTUP:
+        loaded = [name for name in best if name == prefix or name.startswith(prefix + ".")]
+        if loaded:
+            failures.append(f"{prefix} is imported at start-up ({len(loaded)} modules)")
+
+    slowest = sorted(best.items(), key=lambda item: item[1], reverse=True)[:10]
+    print("\nSlowest imports (cumulative):")
+    for name, us in slowest:
+        print(f"  {us / 1000:8.1f} ms  {name}")
+
+    if failures:
+        print("\nBudget exceeded:")
+        for failure in failures:
+            print(f"  - {failure}")
+        return 1
+    print("\nAll import-time budgets met")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
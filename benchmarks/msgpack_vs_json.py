@@ -0,0 +1,94 @@
+"""
+Payload benchmark: JSON vs msgpack (and packed float64 arrays) for the
+shapes the converter API exchanges.
+
+Compares encoded size and best-of-N encode/decode time for:
+- a /convert/batch payload (list of floats, and msgpack with packed floats)
+- a page of conversion history records
+
+Usage:
+    python benchmarks/msgpack_vs_json.py [--values 100000] [--records 10000] [--runs 5]
+"""
+import argparse
+import json
+import random
+import sys
+import time
+from pathlib import Path
+
+import msgpack
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+from app.negotiation import pack_floats, unpack_floats  # noqa: E402
+
+
+def best_time(func, runs: int) -> float:
+    best = float("inf")
+    for _ in range(runs):
+        start = time.perf_counter()
+        func()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def compare(label: str, payload, encoders: dict, runs: int) -> None:
+    print(f"\n{label}")
+    print(f"  {'format':<22}{'size':>12}{'encode ms':>12}{'decode ms':>12}")
+    for name, (encode, decode) in encoders.items():
+        encoded = encode(payload)
+        decoded = decode(encoded)
+        assert decoded == payload or name.startswith("msgpack packed"), name
+        encode_s = best_time(lambda: encode(payload), runs)
+        decode_s = best_time(lambda: decode(encoded), runs)
+        print(f"  {name:<22}{len(encoded):>12,}{encode_s * 1000:>12.2f}{decode_s * 1000:>12.2f}")
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--values", type=int, default=100_000, help="Floats in the batch payload")
+    parser.add_argument("--records", type=int, default=10_000, help="History records in the page payload")
+    parser.add_argument("--runs", type=int, default=5)
+    args = parser.parse_args()
+
+    random.seed(42)
+    values = [round(random.uniform(-1e6, 1e6), 6) for _ in range(args.values)]
+    batch = {"from_unit": "meter", "to_unit": "foot", "unit_type": "length", "values": values}
+
+    def json_encode(obj):
+        return json.dumps(obj, separators=(",", ":")).encode()
+
+    def packed_encode(obj):
+        return msgpack.packb({**obj, "values": pack_floats(obj["values"])}, use_bin_type=True)
+
+    def packed_decode(data):
+        obj = msgpack.unpackb(data, raw=False)
+        obj["values"] = unpack_floats(obj["values"])
+        return obj
+
+    compare(f"Batch of {args.values:,} floats", batch, {
+        "json": (json_encode, json.loads),
+        "msgpack": (lambda o: msgpack.packb(o, use_bin_type=True), lambda d: msgpack.unpackb(d, raw=False)),
+        "msgpack packed float64": (packed_encode, packed_decode),
+    }, args.runs)
+
+    records = [
+        {
+            "id": i,
+            "value": round(random.uniform(0, 1000), 3),
+            "from_unit": "kilometer",
+            "to_unit": "mile",
+            "result": round(random.uniform(0, 1000), 6),
+            "unit_type": "length",
+            "created_at": "2024-05-01T12:00:00",
+        }
+        for i in range(args.records)
+    ]
+    compare(f"{args.records:,} history records", records, {
+        "json": (json_encode, json.loads),
+        "msgpack": (lambda o: msgpack.packb(o, use_bin_type=True), lambda d: msgpack.unpackb(d, raw=False)),
+    }, args.runs)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,63 @@
+"""
+Sharded export benchmark: rows/s of the zip export for different numbers
+of worker processes.
+
+Fills a temporary SQLite file with conversion history rows, then runs
+sharded_export.export_sharded with each worker count. Throughput should
+grow with workers up to the number of CPUs.
+
+Usage:
+    python benchmarks/sharded_export.py [--rows 400000] [--shard-rows 50000] [--workers 1,2,4]
+"""
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from sqlalchemy import create_engine, insert  # noqa: E402
+from sqlalchemy.orm import Session  # noqa: E402
+from app import models, sharded_export  # noqa: E402
+from app.database import Base  # noqa: E402
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=400_000)
+    parser.add_argument("--shard-rows", type=int, default=50_000)
+    parser.add_argument("--workers", default=f"1,{os.cpu_count() or 1}", help="Comma-separated worker counts")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        engine = create_engine(f"sqlite:///{tmp}/bench.db")
+        Base.metadata.create_all(engine, tables=[models.ConversionHistory.__table__])
+        random.seed(42)
+        with engine.begin() as conn:
+            for start in range(0, args.rows, 10_000):
+                conn.execute(insert(models.ConversionHistory), [
+                    {"value": random.uniform(0, 1000), "from_unit_id": 1, "to_unit_id": 2,
+                     "result": random.uniform(0, 1), "unit_type_id": 1}
+                    for _ in range(min(10_000, args.rows - start))
+                ])
+
+        sharded_export.EXPORTS_DIR = Path(tmp) / "exports"
+        print(f"{args.rows:,} rows, {args.shard_rows:,} rows per shard, {os.cpu_count()} CPU(s)")
+        print(f"  {'workers':>8}{'seconds':>10}{'rows/s':>12}")
+        for workers in sorted({int(w) for w in args.workers.split(",")}):
+            sharded_export.pool.shutdown()
+            sharded_export.pool.max_workers = workers
+            with Session(engine) as db:
+                start = time.perf_counter()
+                path = sharded_export.export_sharded(db, ["conversion_history"], args.shard_rows)
+                elapsed = time.perf_counter() - start
+            os.unlink(path)
+            print(f"  {workers:>8}{elapsed:>10.2f}{args.rows / elapsed:>12,.0f}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
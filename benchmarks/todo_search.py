@@ -0,0 +1,93 @@
+"""
+Todo search latency: GET /api/todos?q= (crud.search_todos) on SQLite FTS5
+against the 10 ms target at 1M todos.
+
+Fills a temporary SQLite file with --rows todos whose titles and
+descriptions mix very common words (c0..c9, each in ~10% of todos),
+common words (w0..w999, ~0.4% each) and rare ones, builds the FTS5 index
+the way init_db does, then times a page of ranked results for each kind
+of query. The exit status is 1 if any p99 is above --target-ms.
+
+Usage:
+    python benchmarks/todo_search.py [--rows 1000000] [--repeat 50] [--target-ms 10]
+"""
+import argparse
+import random
+import statistics
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from sqlalchemy import create_engine, insert  # noqa: E402
+from sqlalchemy.orm import Session  # noqa: E402
+from app import models, search  # noqa: E402
+
+QUERIES = [
+    ("very common word", "c3", None),
+    ("common word", "w123", None),
+    ("common word, completed", "w123", True),
+    ("2-char prefix", "w1", None),
+    ("3-char prefix", "w12", None),
+    ("two words", "c3 w123", None),
+    ("rare word", "r54321", None),
+    ("no match", "zzz", None),
+]
+
+
+def _fill(engine, rows: int) -> None:
+    random.seed(42)
+    models.Todo.__table__.create(engine)
+    with engine.begin() as conn:
+        for start in range(0, rows, 20_000):
+            conn.execute(insert(models.Todo), [
+                {
+                    "title": f"task c{random.randrange(10)} w{random.randrange(1000)} w{random.randrange(1000)}",
+                    "description": f"w{random.randrange(1000)} r{random.randrange(rows)} w{random.randrange(1000)}",
+                    "completed": random.random() < 0.3,
+                }
+                for _ in range(min(20_000, rows - start))
+            ])
+    search.init_search_index(engine)
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=1_000_000)
+    parser.add_argument("--repeat", type=int, default=50)
+    parser.add_argument("--target-ms", type=float, default=10.0)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        engine = create_engine(f"sqlite:///{tmp}/bench.db")
+        started = time.perf_counter()
+        _fill(engine, args.rows)
+        print(f"{args.rows:,} todos indexed in {time.perf_counter() - started:.0f}s, "
+              f"{search.SEARCH_MAX_CANDIDATES} candidates ranked per search")
+        print(f"  {'query':<24}{'matches':>9}{'p50 ms':>9}{'p99 ms':>9}")
+        slow = []
+        with Session(engine) as db:
+            for label, q, completed in QUERIES:
+                search.search_todos(db, q, limit=10, completed=completed)  # warm the page cache
+                latencies = []
+                for _ in range(args.repeat):
+                    start = time.perf_counter()
+                    _, total, capped = search.search_todos(db, q, limit=10, completed=completed)
+                    latencies.append((time.perf_counter() - start) * 1000)
+                cuts = statistics.quantiles(latencies, n=100)
+                matches = f"{total}+" if capped else str(total)
+                print(f"  {label:<24}{matches:>9}{cuts[49]:>9.2f}{cuts[98]:>9.2f}")
+                if cuts[98] > args.target_ms:
+                    slow.append(label)
+        engine.dispose()
+    if slow:
+        print(f"Above the {args.target_ms:g} ms target: {', '.join(slow)}")
+        return 1
+    print(f"All p99 latencies within {args.target_ms:g} ms")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,87 @@
+"""
+Shared fixtures: the app on a throwaway SQLite database
+
+DATABASE_URL is set before anything imports app.database, so the tests
+never touch the development database (TEST_DATABASE_URL points them at
+another one, e.g. a PostgreSQL test database).
+"""
+import os
+import sys
+import tempfile
+from contextlib import contextmanager
+from pathlib import Path
+
+import pytest
+
+BASE_DIR = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(BASE_DIR))
+
+os.environ["DATABASE_URL"] = os.getenv(
+    "TEST_DATABASE_URL", f"sqlite:///{tempfile.mkdtemp(prefix='todo_tests_')}/test.db"
+)
+
+from fastapi.testclient import TestClient  # noqa: E402
+from sqlalchemy import event  # noqa: E402
+from app import database  # noqa: E402
+
+
+@pytest.fixture(scope="session")
+def app():
+    """
+    The FastAPI app with its schema created
+
+    Startup events are not run, so no scheduler threads start; in-process
+    transports (TestClient without `with`, httpx.ASGITransport) skip them too.
+    """
+    from app.main import app
+
+    database.init_db()
+    return app
+
+
+@pytest.fixture(scope="session", autouse=True)
+def remove_export_files():
+    """
+    Delete the files export endpoints write to exports/ during the run
+    """
+    exports_dir = BASE_DIR / "exports"
+    before = set(exports_dir.iterdir()) if exports_dir.exists() else set()
+    yield
+    if exports_dir.exists():
+        for path in set(exports_dir.iterdir()) - before:
+            path.unlink()
+
+
+@pytest.fixture
+def client(app):
+    return TestClient(app)
+
+
+@contextmanager
+def _recorded_statements(engine=None):
+    engine = engine or database.engine
+    statements = []
+
+    def record(conn, cursor, statement, parameters, context, executemany):
+        statements.append(" ".join(statement.split()))
+
+    event.listen(engine, "before_cursor_execute", record)
+    try:
+        yield statements
+    finally:
+        event.remove(engine, "before_cursor_execute", record)
+
+
+@pytest.fixture
+def count_statements():
+    """
+    `with count_statements() as statements:` records the SQL statements
+    sent to the database inside the block
+    """
+    return _recorded_statements
+
+
+@pytest.fixture
+def anyio_backend():
+    # Async tests (pytest.mark.anyio) run on asyncio
+    return "asyncio"
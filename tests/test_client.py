@@ -0,0 +1,130 @@
+"""
+AsyncApiClient against an in-process app instance (httpx.ASGITransport)
+"""
+import asyncio
+import uuid
+
+import httpx
+import pytest
+from app.client import ApiError, AsyncApiClient
+
+pytestmark = pytest.mark.anyio
+
+
+class RecordingTransport(httpx.ASGITransport):
+    """
+    ASGI transport that records the (method, path) of every request
+    """
+
+    def __init__(self, app):
+        super().__init__(app=app)
+        self.requests = []
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        self.requests.append((request.method, request.url.path))
+        return await super().handle_async_request(request)
+
+
+@pytest.fixture
+def transport(app):
+    return RecordingTransport(app)
+
+
+@pytest.fixture(params=[False, True], ids=["json", "msgpack"])
+async def api(request, transport):
+    async with AsyncApiClient("http://testserver", transport=transport, use_msgpack=request.param) as client:
+        yield client
+
+
+async def test_concurrent_converts_share_one_batch_request(api, transport):
+    results = await asyncio.gather(*(api.convert(value, "kilometer", "meter", "length") for value in range(1, 21)))
+
+    assert results == pytest.approx([value * 1000.0 for value in range(1, 21)])
+    assert transport.requests == [("POST", "/api/converter/convert/batch")]
+
+
+async def test_converts_are_batched_per_unit_pair(api, transport):
+    meters, grams = await asyncio.gather(
+        asyncio.gather(*(api.convert(value, "kilometer", "meter", "length") for value in (1, 2))),
+        asyncio.gather(*(api.convert(value, "kilogram", "gram", "weight") for value in (3, 4))),
+    )
+
+    assert meters == pytest.approx([1000.0, 2000.0])
+    assert grams == pytest.approx([3000.0, 4000.0])
+    assert transport.requests.count(("POST", "/api/converter/convert/batch")) == 2
+
+
+async def test_invalid_value_fails_only_its_own_convert(api):
+    below_zero, valid = await asyncio.gather(
+        api.convert(-10, "kelvin", "celsius", "temperature"),
+        api.convert(10, "kelvin", "celsius", "temperature"),
+        return_exceptions=True,
+    )
+
+    assert isinstance(below_zero, ApiError) and below_zero.status_code == 400
+    assert valid == pytest.approx(-263.15)
+
+
+async def test_pending_converts_are_sent_on_close(app):
+    client = AsyncApiClient("http://testserver", transport=httpx.ASGITransport(app=app), batch_window=60)
+    pending = asyncio.ensure_future(client.convert(1, "kilometer", "meter", "length"))
+    await asyncio.sleep(0)
+    await client.aclose()
+
+    assert await pending == pytest.approx(1000.0)
+
+
+async def test_units_are_fetched_once(api, transport):
+    first = await api.units()
+    second = await api.units()
+    await api.units(refresh=True)
+
+    assert "kilometer" in first["length"]
+    assert second is first
+    assert transport.requests.count(("GET", "/api/converter/units")) == 2
+
+
+async def test_todo_round_trip(api):
+    todo = await api.create_todo("client test", description="from the SDK")
+    assert (await api.get_todo(todo["id"]))["title"] == "client test"
+
+    updated = await api.update_todo(todo["id"], completed=True)
+    assert updated["completed"] is True
+
+    await api.delete_todo(todo["id"])
+    with pytest.raises(ApiError) as error:
+        await api.get_todo(todo["id"])
+    assert error.value.status_code == 404
+    assert error.value.detail == "Todo not found"
+
+
+async def test_history_round_trip(api):
+    key = f"client-test-{uuid.uuid4().hex}"
+    saved = await api.save_history(5, "kilometer", "meter", 5000, "length", idempotency_key=key)
+    again = await api.save_history(5, "kilometer", "meter", 5000, "length", idempotency_key=key)
+    assert again["id"] == saved["id"]
+
+    await api.delete_history(saved["id"])
+    with pytest.raises(ApiError) as error:
+        await api.delete_history(saved["id"])
+    assert error.value.status_code == 404
+
+
+async def test_download_export_streams_to_disk(api, tmp_path):
+    await api.save_history(1, "kilometer", "meter", 1000, "length")
+
+    download = await api.download_export(tmp_path, kind="conversions")
+
+    assert download.path.parent == tmp_path
+    assert download.path.suffix == ".xlsx"
+    assert download.path.read_bytes()[:4] == b"PK\x03\x04"
+    assert "X-Next-Since-Id" in download.watermarks
+    assert list(tmp_path.glob("*.part")) == []
+
+
+async def test_download_export_error_leaves_no_file(api, tmp_path):
+    with pytest.raises(ApiError) as error:
+        await api.download_export(tmp_path, kind="conversions", since_id=-1)
+
+    assert error.value.status_code == 422
+    assert list(tmp_path.iterdir()) == []
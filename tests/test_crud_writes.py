@@ -0,0 +1,93 @@
+"""
+Update and delete endpoints write the row with one UPDATE/DELETE ...
+RETURNING statement: no SELECT before the write and no refresh after it
+
+Every statement is counted. Besides the row write there are only the
+side writes: the SQLite full-text index of todos (same transaction) and
+the page cache generation (its own short transaction after the commit,
+so the hot generation row is not locked for the whole write). A history
+delete first reads the rollup watermark (share-locked on PostgreSQL) to
+know whether the row must be taken out of the daily rollups.
+"""
+import pytest
+from app import database
+
+SQLITE = database.engine.dialect.name == "sqlite"
+
+
+def _assert_statements(statements: list, *expected: str, row: int = 0) -> None:
+    """
+    The statements are exactly the expected ones, in order (by prefix),
+    and statement `row` writes the row with RETURNING
+    """
+    assert len(statements) == len(expected), statements
+    for statement, prefix in zip(statements, expected):
+        assert statement.startswith(prefix), statement
+    assert "RETURNING" in statements[row], statements[row]
+
+
+BUMP = "UPDATE cache_generations"
+WATERMARK = "SELECT rollup_watermarks.last_id"
+
+
+@pytest.fixture
+def todo_id(client):
+    response = client.post("/api/todos", json={"title": "write test", "description": "before"})
+    assert response.status_code == 201
+    return response.json()["id"]
+
+
+@pytest.fixture
+def history_id(client):
+    response = client.post("/api/converter/history", json={
+        "value": 1.0, "from_unit": "meter", "to_unit": "kilometer", "result": 0.001, "unit_type": "length"
+    })
+    assert response.status_code in (200, 201)
+    return response.json()["id"]
+
+
+@pytest.mark.parametrize("method", ["put", "patch"])
+def test_update_todo_is_one_statement(client, todo_id, count_statements, method):
+    with count_statements() as statements:
+        response = getattr(client, method)(f"/api/todos/{todo_id}", json={"title": "after", "completed": True})
+
+    assert response.status_code == 200
+    assert response.json()["title"] == "after"
+    assert response.json()["completed"] is True
+    fts = ["INSERT OR REPLACE INTO todos_fts"] if SQLITE else []
+    _assert_statements(statements, "UPDATE todos", *fts, BUMP)
+
+
+def test_update_without_text_change_skips_the_index(client, todo_id, count_statements):
+    with count_statements() as statements:
+        response = client.patch(f"/api/todos/{todo_id}", json={"completed": True})
+
+    assert response.status_code == 200
+    _assert_statements(statements, "UPDATE todos", BUMP)
+
+
+def test_update_missing_todo_is_one_statement(client, count_statements):
+    with count_statements() as statements:
+        response = client.patch("/api/todos/999999999", json={"title": "nobody"})
+
+    assert response.status_code == 404
+    _assert_statements(statements, "UPDATE todos")
+
+
+def test_delete_todo_is_one_statement(client, todo_id, count_statements):
+    with count_statements() as statements:
+        response = client.delete(f"/api/todos/{todo_id}")
+
+    assert response.status_code == 204
+    fts = ["DELETE FROM todos_fts"] if SQLITE else []
+    _assert_statements(statements, "DELETE FROM todos", *fts, BUMP)
+    assert client.get(f"/api/todos/{todo_id}").status_code == 404
+
+
+def test_delete_history_is_one_statement(client, history_id, count_statements):
+    with count_statements() as statements:
+        response = client.delete(f"/api/converter/history/{history_id}")
+
+    assert response.status_code == 204
+    _assert_statements(statements, WATERMARK, "DELETE FROM conversion_history", BUMP, row=1)
+    assert client.delete(f"/api/converter/history/{history_id}").status_code == 404
@@ -0,0 +1,81 @@
+"""
+Delta export watermarks stop at the safe horizon, so rows committed out of
+id/timestamp order (PostgreSQL) are exported by the next delta
+"""
+import io
+from datetime import datetime, timedelta, timezone
+from types import SimpleNamespace
+
+import pytest
+from openpyxl import load_workbook
+from sqlalchemy import func, select
+from app import database, deltas, models
+
+HORIZON = datetime(2026, 1, 1, 12, 0, tzinfo=timezone.utc)
+
+
+def _history(session, row_id: int, created_at: datetime) -> None:
+    session.add(models.ConversionHistory(
+        id=row_id, value=1.0, from_unit="meter", to_unit="kilometer", result=0.001,
+        unit_type="length", created_at=created_at
+    ))
+    session.commit()
+
+
+def _exported_ids(response) -> list:
+    sheet = load_workbook(io.BytesIO(response.content))["Conversion History"]
+    return [row[0] for row in sheet.iter_rows(min_row=2, values_only=True)]
+
+
+def test_next_watermark_stops_at_the_horizon():
+    rows = {"todos": [
+        SimpleNamespace(id=1, created_at=HORIZON - timedelta(minutes=5), updated_at=HORIZON - timedelta(minutes=5)),
+        SimpleNamespace(id=3, created_at=HORIZON + timedelta(seconds=1), updated_at=HORIZON + timedelta(seconds=1)),
+    ]}
+
+    headers = deltas.next_watermark(rows, 7, horizon=HORIZON)
+
+    assert headers[deltas.HEADER_SINCE_ID] == "1"
+    assert headers[deltas.HEADER_SINCE_TIMESTAMP] == HORIZON.isoformat()
+    assert headers[deltas.HEADER_DELETED_SINCE_ID] == "7"
+    assert deltas.next_watermark(rows, 7)[deltas.HEADER_SINCE_ID] == "3"
+
+
+def test_sqlite_has_no_horizon(app):
+    with database.SessionLocal() as session:
+        assert deltas.safe_horizon(session) is None
+
+
+def test_out_of_order_commit_is_exported_by_the_next_delta(client, monkeypatch):
+    monkeypatch.setattr(deltas, "safe_horizon", lambda db: HORIZON)
+    with database.SessionLocal() as session:
+        base = session.scalar(select(func.max(models.ConversionHistory.id))) or 0
+        _history(session, base + 1, HORIZON - timedelta(minutes=5))
+        # base + 2 is drawn by a transaction that commits after the export
+        _history(session, base + 3, HORIZON + timedelta(seconds=1))
+
+    first = client.get(f"/api/export/excel/conversions?since_id={base}")
+    assert first.status_code == 200
+    assert _exported_ids(first) == [base + 1, base + 3]
+    since_id = first.headers[deltas.HEADER_SINCE_ID]
+    assert since_id == str(base + 1)
+
+    with database.SessionLocal() as session:
+        _history(session, base + 2, HORIZON - timedelta(seconds=30))
+
+    second = client.get(f"/api/export/excel/conversions?since_id={since_id}")
+    assert second.status_code == 200
+    assert _exported_ids(second) == [base + 2, base + 3]
+
+
+@pytest.mark.parametrize("deleted_at, expected", [(HORIZON - timedelta(minutes=1), True), (HORIZON, False)])
+def test_tombstone_watermark_stops_at_the_horizon(app, deleted_at, expected):
+    with database.SessionLocal() as session:
+        tombstone = models.ExportTombstone(table_name="todos", row_id=0, deleted_at=deleted_at)
+        session.add(tombstone)
+        session.commit()
+        try:
+            assert (deltas.tombstone_watermark(session, HORIZON) >= tombstone.id) is expected
+        finally:
+            session.delete(tombstone)
+            session.commit()
@@ -0,0 +1,45 @@
+"""
+Data inventory: database-wide numbers only for admin tenants
+"""
+import pytest
+from app import counters, tenants
+
+
+@pytest.fixture
+def acme(monkeypatch):
+    monkeypatch.setitem(tenants.TENANT_API_KEYS, "acme-key", "acme")
+    return {tenants.API_KEY_HEADER: "acme-key"}
+
+
+def _save(client, headers=None):
+    response = client.post("/api/converter/history", headers=headers or {}, json={
+        "value": 1.0, "from_unit": "meter", "to_unit": "kilometer", "result": 0.001, "unit_type": "length"
+    })
+    assert response.status_code in (200, 201)
+
+
+def test_tenant_sees_only_its_own_numbers(client, acme):
+    _save(client)
+    _save(client, acme)
+
+    inventory = client.get("/api/export/debug/inventory", headers=acme).json()
+
+    assert inventory["scope"] == "tenant"
+    assert inventory["sizes"] is None
+    assert inventory["counts"]["tables"][counters.HISTORY] == client.get(
+        "/api/converter/history/usage", headers=acme
+    ).json()["rows"]
+    assert not any(name.startswith(counters.HISTORY) for name in inventory["counts"]["filters"])
+    assert {row["tenant_id"] for row in inventory["recent"]["conversions"]} == {"acme"}
+
+
+def test_admin_sees_database_wide_numbers(client, acme):
+    _save(client)
+    _save(client, acme)
+
+    inventory = client.get("/api/export/debug/inventory").json()
+
+    assert inventory["scope"] == "database"
+    assert inventory["sizes"] is not None or "sizes" in inventory["errors"]
+    assert any(name.startswith(f"{counters.HISTORY}.unit_type.") for name in inventory["counts"]["filters"])
+    assert {row["tenant_id"] for row in inventory["recent"]["conversions"]} == {tenants.DEFAULT_TENANT}
@@ -0,0 +1,55 @@
+"""
+Export files: unique per build and deleted once every coalesced caller has them
+"""
+import asyncio
+
+import httpx
+import pytest
+from conftest import BASE_DIR
+from app.routers.export import create_excel_file
+
+EXPORTS_DIR = BASE_DIR / "exports"
+
+
+def _export_files() -> set:
+    return set(EXPORTS_DIR.iterdir()) if EXPORTS_DIR.exists() else set()
+
+
+def test_exports_in_the_same_second_get_different_files():
+    paths = [create_excel_file([], []) for _ in range(3)]
+    try:
+        assert len(set(paths)) == 3
+    finally:
+        for path in paths:
+            EXPORTS_DIR.joinpath(path).unlink()
+
+
+@pytest.mark.parametrize("path", ["/api/export/excel", "/api/export/excel/rollups", "/api/export/excel/sharded"])
+def test_export_file_is_deleted_after_sending(client, path):
+    before = _export_files()
+
+    response = client.get(path)
+
+    assert response.status_code == 200
+    assert response.content[:4] == b"PK\x03\x04"
+    assert _export_files() == before
+
+
+@pytest.mark.anyio
+async def test_coalesced_exports_delete_the_shared_file_once(app):
+    before = _export_files()
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://testserver") as client:
+        responses = await asyncio.gather(*(client.get("/api/export/excel/rollups") for _ in range(5)))
+
+    assert [response.status_code for response in responses] == [200] * 5
+    assert _export_files() == before
+
+
+def test_full_export_reads_each_table_once(client, count_statements):
+    with count_statements() as statements:
+        response = client.get("/api/export/excel")
+
+    assert response.status_code == 200
+    assert not [s for s in statements if "count(" in s.lower()], statements
+    assert len([s for s in statements if "FROM conversion_history" in s]) == 1, statements
@@ -0,0 +1,90 @@
+"""
+Idempotency-Key: bound to the request body, expired after the TTL,
+replayed on the concurrent-insert path too
+"""
+import uuid
+from datetime import datetime, timedelta, timezone
+
+import pytest
+from sqlalchemy import update
+from app import database, idempotency, models
+
+HISTORY = {"value": 2.0, "from_unit": "meter", "to_unit": "kilometer", "result": 0.002, "unit_type": "length"}
+
+
+@pytest.fixture
+def key() -> str:
+    return f"test-{uuid.uuid4().hex}"
+
+
+def _save(client, key: str, body: dict = HISTORY):
+    return client.post("/api/converter/history", json=body, headers={idempotency.IDEMPOTENCY_HEADER: key})
+
+
+def test_retry_returns_the_original(client, key):
+    first, retry = _save(client, key), _save(client, key)
+
+    assert first.status_code == 201
+    assert retry.json()["id"] == first.json()["id"]
+    assert retry.headers[idempotency.REPLAYED_HEADER] == "true"
+
+
+def test_key_with_another_body_is_rejected(client, key):
+    assert _save(client, key).status_code == 201
+
+    response = _save(client, key, {**HISTORY, "value": 3.0, "result": 0.003})
+
+    assert response.status_code == 422
+    assert idempotency.IDEMPOTENCY_HEADER in response.json()["detail"]
+
+
+def test_key_of_a_deleted_record_is_a_conflict(client, key):
+    saved = _save(client, key)
+    assert client.delete(f"/api/converter/history/{saved.json()['id']}").status_code == 204
+
+    response = _save(client, key)
+
+    assert response.status_code == 409
+
+
+def test_expired_key_is_not_replayed(client, key, monkeypatch):
+    first = _save(client, key)
+    with database.SessionLocal() as db:
+        db.execute(
+            update(models.IdempotencyKey).where(models.IdempotencyKey.key == key)
+            .values(created_at=datetime.now(timezone.utc) - timedelta(seconds=idempotency.IDEMPOTENCY_TTL_SECONDS + 60))
+        )
+        db.commit()
+    # As on another worker, whose LRU has not seen the key
+    monkeypatch.setattr(idempotency, "_cache", idempotency._LRUCache(10, idempotency.IDEMPOTENCY_TTL_SECONDS))
+
+    second = _save(client, key)
+
+    assert second.status_code == 201
+    assert idempotency.REPLAYED_HEADER not in second.headers
+    assert second.json()["id"] != first.json()["id"]
+
+
+def test_lost_insert_race_is_replayed(client, key, monkeypatch):
+    first = _save(client, key)
+    lookup = idempotency.lookup
+    calls = []
+
+    def racing_lookup(*args, **kwargs):
+        # The first lookup runs before the concurrent request commits its key
+        calls.append(1)
+        return None if len(calls) == 1 else lookup(*args, **kwargs)
+
+    monkeypatch.setattr(idempotency, "lookup", racing_lookup)
+    response = _save(client, key)
+
+    assert response.status_code == 201
+    assert response.json()["id"] == first.json()["id"]
+    assert response.headers[idempotency.REPLAYED_HEADER] == "true"
+
+
+def test_todo_key_with_another_body_is_rejected(client, key):
+    headers = {idempotency.IDEMPOTENCY_HEADER: key}
+    assert client.post("/api/todos", json={"title": "first"}, headers=headers).status_code == 201
+
+    assert client.post("/api/todos", json={"title": "second"}, headers=headers).status_code == 422
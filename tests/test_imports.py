@@ -0,0 +1,64 @@
+"""
+Imports run on the bounded heavy pool: a full pool rejects the upload
+"""
+import threading
+import time
+
+import pytest
+from app import executors, importer, jobs
+
+
+def _wait_finished(job_id: str) -> dict:
+    for _ in range(200):
+        job = jobs.get_job(job_id)
+        if job["finished_at"] is not None:
+            return job
+        time.sleep(0.02)
+    raise AssertionError(f"job {job_id} did not finish")
+
+
+@pytest.fixture
+def one_slot_pool(monkeypatch):
+    monkeypatch.setattr(executors.heavy, "max_workers", 1)
+    monkeypatch.setattr(executors.heavy, "max_queue", 0)
+    return executors.heavy
+
+
+def test_import_runs_as_a_pool_job(client, one_slot_pool):
+    csv = b"ID,Title,Description,Completed\n,imported on the pool,,false\n"
+
+    response = client.post("/api/import/csv/todos", files={"file": ("todos.csv", csv, "text/csv")})
+
+    assert response.status_code == 202
+    job = _wait_finished(response.json()["id"])
+    assert job["status"] == "completed", job
+    assert job["result"]["error_count"] == 0
+
+
+def test_full_pool_rejects_the_import(app, one_slot_pool, tmp_path):
+    path = tmp_path / "upload.csv"
+    path.write_bytes(b"ID,Title\n,never imported\n")
+    release = threading.Event()
+    one_slot_pool.submit(release.wait)
+    try:
+        before = {job["id"] for job in jobs.list_jobs("import")}
+
+        with pytest.raises(executors.PoolBusy):
+            importer.start_import(str(path), "csv", importer.KIND_TODOS, "upload.csv", False)
+
+        assert not path.exists()
+        assert {job["id"] for job in jobs.list_jobs("import")} == before
+    finally:
+        release.set()
+
+
+def test_full_pool_returns_503(client, one_slot_pool):
+    release = threading.Event()
+    one_slot_pool.submit(release.wait)
+    try:
+        response = client.post("/api/import/csv/todos", files={"file": ("todos.csv", b"ID,Title\n", "text/csv")})
+
+        assert response.status_code == 503
+        assert response.headers["Retry-After"]
+    finally:
+        release.set()
@@ -0,0 +1,87 @@
+"""
+Background jobs: status shared by all workers, one scheduler leader per
+database, tenant-scoped retention deletes
+"""
+import os
+import subprocess
+import sys
+from datetime import datetime, timedelta, timezone
+
+from conftest import BASE_DIR
+from sqlalchemy import update
+from app import database, jobs, models, retention, scheduler
+
+
+def test_job_of_another_worker_is_visible(client):
+    # A job created by another process (worker) sharing the database
+    code = "from app import jobs; print(jobs.create_job('test', {'worker': 2})['id'])"
+    result = subprocess.run(
+        [sys.executable, "-c", code], cwd=BASE_DIR, env=os.environ, capture_output=True, text=True
+    )
+    assert result.returncode == 0, result.stderr
+    job_id = result.stdout.split()[-1]
+
+    response = client.get(f"/api/jobs/{job_id}")
+
+    assert response.status_code == 200
+    assert response.json()["params"] == {"worker": 2}
+    assert response.json()["status"] == "pending"
+
+
+def test_abandoned_job_is_failed(app):
+    job = jobs.create_job("test_stale")
+    with database.SessionLocal() as db:
+        db.execute(
+            update(models.Job).where(models.Job.id == job["id"])
+            .values(status="running", updated_at=datetime.now(timezone.utc) - timedelta(hours=1))
+        )
+        db.commit()
+
+    assert jobs.list_jobs("test_stale", active=True) == []
+    assert jobs.get_job(job["id"])["status"] == "failed"
+
+
+def test_one_scheduler_leader_per_database(app):
+    first, second = scheduler.LeaderLock(database.engine), scheduler.LeaderLock(database.engine)
+    try:
+        assert first.held()
+        assert not second.held()
+        first.release()
+        assert second.held()
+    finally:
+        first.release()
+        second.release()
+
+
+def test_follower_skips_tasks_on_schedule(app):
+    leader, follower = scheduler.LeaderLock(database.engine), scheduler.LeaderLock(database.engine)
+    runs = []
+    task = scheduler.PeriodicTask("test", 0.01, lambda: runs.append(1), leader=follower)
+    try:
+        assert leader.held()
+        task.start()
+        task._stop.wait(0.1)
+        task.stop()
+        assert runs == []
+        assert task.overdue_seconds() == 0
+    finally:
+        task.stop()
+        leader.release()
+        follower.release()
+
+
+def test_retention_deletes_name_the_tenant(client, count_statements):
+    saved = client.post("/api/converter/history", json={
+        "value": 1.0, "from_unit": "meter", "to_unit": "kilometer", "result": 0.001, "unit_type": "length"
+    })
+    assert saved.status_code in (200, 201)
+    job = jobs.create_job("history_retention")
+
+    with count_statements() as statements:
+        deleted = retention.delete_history_older_than(job["id"], datetime.now(timezone.utc) + timedelta(days=1))
+
+    assert deleted >= 1
+    history_deletes = [s for s in statements if s.startswith("DELETE FROM conversion_history")]
+    assert history_deletes
+    assert all(s.count("tenant_id") >= 2 for s in history_deletes), history_deletes
+    assert client.delete(f"/api/converter/history/{saved.json()['id']}").status_code == 404
@@ -0,0 +1,44 @@
+"""
+List page cache: hits run no query, writes invalidate the cached pages
+"""
+import time
+
+from sqlalchemy import update
+from app import database, models, page_cache
+
+
+def test_hit_issues_no_query(client, count_statements):
+    assert client.get("/api/todos?page_size=7").status_code == 200
+
+    with count_statements() as statements:
+        response = client.get("/api/todos?page_size=7")
+
+    assert response.headers[page_cache.CACHE_HEADER] == "HIT"
+    assert statements == []
+
+
+def test_write_through_this_worker_is_seen_at_once(client):
+    client.get("/api/todos?page_size=8")
+    client.post("/api/todos", json={"title": "page cache test"})
+
+    response = client.get("/api/todos?page_size=8")
+
+    assert response.headers[page_cache.CACHE_HEADER] == "MISS"
+    assert "page cache test" in response.text
+
+
+def test_write_through_another_worker_is_seen_after_the_ttl(client, monkeypatch):
+    monkeypatch.setattr(page_cache, "PAGE_CACHE_GENERATION_TTL", 0.05)
+    monkeypatch.setattr(page_cache, "_generations", {})
+    client.get("/api/todos?page_size=9")
+    assert client.get("/api/todos?page_size=9").headers[page_cache.CACHE_HEADER] == "HIT"
+
+    # Another worker's bump: the row changes but this worker's copy does not
+    counter = models.CacheGeneration
+    with database.engine.begin() as conn:
+        conn.execute(
+            update(counter).where(counter.name == page_cache.TODOS).values(generation=counter.generation + 1)
+        )
+    time.sleep(0.1)
+
+    assert client.get("/api/todos?page_size=9").headers[page_cache.CACHE_HEADER] == "MISS"
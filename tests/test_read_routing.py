@@ -0,0 +1,41 @@
+"""
+Replica routing: read-your-writes cookie and falling back to the primary
+"""
+import tempfile
+
+from fastapi import Response
+from sqlalchemy import create_engine, func, select
+from starlette.requests import Request
+from app import database, dependencies, models
+
+
+def _request(cookie: str = "") -> Request:
+    headers = [(b"cookie", cookie.encode())] if cookie else []
+    return Request({"type": "http", "headers": headers})
+
+
+def test_write_pins_reads_to_primary():
+    response = Response()
+    dependencies.pin_reads_to_primary(response)
+    cookie = response.headers["set-cookie"].split(";")[0]
+
+    assert dependencies.reads_pinned_to_primary(_request(cookie))
+    assert not dependencies.reads_pinned_to_primary(_request())
+    assert not dependencies.reads_pinned_to_primary(_request(f"{dependencies.READ_PRIMARY_COOKIE}=junk"))
+
+
+def test_failed_replica_read_is_retried_on_the_primary(app):
+    # A replica without the schema fails every read with OperationalError
+    broken = create_engine(f"sqlite:///{tempfile.mkdtemp(prefix='todo_replica_')}/replica.db")
+    with database.engine.connect() as conn:
+        expected = conn.scalar(select(func.count()).select_from(models.Todo))
+
+    db = database.SessionLocal()
+    db.info["replica"] = broken
+    try:
+        assert db.scalar(select(func.count()).select_from(models.Todo)) == expected
+        assert "replica" not in db.info
+        assert db.query(models.Todo).count() == expected
+    finally:
+        db.close()
+        broken.dispose()
@@ -0,0 +1,89 @@
+"""
+Daily rollups: admin-only runs, deletes and clears taken out, legacy unit names
+"""
+import uuid
+
+import pytest
+from app import database, models, rollups, tenants
+
+
+@pytest.fixture
+def tenant(monkeypatch):
+    # A fresh tenant per test, so its stats hold only the test's rows
+    name = f"rollup-{uuid.uuid4().hex[:8]}"
+    monkeypatch.setitem(tenants.TENANT_API_KEYS, f"{name}-key", name)
+    return name
+
+
+@pytest.fixture
+def headers(tenant):
+    return {tenants.API_KEY_HEADER: f"{tenant}-key"}
+
+
+def _save(client, headers, value: float) -> int:
+    response = client.post("/api/converter/history", headers=headers, json={
+        "value": value, "from_unit": "meter", "to_unit": "kilometer", "result": value / 1000, "unit_type": "length"
+    })
+    assert response.status_code in (200, 201)
+    return response.json()["id"]
+
+
+def _roll_up(client):
+    response = client.post("/api/converter/history/rollup")
+    assert response.status_code == 200
+
+
+def _stats(client, headers) -> list:
+    return client.get("/api/converter/history/stats", headers=headers).json()
+
+
+def _rollups(tenant: str) -> list:
+    with database.SessionLocal() as db:
+        return [(row.from_unit, row.to_unit, row.count) for row in rollups.get_all_rollups(db, tenant)]
+
+
+def test_rollup_run_needs_an_admin_tenant(client, headers):
+    assert client.post("/api/converter/history/rollup", headers=headers).status_code == 403
+    _roll_up(client)
+
+
+def test_deleting_a_folded_row_takes_it_out_of_the_rollups(client, tenant, headers):
+    first, second = _save(client, headers, 2.0), _save(client, headers, 5.0)
+    _roll_up(client)
+    assert _rollups(tenant) == [("meter", "kilometer", 2)]
+
+    assert client.delete(f"/api/converter/history/{first}", headers=headers).status_code == 204
+
+    assert _rollups(tenant) == [("meter", "kilometer", 1)]
+    [stats] = _stats(client, headers)
+    assert (stats["count"], stats["value_sum"]) == (1, 5.0)
+
+    assert client.delete(f"/api/converter/history/{second}", headers=headers).status_code == 204
+    assert _rollups(tenant) == []
+    assert _stats(client, headers) == []
+
+
+def test_clearing_the_history_drops_the_tenants_rollups(client, tenant, headers):
+    _save(client, headers, 1.0)
+    _roll_up(client)
+    _save(client, headers, 3.0)
+
+    assert client.delete("/api/converter/history", headers=headers).status_code == 200
+
+    assert _rollups(tenant) == []
+    assert _stats(client, headers) == []
+
+
+def test_legacy_units_keep_their_names(client, tenant, headers):
+    with database.SessionLocal() as db:
+        db.add(models.ConversionHistory(
+            value=1.0, from_unit_id=0, to_unit_id=0, result=12.0, unit_type_id=0, tenant_id=tenant,
+            legacy_unit_type="length", legacy_from_unit="foot", legacy_to_unit="inch"
+        ))
+        db.commit()
+
+    # From the raw tail, then from the rollups
+    assert [(s["from_unit"], s["to_unit"]) for s in _stats(client, headers)] == [("foot", "inch")]
+    _roll_up(client)
+    assert _rollups(tenant) == [("foot", "inch", 1)]
+    assert [(s["from_unit"], s["to_unit"], s["count"]) for s in _stats(client, headers)] == [("foot", "inch", 1)]
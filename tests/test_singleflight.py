@@ -0,0 +1,65 @@
+"""
+Request coalescing: identical concurrent exports share one heavy-pool build
+"""
+import asyncio
+import time
+
+import httpx
+import pytest
+from app import executors, rollups, singleflight
+
+pytestmark = pytest.mark.anyio
+
+
+async def test_followers_share_the_leaders_task():
+    calls = []
+
+    async def work():
+        calls.append(1)
+        await asyncio.sleep(0.05)
+        return "result"
+
+    results = await asyncio.gather(*(singleflight.do_async(("test",), work) for _ in range(5)))
+
+    assert results == ["result"] * 5
+    assert calls == [1]
+    assert await singleflight.do_async(("test",), work) == "result"
+    assert len(calls) == 2  # nothing is cached after the flight
+
+
+async def test_cleanup_runs_after_the_last_release():
+    cleaned = []
+
+    async def work():
+        await asyncio.sleep(0.01)
+        return "file"
+
+    first, second = await asyncio.gather(
+        singleflight.join(("cleanup",), work, cleanup=cleaned.append),
+        singleflight.join(("cleanup",), work, cleanup=cleaned.append),
+    )
+    assert first is second
+    first.release()
+    assert cleaned == []
+    second.release()
+    assert cleaned == ["file"]
+
+
+async def test_identical_exports_take_one_pool_slot(app, monkeypatch):
+    monkeypatch.setattr(executors.heavy, "max_workers", 1)
+    monkeypatch.setattr(executors.heavy, "max_queue", 0)
+    builds = []
+    get_all_rollups = rollups.get_all_rollups
+
+    def slow_rollups(db, tenant_id):
+        builds.append(tenant_id)
+        time.sleep(0.3)
+        return get_all_rollups(db, tenant_id)
+
+    monkeypatch.setattr(rollups, "get_all_rollups", slow_rollups)
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://testserver") as client:
+        responses = await asyncio.gather(*(client.get("/api/export/excel/rollups") for _ in range(11)))
+
+    assert [response.status_code for response in responses] == [200] * 11
+    assert builds == ["default"]
@@ -0,0 +1,62 @@
+"""
+Cold start: import-time budgets, lazy heavy imports and the schema check
+"""
+import importlib.util
+import subprocess
+import sys
+
+import pytest
+from conftest import BASE_DIR
+from app import database
+
+# The budgets and the -X importtime parser live in the benchmark script
+_spec = importlib.util.spec_from_file_location("import_time", BASE_DIR / "benchmarks" / "import_time.py")
+import_time = importlib.util.module_from_spec(_spec)
+_spec.loader.exec_module(import_time)
+
+APP_MAIN_BUDGET_MS = 1500
+# Best of several runs, as the benchmark does, so a cold disk cache doesn't fail the test
+RUNS = 3
+
+
+@pytest.fixture(scope="module")
+def timings() -> dict:
+    runs = [import_time.measure() for _ in range(RUNS)]
+    return {name: min(run.get(name, 0) for run in runs) for name in runs[0]}
+
+
+def test_app_main_import_budget(timings):
+    took_ms = timings["app.main"] / 1000
+    assert took_ms <= APP_MAIN_BUDGET_MS, f"import app.main took {took_ms:.0f} ms"
+
+
+@pytest.mark.parametrize("module, budget_ms", import_time.MODULE_BUDGETS_MS.items())
+def test_router_import_budget(timings, module, budget_ms):
+    took_ms = timings[module] / 1000
+    assert took_ms <= budget_ms, f"import {module} took {took_ms:.0f} ms"
+
+
+@pytest.mark.parametrize("package", import_time.FORBIDDEN_AT_STARTUP)
+def test_heavy_packages_load_lazily(timings, package):
+    loaded = [name for name in timings if name == package or name.startswith(package + ".")]
+    assert not loaded, f"{package} is imported at start-up"
+
+
+def test_export_loads_openpyxl_on_first_use():
+    code = (
+        "import os, sys, app.main\n"
+        "assert 'openpyxl' not in sys.modules\n"
+        "from app.routers.export import create_excel_file\n"
+        "os.unlink(create_excel_file([], []))\n"
+        "assert 'openpyxl' in sys.modules\n"
+    )
+    result = subprocess.run([sys.executable, "-c", code], cwd=BASE_DIR, capture_output=True, text=True)
+    assert result.returncode == 0, result.stderr
+
+
+def test_init_db_skipped_when_schema_is_current(app, count_statements):
+    with count_statements() as statements:
+        created = database.init_db()
+
+    assert created is False
+    assert statements == ["SELECT version FROM schema_version"]